@@ -13,8 +13,10 @@ logging.basicConfig(
 # Initialize FastHTML app
 app = FastHTML()
 
-# Initialize services and register routes
-init_services(app)
+# Initialize services and register routes. Spawned worker processes import
+# this module as __mp_main__ and must not start services of their own
+if __name__ != '__mp_main__':
+    init_services(app)
 
 # Run the application
 if __name__ == "__main__":
@@ -6,13 +6,110 @@ webdav_config = {
     'username': os.getenv('WEBDAV_USERNAME', ''),
     'password': os.getenv('WEBDAV_PASSWORD', ''),
     'folder': '/documents',
-    'raw_folder': '/raw_documents'
+    'raw_folder': '/raw_documents',
+    'metadata_concurrency': int(os.getenv('WEBDAV_METADATA_CONCURRENCY', '16')),  # Parallel metadata downloads
+    'retries': 3,  # Retries of requests failing with connection errors, 429 or 5xx
+    'connect_timeout': 5,  # Seconds to wait for a connection
+    'timeout': 15,  # Seconds to wait for listing and metadata responses
+    'transfer_timeout': 60,  # Seconds to wait for document body transfers
+    'pool_size': 16,  # Kept-alive connections per WebDAV service
+    'refresh_interval': int(os.getenv('CACHE_REFRESH_INTERVAL', '300')),  # Seconds between background cache refreshes, 0 disables
+    'max_staleness': int(os.getenv('CACHE_MAX_STALENESS', '600'))  # Cache age in seconds after which a request triggers a refresh
 }
 
 embedding_config = {
     'model': 'all-MiniLM-L6-v2',
     'similarity_threshold': 30,
-    'max_suggestions': 3
+    'max_suggestions': 3,
+    'search_page_size': 20,
+    'batch_size': 32,  # Maximum texts encoded in one model call
+    'batch_wait_ms': 10,  # Maximum time a request waits for its batch to fill
+    'chunk_tokens': None,  # Tokens per chunk, None uses the model's whole input length
+    'chunk_overlap': 20,  # Tokens shared by consecutive chunks
+    'max_chunks': 64,  # Chunks embedded per document, caps the cost of huge documents
+    'match_chunks': True,  # Let search match a document by its best chunk
+    'query_cache_size': 256,  # Search query embeddings kept in memory, they are not persisted
+    'storage_dtype': 'float16'  # Precision of embeddings stored in .metadata.json
+}
+
+# Persistent cache of embeddings keyed by model name and content hash
+embedding_cache_config = {
+    'enabled': True,
+    'path': os.getenv('EMBEDDING_CACHE_PATH', 'data/cache/embeddings.sqlite3'),
+    'max_entries': 100000
+}
+
+# On-disk snapshot of the document cache, loaded at startup and then revalidated
+cache_snapshot_config = {
+    'enabled': True,
+    'path': os.getenv('CACHE_SNAPSHOT_PATH', 'data/cache/documents.sqlite3')
+}
+
+# Local disk cache for raw document bodies, keyed by WebDAV URL and ETag
+blob_cache_config = {
+    'enabled': True,
+    'path': os.getenv('BLOB_CACHE_PATH', 'data/cache/blobs'),
+    'max_bytes': int(os.getenv('BLOB_CACHE_MAX_BYTES', str(2 * 1024 ** 3))),
+    'revalidate_after': 30  # Seconds a cached file is served without asking WebDAV
+}
+
+# Extracted text keyed by extractor version and content hash, compressed on disk
+text_cache_config = {
+    'enabled': True,
+    'path': os.getenv('TEXT_CACHE_PATH', 'data/cache/texts.sqlite3'),
+    'max_entries': 20000,
+    'memory_chars': 32 * 1024 * 1024  # Characters of recently used texts kept in memory
+}
+
+# Worker processes extracting text from uploaded and raw documents
+extraction_config = {
+    'workers': int(os.getenv('EXTRACTION_WORKERS', str(os.cpu_count() or 1))),  # 0 extracts in-process
+    'timeout': 60,  # Seconds a document may take before its worker is terminated, for formats without a timeout budget
+    'timeout_grace': 10,  # Seconds past a format's timeout budget before its worker is terminated
+    'memory_limit_mb': int(os.getenv('EXTRACTION_MEMORY_LIMIT_MB', '1024')),  # Address space per worker, 0 for no limit
+    'max_queue': 32,  # Documents that may wait for a free worker before uploads are rejected
+    'max_tasks_per_worker': 100,  # Documents after which a worker process is replaced
+    'pdf_parallel_pages': int(os.getenv('PDF_PARALLEL_PAGES', '0'))  # PDFs with this many pages are split across workers, 0 disables
+}
+
+# Limits on extracting one document, per format on top of 'default'. A document
+# over a budget is stored with the text gathered so far and flagged as truncated.
+# 0 disables a limit
+extraction_budgets = {
+    'default': {
+        'max_bytes': 50 * 1024 * 1024,  # Larger binary files are skipped, text files are read up to this size
+        'max_chars': 500000,  # Characters of text kept at most
+        'timeout': int(os.getenv('EXTRACTION_TIMEOUT', '60'))  # Seconds after which extraction stops early
+    },
+    'pdf': {
+        'max_bytes': 200 * 1024 * 1024,
+        'max_pages': int(os.getenv('PDF_MAX_PAGES', '500')),
+        'max_chars': int(os.getenv('PDF_MAX_CHARS', '500000'))
+    },
+    'spreadsheet': {
+        'max_pages': 20,  # Sheets
+        'max_rows': 20000  # Rows across all sheets
+    },
+    'presentation': {
+        'max_pages': 500  # Slides
+    },
+    'document': {},
+    'image': {},
+    'text': {
+        'max_bytes': 10 * 1024 * 1024
+    }
+}
+
+# Document embedding index: 'exact' (numpy), or FAISS 'flat', 'ivf' or 'hnsw'
+index_config = {
+    'type': os.getenv('INDEX_TYPE', 'exact'),
+    'path': os.getenv('INDEX_PATH', 'data/index/documents.faiss'),
+    'nlist': 256,  # IVF: number of inverted lists
+    'nprobe': 16,  # IVF: lists probed per query
+    'hnsw_m': 32,  # HNSW: neighbours per node
+    'ef_construction': 80,  # HNSW: build-time search depth
+    'ef_search': 64,  # HNSW: query-time search depth
+    'save_interval': 60  # Minimum seconds between index saves after single updates
 }
 
 log_config = {
@@ -6,7 +6,7 @@ class Document:
         self.id = id
         self.filename = filename
         self.tags = tags
-        self.embedding = embedding or []
+        self.embedding = embedding if embedding is not None else []
         self.similarity = similarity
     
     @classmethod
@@ -0,0 +1,24 @@
+# models/extraction_budget.py
+class ExtractionBudget:
+    """Limits on the work spent extracting text from one file"""
+    
+    def __init__(self, max_bytes=None, max_pages=None, max_rows=None, max_chars=None, timeout=None):
+        """
+        Args:
+            max_bytes (int, optional): Largest input extracted; text files are read up to
+                                       this size, larger binary files are skipped
+            max_pages (int, optional): Pages, slides, sheets or paragraphs read at most
+            max_rows (int, optional): Spreadsheet rows read at most
+            max_chars (int, optional): Characters of text returned at most
+            timeout (float, optional): Seconds after which extraction stops and returns
+                                       the text gathered so far
+        """
+        self.max_bytes = max_bytes
+        self.max_pages = max_pages
+        self.max_rows = max_rows
+        self.max_chars = max_chars
+        self.timeout = timeout
+    
+    def __repr__(self):
+        return (f"ExtractionBudget(max_bytes={self.max_bytes}, max_pages={self.max_pages}, "
+                f"max_rows={self.max_rows}, max_chars={self.max_chars}, timeout={self.timeout})")
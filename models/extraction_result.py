@@ -0,0 +1,27 @@
+# models/extraction_result.py
+class ExtractionResult:
+    """Text extracted from a file, and which budget cut it short if any"""
+    
+    def __init__(self, text="", truncated_by=None):
+        """
+        Args:
+            text (str): Extracted text
+            truncated_by (str, optional): Budget that stopped extraction early:
+                                          'max_bytes', 'max_pages', 'max_rows',
+                                          'max_chars' or 'timeout'
+        """
+        self.text = text
+        self.truncated_by = truncated_by
+    
+    @property
+    def truncated(self):
+        """Whether the text is incomplete because a budget was hit"""
+        return self.truncated_by is not None
+    
+    def truncate(self, reason):
+        """Record the budget that stopped extraction, keeping the first one hit"""
+        if self.truncated_by is None:
+            self.truncated_by = reason
+    
+    def __repr__(self):
+        return f"ExtractionResult({len(self.text)} chars, truncated_by={self.truncated_by!r})"
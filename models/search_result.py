@@ -0,0 +1,38 @@
+# models/search_result.py
+class SearchResult:
+    """Top-k similarity search result, independent of the cached documents"""
+    
+    def __init__(self, query, hits, offset=0, has_more=False):
+        """
+        Args:
+            query (str): Query text the result was computed for
+            hits (list): (doc_id, score) pairs sorted by descending cosine similarity
+            offset (int): Rank of the first hit within the full ranking
+            has_more (bool): Whether more hits exist after this page
+        """
+        self.query = query
+        self.hits = hits
+        self.offset = offset
+        self.has_more = has_more
+    
+    def __len__(self):
+        return len(self.hits)
+    
+    @property
+    def ids(self):
+        """Document IDs in ranking order"""
+        return [doc_id for doc_id, _ in self.hits]
+    
+    @property
+    def similarities(self):
+        """Similarity percentages keyed by document ID"""
+        return {doc_id: round(score * 100) for doc_id, score in self.hits}
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'query': self.query,
+            'hits': [{'id': doc_id, 'similarity': round(score * 100)} for doc_id, score in self.hits],
+            'offset': self.offset,
+            'has_more': self.has_more
+        }
\ No newline at end of file
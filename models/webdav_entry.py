@@ -0,0 +1,34 @@
+# models/webdav_entry.py
+class WebDAVEntry:
+    """File or folder listed by a WebDAV PROPFIND"""
+    
+    def __init__(self, name, href, size=None, mtime=None, etag=None, content_type=None, is_collection=False):
+        """
+        Args:
+            name (str): Decoded file or folder name
+            href (str): Href of the entry as reported by the server
+            size (int, optional): Content length in bytes
+            mtime (float, optional): Last modification time as a Unix timestamp
+            etag (str, optional): Entity tag of the current content
+            content_type (str, optional): MIME type reported by the server
+            is_collection (bool): Whether the entry is a folder
+        """
+        self.name = name
+        self.href = href
+        self.size = size
+        self.mtime = mtime
+        self.etag = etag
+        self.content_type = content_type
+        self.is_collection = is_collection
+    
+    @property
+    def version(self):
+        """ETag, or modification time and size for servers without ETags; None if neither is known"""
+        if self.etag:
+            return self.etag
+        if self.mtime is not None:
+            return f"{self.mtime}/{self.size}"
+        return None
+    
+    def __repr__(self):
+        return f"WebDAVEntry({self.name!r}, size={self.size}, etag={self.etag!r})"
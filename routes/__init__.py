@@ -8,13 +8,42 @@ from ui.scripts import Scripts
 # Initialize services once
 document_service = None
 similarity_service = None
+async_webdav_service = None
+extraction_service = None
 
 def init_services(app):
     """Initialize services for routes"""
-    global document_service, similarity_service
+    global document_service, similarity_service, async_webdav_service, extraction_service
     
-    from config import webdav_config, embedding_config
+    from config import (webdav_config, embedding_config, embedding_cache_config, index_config,
+                        cache_snapshot_config, blob_cache_config, extraction_config,
+                        extraction_budgets, text_cache_config)
     from services.webdav_service import WebDAVService
+    from services.async_webdav_service import AsyncWebDAVService
+    from services.vector_index import create_vector_index
+    from services.embedding_models import embedding_models
+    from services.embedding_cache import EmbeddingCache
+    from services.cache_snapshot import CacheSnapshot
+    from services.blob_cache import BlobCache
+    from services.extraction_service import ExtractionService
+    from services.text_cache import TextCache
+    
+    embedding_cache = None
+    if embedding_cache_config['enabled']:
+        embedding_cache = EmbeddingCache(
+            path=embedding_cache_config['path'],
+            max_entries=embedding_cache_config['max_entries']
+        )
+    
+    embedding_models.configure(
+        max_batch_size=embedding_config['batch_size'],
+        max_wait_ms=embedding_config['batch_wait_ms'],
+        cache=embedding_cache,
+        chunk_tokens=embedding_config['chunk_tokens'],
+        chunk_overlap=embedding_config['chunk_overlap'],
+        max_chunks=embedding_config['max_chunks'],
+        query_cache_size=embedding_config['query_cache_size']
+    )
     
     # Initialize services
     webdav_service = WebDAVService(
@@ -22,11 +51,70 @@ def init_services(app):
         webdav_username=webdav_config['username'],
         webdav_password=webdav_config['password'],
         folder_path=webdav_config['folder'],
-        folder_path_raw=webdav_config['raw_folder']
+        folder_path_raw=webdav_config['raw_folder'],
+        embedding_index=create_vector_index(index_config),
+        model_name=embedding_config['model'],
+        chunk_index=create_vector_index(index_config, '.chunks') if embedding_config['match_chunks'] else None,
+        embedding_dtype=embedding_config['storage_dtype'],
+        metadata_concurrency=webdav_config['metadata_concurrency'],
+        retries=webdav_config['retries'],
+        connect_timeout=webdav_config['connect_timeout'],
+        timeout=webdav_config['timeout'],
+        transfer_timeout=webdav_config['transfer_timeout'],
+        pool_size=webdav_config['pool_size'],
+        snapshot=CacheSnapshot(cache_snapshot_config['path']) if cache_snapshot_config['enabled'] else None
     )
     
+    # Serve the last snapshot right away and revalidate it in the background
+    snapshot_loaded = webdav_service.load_snapshot()
+    app.router.on_shutdown.append(webdav_service.save_snapshot)
+    
+    # Revalidate the document cache in the background
+    if webdav_config['refresh_interval'] > 0:
+        webdav_service.start_refresher(
+            interval=webdav_config['refresh_interval'],
+            max_staleness=webdav_config['max_staleness']
+        )
+    elif snapshot_loaded:
+        # Without a refresher the snapshot is still revalidated once
+        webdav_service.sync_in_background()
+    
     document_service = DocumentService(webdav_service)
     
+    # Non-blocking client for async routes, sharing the document cache
+    async_webdav_service = AsyncWebDAVService(
+        webdav_service,
+        retries=webdav_config['retries'],
+        connect_timeout=webdav_config['connect_timeout'],
+        timeout=webdav_config['timeout'],
+        transfer_timeout=webdav_config['transfer_timeout'],
+        pool_size=webdav_config['pool_size'],
+        blob_cache=BlobCache(
+            blob_cache_config['path'],
+            max_bytes=blob_cache_config['max_bytes'],
+            revalidate_after=blob_cache_config['revalidate_after']
+        ) if blob_cache_config['enabled'] else None
+    )
+    app.router.on_shutdown.append(async_webdav_service.aclose)
+    
+    # Text extraction runs in worker processes, off the event loop and the GIL
+    extraction_service = ExtractionService(
+        workers=extraction_config['workers'],
+        timeout=extraction_config['timeout'],
+        timeout_grace=extraction_config['timeout_grace'],
+        memory_limit_mb=extraction_config['memory_limit_mb'],
+        max_queue=extraction_config['max_queue'],
+        max_tasks_per_worker=extraction_config['max_tasks_per_worker'],
+        budgets=extraction_budgets,
+        pdf_parallel_pages=extraction_config['pdf_parallel_pages'],
+        text_cache=TextCache(
+            text_cache_config['path'],
+            max_entries=text_cache_config['max_entries'],
+            memory_chars=text_cache_config['memory_chars']
+        ) if text_cache_config['enabled'] else None
+    )
+    app.router.on_shutdown.append(extraction_service.shutdown)
+    
     similarity_service = SimilarityService(
         document_service=document_service,
         model_name=embedding_config['model']
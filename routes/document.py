@@ -2,8 +2,7 @@ import logging
 import datetime
 from fasthtml.common import *
 from starlette.responses import RedirectResponse, JSONResponse
-from . import document_service, similarity_service
-from services.text_extraction import TextExtractor
+from . import async_webdav_service, extraction_service
 from ui.components import UIComponents
 
 logger = logging.getLogger(__name__)
@@ -24,21 +23,22 @@ def register_routes(app):
         
         try:
             filename = file.filename
-            file_data = await file.read()
+            # The upload is already spooled to a temporary file, stream it from there
+            file_data = file.file
             
             logger.info(f"Uploading document: {filename}")
             
-            # Extract text for embedding generation
-            text_extractor = TextExtractor()
-            extracted_text = text_extractor.extract_text(file_data, filename)
-            logger.info(f"Extracted {len(extracted_text)} characters of text from {filename}")
+            # Extract text for embedding generation in a worker process
+            extraction = await extraction_service.extract(file_data, filename)
+            logger.info(f"Extracted {len(extraction.text)} characters of text from {filename}")
             
             # Upload document with extracted text for embedding
-            success = document_service.add_document(
+            success = await async_webdav_service.add_document(
                 filename=filename,
                 tags=tags,
                 file_data=file_data,
-                text_content=extracted_text
+                content=extraction.text,
+                truncated_by=extraction.truncated_by
             )
             
             if success:
@@ -64,7 +64,7 @@ def register_routes(app):
         
         try:
             logger.info(f"Deleting document with ID: {doc_id}")
-            success = document_service.delete_document(doc_id)
+            success = await async_webdav_service.delete_document(doc_id)
             
             if success:
                 logger.info(f"Successfully deleted document {doc_id}")
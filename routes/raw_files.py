@@ -3,17 +3,84 @@
 import os
 import logging
 from fasthtml.common import *
-from starlette.responses import RedirectResponse, Response
-from . import document_service, similarity_service
-from services.text_extraction import TextExtractor
+from starlette.responses import RedirectResponse, Response, StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from . import document_service, similarity_service, async_webdav_service, extraction_service
 from ui.components import UIComponents
 from ui.styles import Styles
 from ui.scripts import Scripts
 from config import webdav_config
+from utils.file import STREAM_CHUNK_SIZE
 import requests
 
 logger = logging.getLogger(__name__)
-text_extractor = TextExtractor()
+
+# Request headers passed through to WebDAV for partial and conditional previews
+PREVIEW_REQUEST_HEADERS = ('range', 'if-range', 'if-none-match', 'if-modified-since')
+
+# WebDAV response headers relayed to the browser
+PREVIEW_RESPONSE_HEADERS = ('content-length', 'content-range', 'content-encoding', 'accept-ranges',
+                            'etag', 'last-modified')
+
+class CachedFileResponse(FileResponse):
+    """FileResponse for a pinned blob cache entry, released once the response is over"""
+    
+    def __init__(self, blob_cache, entry, **kwargs):
+        super().__init__(entry.path, **kwargs)
+        self.blob_cache = blob_cache
+        self.entry = entry
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # Also when the client went away mid-transfer
+            self.blob_cache.release(self.entry)
+
+def get_preview_content_type(filename):
+    """
+    Get the content type a raw file is previewed with
+    
+    Args:
+        filename (str): Filename with extension
+    
+    Returns:
+        str: MIME type based on the file extension
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    
+    # Set appropriate content type based on file extension
+    if ext in ['.jpg', '.jpeg']:
+        content_type = 'image/jpeg'
+    elif ext == '.png':
+        content_type = 'image/png'
+    elif ext == '.gif':
+        content_type = 'image/gif'
+    elif ext == '.pdf':
+        content_type = 'application/pdf'
+    elif ext in ['.doc', '.docx']:
+        content_type = 'application/msword'
+    elif ext in ['.xls', '.xlsx']:
+        content_type = 'application/vnd.ms-excel'
+    elif ext in ['.ppt', '.pptx']:
+        content_type = 'application/vnd.ms-powerpoint'
+    elif ext == '.txt':
+        content_type = 'text/plain'
+    elif ext == '.html':
+        content_type = 'text/html'
+    elif ext == '.css':
+        content_type = 'text/css'
+    elif ext == '.js':
+        content_type = 'application/javascript'
+    elif ext == '.json':
+        content_type = 'application/json'
+    elif ext == '.xml':
+        content_type = 'application/xml'
+    else:
+        content_type = 'application/octet-stream'
+    
+    return content_type
 
 def register_routes(app):
     """Register raw files routes"""
@@ -43,7 +110,7 @@ def register_routes(app):
             upload_section,
             Div(file_table, cls="container")
         )
-        
+    
     @rt('/add_metadata_form')
     def get(request):
         """Dedicated page for adding metadata to a raw file"""
@@ -73,50 +140,64 @@ def register_routes(app):
             return Response("Filename not provided", status_code=400)
         
         try:
-            # Get raw file from WebDAV
-            file_data = document_service.webdav.get_raw_document(filename)
+            content_type = get_preview_content_type(filename)
             
-            if file_data is None:
+            # Serve the local copy from the blob cache if it is known to be current.
+            # Otherwise the file is passed through below while the cache downloads
+            # or revalidates it in the background
+            blob_cache = async_webdav_service.blob_cache
+            entry = await async_webdav_service.get_cached_raw_document(filename, wait=False)
+            if entry is not None:
+                headers = {'ETag': entry.etag, 'Cache-Control': 'private, no-cache'}
+                if entry.last_modified:
+                    headers['Last-Modified'] = entry.last_modified
+                
+                if entry.etag in (tag.strip() for tag in request.headers.get('if-none-match', '').split(',')):
+                    return Response(status_code=304, headers=headers)
+                
+                # The pin keeps eviction from deleting the file while it is sent.
+                # FileResponse sends it with sendfile where possible and answers Range requests
+                if blob_cache.pin(entry):
+                    return CachedFileResponse(blob_cache, entry, media_type=content_type, headers=headers)
+            
+            # Otherwise open the raw file on WebDAV without reading its body yet,
+            # passing Range and conditional headers through
+            forward_headers = {
+                name: request.headers[name] for name in PREVIEW_REQUEST_HEADERS if name in request.headers
+            }
+            upstream = await async_webdav_service.open_raw_document(filename, forward_headers)
+            
+            if upstream is None:
                 logger.error(f"Error downloading raw document for preview: {filename}")
                 return Response("Error downloading file", status_code=404)
             
-            # Determine content type based on file extension
-            ext = os.path.splitext(filename)[1].lower()
-            content_type = None
-            
-            # Set appropriate content type based on file extension
-            if ext in ['.jpg', '.jpeg']:
-                content_type = 'image/jpeg'
-            elif ext == '.png':
-                content_type = 'image/png'
-            elif ext == '.gif':
-                content_type = 'image/gif'
-            elif ext == '.pdf':
-                content_type = 'application/pdf'
-            elif ext in ['.doc', '.docx']:
-                content_type = 'application/msword'
-            elif ext in ['.xls', '.xlsx']:
-                content_type = 'application/vnd.ms-excel'
-            elif ext in ['.ppt', '.pptx']:
-                content_type = 'application/vnd.ms-powerpoint'
-            elif ext == '.txt':
-                content_type = 'text/plain'
-            elif ext == '.html':
-                content_type = 'text/html'
-            elif ext == '.css':
-                content_type = 'text/css'
-            elif ext == '.js':
-                content_type = 'application/javascript'
-            elif ext == '.json':
-                content_type = 'application/json'
-            elif ext == '.xml':
-                content_type = 'application/xml'
-            else:
-                content_type = 'application/octet-stream'
+            headers = {
+                name: upstream.headers[name] for name in PREVIEW_RESPONSE_HEADERS if name in upstream.headers
+            }
+            # Let browsers keep the file but revalidate it with If-None-Match on every preview
+            headers['Cache-Control'] = 'private, no-cache'
             
-            # Return the file data with the appropriate content type
-            return Response(file_data, media_type=content_type)
+            # Answer revalidations ourselves if the server ignored If-None-Match
+            if_none_match = request.headers.get('if-none-match')
+            not_modified = upstream.status_code == 200 and if_none_match and upstream.headers.get('etag') in (
+                tag.strip() for tag in if_none_match.split(','))
             
+            # Responses without a body end here
+            if not_modified or upstream.status_code in (304, 416):
+                await upstream.aclose()
+                headers.pop('content-length', None)
+                return Response(status_code=304 if not_modified else upstream.status_code, headers=headers)
+            
+            # Stream the file (or the requested range) through in chunks, undecoded
+            # so the relayed Content-Length and Content-Range stay valid
+            return StreamingResponse(
+                upstream.aiter_raw(STREAM_CHUNK_SIZE),
+                status_code=upstream.status_code,
+                media_type=content_type,
+                headers=headers,
+                background=BackgroundTask(upstream.aclose)
+            )
+        
         except Exception as e:
             logger.error(f"Error serving preview for {filename}: {str(e)}")
             return Response(f"Error: {str(e)}", status_code=500)
@@ -135,9 +216,11 @@ def register_routes(app):
                 "error": "No filename provided"
             })
         
+        file_data = None
         try:
-            file_data = document_service.webdav.get_raw_document(filename)
-
+            # Use the local copy from the blob cache, downloading it only if needed
+            file_data = await async_webdav_service.open_raw_file(filename)
+            
             if file_data is None:
                 logger.error(f"Error downloading raw document {filename}")
                 return JSONResponse({
@@ -146,12 +229,12 @@ def register_routes(app):
                     "error": f"Error downloading raw document {filename}"
                 })
             
-            # Extract text from file
-            extracted_text = text_extractor.extract_text(file_data, filename)
+            # Extract text from file in a worker process
+            extracted_text = await extraction_service.extract_text(file_data, filename)
             
             # Calculate similarities with existing documents
-            similarity_data, _, tag_suggestions = similarity_service.calculate_similarities_from_file(
-                file_data, filename, ""
+            similarity_data, _, tag_suggestions = await run_in_threadpool(
+                similarity_service.calculate_similarities_from_text, extracted_text, filename, ""
             )
             
             # Get suggested tags string from the first suggestion if available
@@ -168,7 +251,7 @@ def register_routes(app):
                 "suggested_tags": suggested_tags,
                 "extracted_text_sample": extracted_text[:500] if extracted_text else ""
             })
-            
+        
         except Exception as e:
             logger.error(f"Error calculating preview similarity: {str(e)}")
             return JSONResponse({
@@ -176,6 +259,9 @@ def register_routes(app):
                 "tag_suggestions": [],
                 "error": str(e)
             })
+        finally:
+            if file_data is not None:
+                file_data.close()
     
     @rt('/add_metadata')
     async def post(request):
@@ -188,23 +274,28 @@ def register_routes(app):
         if not filename:
             return RedirectResponse('/raw_files', status_code=303)
         
+        file_data = None
         try:
-            file_data = document_service.webdav.get_raw_document(filename)
-
+            # Use the local copy from the blob cache, downloading it only if needed
+            file_data = await async_webdav_service.open_raw_file(filename)
+            
             if file_data is None:
                 logger.error(f"Error downloading raw document {filename}")
                 return Titled("Metadata Error", 
                              Div(f"Error downloading raw document {filename}", 
                                 cls="container error"))
             
-            # Extract text for embedding
-            extracted_text = text_extractor.extract_text(file_data, filename)
+            # Extract text for embedding in a worker process
+            extraction = await extraction_service.extract(file_data, filename)
             
-            # Move file with metadata
-            success = document_service.webdav.move_file_with_metadata(
+            # Move file server-side with metadata; the downloaded data is only
+            # uploaded again if the server refuses the move
+            success = await async_webdav_service.move_file_with_metadata(
                 filename=filename,
                 tags=tags,
-                content=extracted_text
+                content=extraction.text,
+                file_data=file_data,
+                truncated_by=extraction.truncated_by
             )
             
             if success:
@@ -214,7 +305,10 @@ def register_routes(app):
                 logger.error(f"Failed to move file {filename}")
                 return Titled("Metadata Error", 
                              Div("Failed to move file with metadata", cls="container error"))
-                
+        
         except Exception as e:
             logger.error(f"Error adding metadata: {str(e)}")
-            return Titled("Metadata Error", Div(f"Error: {str(e)}", cls="container error"))
\ No newline at end of file
+            return Titled("Metadata Error", Div(f"Error: {str(e)}", cls="container error"))
+        finally:
+            if file_data is not None:
+                file_data.close()
\ No newline at end of file
@@ -1,7 +1,9 @@
 import logging
 from fasthtml.common import *
 from starlette.responses import RedirectResponse, JSONResponse
-from . import document_service, similarity_service
+from starlette.concurrency import run_in_threadpool
+from . import document_service, similarity_service, extraction_service
+from config import embedding_config
 from ui.components import UIComponents
 from ui.styles import Styles
 from ui.scripts import Scripts
@@ -21,16 +23,33 @@ def register_routes(app):
         if not query:
             return RedirectResponse('/', status_code=303)
         
-        logger.info(f"Searching with query: {query}")
+        try:
+            page = max(1, int(request.query_params.get('page', 1)))
+        except ValueError:
+            page = 1
+        page_size = embedding_config.get('search_page_size', 20)
+        
+        logger.info(f"Searching with query: {query} (page {page})")
+        
+        # Rank only the top matches needed for this page
+        result = await run_in_threadpool(
+            similarity_service.search, query, k=page_size, offset=(page - 1) * page_size
+        )
+        similarity_data = result.similarities
         
-        # Use similarity service to calculate similarities
-        similarity_data, sorted_documents, _ = similarity_service.calculate_similarities(query)
+        # Copy the matched documents so the cache is never modified
+        sorted_documents = []
+        for doc_id in result.ids:
+            doc = document_service.get_document(doc_id)
+            if doc is not None:
+                sorted_documents.append({**doc, 'similarity': similarity_data[doc_id]})
         
         # Create UI components
         upload_section = UIComponents.create_upload_section()
         new_file_section = UIComponents.create_new_file_section()
         search_section = UIComponents.create_search_section(query)
         doc_table = UIComponents.create_document_table(sorted_documents, similarity_data)
+        pagination = UIComponents.create_pagination(query, page, result.has_more)
         
         # Add navigation
         nav_links = UIComponents.create_navigation([("Back to Document Library", "/")])
@@ -38,7 +57,7 @@ def register_routes(app):
         # Add debug information
         debug_info = ""
         if similarity_data:
-            debug_info = f"Found {len(similarity_data)} similarities."
+            debug_info = f"Showing matches {result.offset + 1} to {result.offset + len(result)}."
         
         # Render search results page
         return Titled(
@@ -50,6 +69,7 @@ def register_routes(app):
             search_section,
             nav_links,
             Div(doc_table, cls="container"),
+            pagination,
             Div(
                 P(f"Showing search results for: '{query}'", cls="search-info"),
                 P(debug_info, cls="debug-info"),
@@ -72,12 +92,14 @@ def register_routes(app):
             })
         
         try:
-            file_data = await file.read()
+            # The upload is already spooled to a temporary file, stream it from there
+            file_data = file.file
             filename = file.filename
             
-            # Use similarity service to calculate similarities with text extraction
-            similarity_data, _, tag_suggestions = similarity_service.calculate_similarities_from_file(
-                file_data, filename, tags
+            # Extract text in a worker process, then compare it with the stored documents
+            extracted_text = await extraction_service.extract_text(file_data, filename)
+            similarity_data, _, tag_suggestions = await run_in_threadpool(
+                similarity_service.calculate_similarities_from_text, extracted_text, filename, tags
             )
             
             # Get suggested tags string from the first suggestion if available
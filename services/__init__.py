@@ -1,7 +1,20 @@
 # Services initialization
-# This file makes the services available through the services package
+# This file makes the services available through the services package.
+# They are imported on first access, so extraction worker processes that only
+# need services.extraction_worker do not load numpy and the HTTP clients
 
-from services.document_service import DocumentService
-from services.similarity_service import SimilarityService
-from services.webdav_service import WebDAVService
-from services.text_extraction import TextExtractor
\ No newline at end of file
+import importlib
+
+_EXPORTS = {
+    'DocumentService': 'services.document_service',
+    'SimilarityService': 'services.similarity_service',
+    'WebDAVService': 'services.webdav_service',
+    'TextExtractor': 'services.text_extraction'
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'services' has no attribute '{name}'")
+    return getattr(importlib.import_module(_EXPORTS[name]), name)
\ No newline at end of file
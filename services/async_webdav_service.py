@@ -0,0 +1,405 @@
+import os
+import json
+import asyncio
+import logging
+import httpx
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
+from utils.embedding import CHUNKS_SUFFIX, encode_embedding_file
+from utils.file import STREAM_CHUNK_SIZE, create_spooled_file, get_file_size, iter_file_chunks
+
+class AsyncWebDAVService:
+    """
+    Non-blocking WebDAV client for async route handlers.
+    
+    Performs all document writes and raw file transfers on top of
+    httpx.AsyncClient. It shares the configuration, URL layout, document cache
+    and metadata format of the WebDAVService it wraps, which keeps the cache
+    in sync with the server. CPU-bound work such as embedding runs in the
+    thread pool.
+    """
+    
+    def __init__(self, webdav_service, retries=3, connect_timeout=5, timeout=15,
+                 transfer_timeout=60, pool_size=16, blob_cache=None):
+        """
+        Initialize the async WebDAV client
+        
+        Args:
+            webdav_service (WebDAVService): Synchronous service to share configuration and cache with
+            retries (int): Retries of a request failing to connect
+            connect_timeout (float): Seconds to wait for a connection
+            timeout (float): Seconds to wait for listing and metadata responses
+            transfer_timeout (float): Seconds to wait for document body transfers
+            pool_size (int): Maximum number of pooled connections
+            blob_cache (BlobCache, optional): Local cache for raw document bodies
+        """
+        self.webdav = webdav_service
+        self.cache = webdav_service.cache
+        self.blob_cache = blob_cache
+        self.blob_fetches = {}  # In-flight downloads into the blob cache: {url: Task}
+        self.logger = logging.getLogger(__name__)
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.transfer_timeout = httpx.Timeout(transfer_timeout, connect=connect_timeout)
+        self.client = httpx.AsyncClient(
+            auth=webdav_service.auth,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            transport=httpx.AsyncHTTPTransport(retries=retries)
+        )
+    
+    async def aclose(self):
+        """Close the pooled connections"""
+        await self.client.aclose()
+    
+    async def open_raw_document(self, filename, headers=None):
+        """
+        Start streaming a file from the raw documents folder
+        
+        Args:
+            filename (str): Filename to read
+            headers (dict, optional): Request headers to send, e.g. Range or If-None-Match
+            
+        Returns:
+            httpx.Response: Open response whose body has not been read yet, or None on error.
+                            Besides 200 this can be 206 Partial Content, 304 Not Modified or
+                            416 Range Not Satisfiable when matching headers were sent.
+                            The caller iterates response.aiter_raw() and must call aclose().
+        """
+        raw_file_url = self.webdav._get_file_url_raw_folder(filename)
+        
+        try:
+            request = self.client.build_request("GET", raw_file_url, headers=headers, timeout=self.transfer_timeout)
+            response = await self.client.send(request, stream=True)
+            
+            if response.status_code >= 400 and response.status_code != 416:
+                self.logger.error(f"Error downloading raw file ({raw_file_url}): {response.status_code}")
+                await response.aclose()
+                return None
+            return response
+            
+        except Exception as e:
+            self.logger.error(f"Error downloading raw file ({raw_file_url}): {str(e)}")
+            return None
+    
+    async def download_raw_document(self, filename):
+        """
+        Download a file from the raw documents folder without holding it in memory
+        
+        Args:
+            filename (str): Filename to read
+            
+        Returns:
+            SpooledTemporaryFile: File positioned at the start, or None on error; the caller closes it
+        """
+        response = await self.open_raw_document(filename)
+        if response is None:
+            return None
+        
+        file = create_spooled_file()
+        try:
+            async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                file.write(chunk)
+            file.seek(0)
+            return file
+        except Exception as e:
+            self.logger.error(f"Error downloading raw file {filename}: {str(e)}")
+            file.close()
+            return None
+        finally:
+            await response.aclose()
+    
+    async def get_cached_raw_document(self, filename, wait=True):
+        """
+        Get a local copy of a raw file from the blob cache, downloading it if needed
+        
+        A cached copy is revalidated with a conditional GET unless it was
+        validated recently. Concurrent callers asking for the same file share
+        one download.
+        
+        Args:
+            filename (str): Filename to read
+            wait (bool): Wait for the download or revalidation. Otherwise it
+                         continues in the background and None is returned
+            
+        Returns:
+            BlobEntry: Current local copy, or None if the file is not cacheable, the download failed
+                       or it was not waited for
+        """
+        if self.blob_cache is None:
+            return None
+        
+        key = self.webdav._get_file_url_raw_folder(filename)
+        entry = self.blob_cache.get(key)
+        if entry is not None and self.blob_cache.is_fresh(entry):
+            return entry
+        
+        task = self.blob_fetches.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_blob(filename, key, entry))
+            self.blob_fetches[key] = task
+            task.add_done_callback(lambda _: self.blob_fetches.pop(key, None))
+        
+        if not wait:
+            return None
+        
+        # Don't cancel the shared download if this caller goes away
+        return await asyncio.shield(task)
+    
+    async def _fetch_blob(self, filename, key, entry):
+        """Revalidate or download a raw file into the blob cache"""
+        headers = {"If-None-Match": entry.etag} if entry is not None else None
+        response = await self.open_raw_document(filename, headers)
+        if response is None:
+            return None
+        
+        try:
+            if response.status_code == 304 and entry is not None:
+                self.blob_cache.mark_validated(entry)
+                return entry
+            
+            # Only complete bodies with an ETag can be cached and revalidated
+            etag = response.headers.get('etag')
+            size = response.headers.get('content-length')
+            if response.status_code != 200 or not etag or not self.blob_cache.fits(
+                    int(size) if size and size.isdigit() else None):
+                return None
+            
+            # Disk writes run in the thread pool, off the event loop
+            temp_file = await run_in_threadpool(self.blob_cache.create_temp_file)
+            try:
+                async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                    await run_in_threadpool(temp_file.write, chunk)
+            except BaseException:
+                await run_in_threadpool(self._discard_temp_file, temp_file)
+                raise
+            
+            return await run_in_threadpool(
+                self.blob_cache.put, key, etag, response.headers.get('last-modified'), temp_file
+            )
+            
+        except Exception as e:
+            self.logger.error(f"Error caching raw file {filename}: {str(e)}")
+            return None
+        finally:
+            await response.aclose()
+    
+    @staticmethod
+    def _discard_temp_file(temp_file):
+        """Close and delete an unfinished download"""
+        temp_file.close()
+        os.remove(temp_file.name)
+    
+    async def open_raw_file(self, filename):
+        """
+        Get a readable file with the content of a raw file
+        
+        Args:
+            filename (str): Filename to read
+            
+        Returns:
+            file: Binary file positioned at the start, or None on error; the caller closes it
+        """
+        entry = await self.get_cached_raw_document(filename)
+        if entry is not None:
+            try:
+                return open(entry.path, 'rb')
+            except OSError:
+                # Evicted in the meantime
+                pass
+        return await self.download_raw_document(filename)
+    
+    async def _put(self, url, data, description, timeout=None):
+        """PUT data, streaming file objects, and return the response, or None if it failed"""
+        headers = None
+        if hasattr(data, 'read'):
+            headers = {"Content-Length": str(get_file_size(data))}
+            data = iterate_in_threadpool(iter_file_chunks(data))
+        
+        try:
+            response = await self.client.put(url, content=data, headers=headers, timeout=timeout or self.timeout)
+            if response.status_code >= 400:
+                self.logger.error(f"Error uploading {description}: {response.status_code}")
+                return None
+            return response
+        except Exception as e:
+            self.logger.error(f"Error uploading {description}: {str(e)}")
+            return None
+    
+    async def _delete(self, url, description):
+        """DELETE a resource, treating a missing one as deleted"""
+        try:
+            response = await self.client.delete(url)
+            if response.status_code >= 400 and response.status_code != 404:
+                self.logger.error(f"Error deleting {description}: {response.status_code}")
+                return False
+            return True
+        except Exception as e:
+            self.logger.error(f"Error deleting {description}: {str(e)}")
+            return False
+    
+    async def add_document(self, filename, tags, file_data=None, content=None, truncated_by=None):
+        """
+        Add a document with metadata to WebDAV
+        
+        Args:
+            filename (str): Name of the document
+            tags (str): Comma-separated tags
+            file_data (bytes/file, optional): Binary file data, file objects are streamed
+            content (str, optional): Text content for embedding
+            truncated_by (str, optional): Extraction budget that cut the content short
+        
+        Returns:
+            bool: Success status
+        """
+        self.logger.info(f"Adding document: {filename} with tags: {tags}")
+        
+        # Embedding is CPU-bound, keep it off the event loop
+        metadata, chunk_embeddings = await run_in_threadpool(self.webdav.build_metadata, tags, content, truncated_by)
+        
+        doc_url = self.webdav._get_file_url(filename)
+        doc_content = file_data if file_data is not None else content.encode('utf-8') if content else b"Empty document"
+        
+        # Upload document and metadata concurrently
+        doc_response, (metadata_response, chunk_embeddings) = await asyncio.gather(
+            self._put(doc_url, doc_content, "document", self.transfer_timeout),
+            self._put_metadata(filename, metadata, chunk_embeddings)
+        )
+        success = doc_response is not None and metadata_response is not None
+        
+        if success:
+            self.cache.update_document(
+                self.webdav._document_from_metadata(filename, metadata, chunk_embeddings),
+                metadata_response.headers.get('ETag')
+            )
+        
+        return success
+    
+    async def _put_metadata(self, filename, metadata, chunk_embeddings):
+        """
+        Upload the chunk vector sidecar of a document, then its metadata
+        
+        Args:
+            filename (str): Name of the document
+            metadata (dict): Metadata, its chunk_count is reset if the sidecar upload fails
+            chunk_embeddings (np.ndarray): Chunk vectors, see WebDAVService.build_metadata
+            
+        Returns:
+            tuple: (metadata response or None if it failed, chunk vectors or None if not stored)
+        """
+        if chunk_embeddings is not None:
+            chunks_url = self.webdav._get_file_url(f"{filename}{CHUNKS_SUFFIX}")
+            data = encode_embedding_file(chunk_embeddings, self.webdav.embedding_dtype)
+            if await self._put(chunks_url, data, "chunk vectors") is None:
+                # The document is still found by its pooled vector
+                metadata["chunk_count"] = 0
+                chunk_embeddings = None
+        
+        metadata_url = self.webdav._get_file_url(f"{filename}.metadata.json")
+        return await self._put(metadata_url, json.dumps(metadata), "metadata"), chunk_embeddings
+    
+    async def delete_document(self, doc_id):
+        """
+        Delete a document and its metadata from WebDAV
+        
+        Args:
+            doc_id (str): Document ID (filename)
+        
+        Returns:
+            bool: Success status
+        """
+        self.logger.info(f"Deleting document: {doc_id}")
+        
+        results = await asyncio.gather(
+            self._delete(self.webdav._get_file_url(doc_id), "document"),
+            self._delete(self.webdav._get_file_url(f"{doc_id}.metadata.json"), "metadata"),
+            # A leftover sidecar is ignored and overwritten by a new upload
+            self._delete(self.webdav._get_file_url(f"{doc_id}{CHUNKS_SUFFIX}"), "chunk vectors")
+        )
+        success = all(results[:2])
+        
+        if success:
+            self.cache.delete_document(doc_id)
+        
+        return success
+    
+    async def move_file_with_metadata(self, filename, tags, content=None, file_data=None, truncated_by=None):
+        """
+        Move a file from raw documents folder to the documents folder and add metadata
+        
+        The metadata is written first and the file is moved server-side,
+        falling back to copying it through this server if the MOVE is refused.
+        
+        Args:
+            filename (str): Filename (will be used in target folder)
+            tags (str): Comma-separated tags
+            content (str, optional): Text content for embedding
+            file_data (bytes/file, optional): File data if already downloaded, used by the fallback
+            truncated_by (str, optional): Extraction budget that cut the content short
+            
+        Returns:
+            bool: Success status
+        """
+        self.logger.info(f"Moving file {filename} from raw documents to documents folder with tags: {tags}")
+        
+        metadata, chunk_embeddings = await run_in_threadpool(self.webdav.build_metadata, tags, content, truncated_by)
+        metadata_response, chunk_embeddings = await self._put_metadata(filename, metadata, chunk_embeddings)
+        if metadata_response is None:
+            return False
+        
+        success = await self._move_raw_document(filename)
+        if not success:
+            self.logger.info(f"Server-side move of {filename} failed, copying it instead")
+            success = await self._copy_raw_document(filename, file_data)
+        
+        if success:
+            self.cache.update_document(
+                self.webdav._document_from_metadata(filename, metadata, chunk_embeddings),
+                metadata_response.headers.get('ETag')
+            )
+            if self.blob_cache is not None:
+                self.blob_cache.discard(self.webdav._get_file_url_raw_folder(filename))
+        else:
+            # Don't leave metadata behind for a document that never arrived
+            await asyncio.gather(
+                self._delete(self.webdav._get_file_url(f"{filename}.metadata.json"), "metadata of unmoved file"),
+                self._delete(self.webdav._get_file_url(f"{filename}{CHUNKS_SUFFIX}"), "chunk vectors of unmoved file")
+            )
+        
+        return success
+    
+    async def _move_raw_document(self, filename):
+        """Move a file from the raw documents folder with a server-side WebDAV MOVE"""
+        try:
+            response = await self.client.request(
+                "MOVE",
+                self.webdav._get_file_url_raw_folder(filename),
+                headers={"Destination": self.webdav._get_file_url(filename), "Overwrite": "T"}
+            )
+            if response.status_code >= 400:
+                self.logger.warning(f"WebDAV MOVE of {filename} failed: {response.status_code}")
+                return False
+            return True
+        except Exception as e:
+            self.logger.warning(f"WebDAV MOVE of {filename} failed: {str(e)}")
+            return False
+    
+    async def _copy_raw_document(self, filename, file_data=None):
+        """Copy a file from the raw documents folder through this server and delete the source"""
+        downloaded = file_data is None
+        if downloaded:
+            file_data = await self.download_raw_document(filename)
+            if file_data is None:
+                return False
+        
+        try:
+            response = await self._put(self.webdav._get_file_url(filename), file_data, "document",
+                                       self.transfer_timeout)
+        finally:
+            if downloaded:
+                file_data.close()
+        
+        if response is None:
+            return False
+        
+        # Delete the original file
+        await self._delete(self.webdav._get_file_url_raw_folder(filename), "source file")
+        return True
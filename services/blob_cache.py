@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from utils.file import ensure_dir_exists
+
+class BlobEntry:
+    """Cached copy of one version of a WebDAV file"""
+    
+    def __init__(self, key, path, etag, last_modified=None, size=0):
+        """
+        Args:
+            key (str): WebDAV URL of the file
+            path (str): Local path of the cached copy
+            etag (str): ETag of the cached version
+            last_modified (str, optional): Last-Modified header of the cached version
+            size (int): Size in bytes
+        """
+        self.key = key
+        self.path = path
+        self.etag = etag
+        self.last_modified = last_modified
+        self.size = size
+        self.validated_at = 0  # When WebDAV last confirmed this version is current
+        self.readers = 0  # Responses still sending the file, see BlobCache.pin
+        self.removed = False  # Dropped from the cache while being read
+
+class BlobCache:
+    """
+    Local disk cache for document bodies, keyed by WebDAV URL and ETag.
+    
+    Each version is stored under the hash of its URL and ETag, next to a
+    small JSON sidecar so the cache survives restarts. The cache is bounded
+    by total size and evicts the least recently used files first. Entries
+    validated within revalidate_after seconds are served without asking
+    WebDAV; older ones are revalidated with a conditional GET. A pinned entry
+    keeps its file on disk until it is released, even if it is evicted.
+    """
+    
+    def __init__(self, directory, max_bytes=2 * 1024 ** 3, revalidate_after=30):
+        """
+        Open or create the cache directory
+        
+        Args:
+            directory (str): Directory for cached files
+            max_bytes (int): Maximum total size of cached files
+            revalidate_after (float): Seconds a validated entry is served without revalidation
+        """
+        self.logger = logging.getLogger(__name__)
+        self.directory = ensure_dir_exists(directory)
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # {key: BlobEntry}, least recently used first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._load_entries()
+    
+    @staticmethod
+    def _blob_name(key, etag):
+        """Get the file name of one version of a file"""
+        return hashlib.sha256(f"{key}\n{etag}".encode('utf-8')).hexdigest()
+    
+    def _load_entries(self):
+        """Index the files cached by previous runs, oldest first"""
+        found = []
+        for name in os.listdir(self.directory):
+            if name.startswith('.download-'):
+                # Left behind by an interrupted download
+                self._remove_files(os.path.join(self.directory, name))
+                continue
+            if not name.endswith('.json'):
+                if not os.path.exists(os.path.join(self.directory, f"{name}.json")):
+                    # Evicted while it was being sent
+                    self._remove_files(os.path.join(self.directory, name))
+                continue
+            
+            sidecar_path = os.path.join(self.directory, name)
+            blob_path = sidecar_path[:-len('.json')]
+            try:
+                with open(sidecar_path) as sidecar:
+                    info = json.load(sidecar)
+                found.append((os.path.getmtime(blob_path), BlobEntry(
+                    info['key'], blob_path, info['etag'], info.get('last_modified'), os.path.getsize(blob_path)
+                )))
+            except (OSError, ValueError, KeyError):
+                self._remove_files(blob_path)
+        
+        for _, entry in sorted(found, key=lambda item: item[0]):
+            previous = self.entries.pop(entry.key, None)
+            if previous is not None:
+                self.total_bytes -= previous.size
+                self._remove_files(previous.path)
+            self.entries[entry.key] = entry
+            self.total_bytes += entry.size
+        
+        if self.entries:
+            self.logger.info(f"Indexed {len(self.entries)} cached files ({self.total_bytes} bytes)")
+    
+    def get(self, key):
+        """
+        Look up the cached version of a file
+        
+        Args:
+            key (str): WebDAV URL of the file
+        
+        Returns:
+            BlobEntry: Cached entry, or None if the file is not cached
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or not os.path.exists(entry.path):
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+    
+    def pin(self, entry):
+        """
+        Keep the file of an entry on disk until release() is called
+        
+        Args:
+            entry (BlobEntry): Entry returned by get() or put()
+        
+        Returns:
+            bool: False if the entry was dropped from the cache in the meantime
+        """
+        with self.lock:
+            if self.entries.get(entry.key) is not entry:
+                return False
+            entry.readers += 1
+            return True
+    
+    def release(self, entry):
+        """Release a pinned entry, deleting its file if it was dropped in the meantime"""
+        with self.lock:
+            entry.readers -= 1
+            current = self.entries.get(entry.key)
+            if entry.removed and not entry.readers and (current is None or current.path != entry.path):
+                self._remove_files(entry.path)
+    
+    def is_fresh(self, entry):
+        """Check whether an entry was validated recently enough to skip revalidation"""
+        return time.monotonic() - entry.validated_at < self.revalidate_after
+    
+    def mark_validated(self, entry):
+        """Record that WebDAV confirmed an entry is current"""
+        entry.validated_at = time.monotonic()
+        try:
+            os.utime(entry.path)
+        except OSError:
+            pass
+    
+    def fits(self, size):
+        """Check whether a file of the given size may be cached at all"""
+        return size is None or size <= self.max_bytes
+    
+    def create_temp_file(self):
+        """
+        Create a file to download a new version into
+        
+        Returns:
+            file: Open binary file in the cache directory, pass it to put()
+        """
+        return tempfile.NamedTemporaryFile(dir=self.directory, prefix='.download-', delete=False)
+    
+    def put(self, key, etag, last_modified, temp_file):
+        """
+        Add a downloaded version, replacing older versions of the file
+        
+        Args:
+            key (str): WebDAV URL of the file
+            etag (str): ETag of the downloaded version
+            last_modified (str, optional): Last-Modified header of the downloaded version
+            temp_file: File from create_temp_file() holding the body
+        
+        Returns:
+            BlobEntry: New entry, or None if the file could not be cached
+        """
+        temp_file.close()
+        blob_path = os.path.join(self.directory, self._blob_name(key, etag))
+        
+        try:
+            size = os.path.getsize(temp_file.name)
+            if not self.fits(size):
+                os.remove(temp_file.name)
+                return None
+            
+            os.replace(temp_file.name, blob_path)
+            with open(f"{blob_path}.json", 'w') as sidecar:
+                json.dump({'key': key, 'etag': etag, 'last_modified': last_modified}, sidecar)
+        except OSError as e:
+            self.logger.error(f"Error caching {key}: {str(e)}")
+            self._remove_files(temp_file.name)
+            return None
+        
+        entry = BlobEntry(key, blob_path, etag, last_modified, size)
+        self.mark_validated(entry)
+        
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous.size
+                if previous.path != blob_path:
+                    self._drop(previous)
+            self.entries[key] = entry
+            self.total_bytes += size
+            self._evict()
+        
+        return entry
+    
+    def discard(self, key):
+        """
+        Remove a file from the cache, e.g. after it was moved or deleted on WebDAV
+        
+        Args:
+            key (str): WebDAV URL of the file
+        """
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry.size
+                self._drop(entry)
+    
+    def _evict(self):
+        """Remove least recently used files until the cache fits its size limit"""
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, entry = self.entries.popitem(last=False)
+            self.total_bytes -= entry.size
+            self._drop(entry)
+            self.logger.debug(f"Evicted cached file {entry.key}")
+    
+    def _drop(self, entry):
+        """Delete the files of an entry removed from the index, once no response reads them"""
+        if entry.readers:
+            # The sidecar goes now so a restart does not index the file again
+            entry.removed = True
+            self._remove_files(f"{entry.path}.json", sidecar=False)
+        else:
+            self._remove_files(entry.path)
+    
+    def _remove_files(self, blob_path, sidecar=True):
+        """Delete a cached file and its sidecar"""
+        for path in (blob_path, f"{blob_path}.json") if sidecar else (blob_path,):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.logger.error(f"Error removing cached file {path}: {str(e)}")
+    
+    def get_stats(self):
+        """Get cache statistics"""
+        with self.lock:
+            return {
+                "cached_files": len(self.entries),
+                "cached_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
@@ -0,0 +1,96 @@
+import time
+import logging
+import threading
+
+class CacheRefresher:
+    """
+    Background refresher keeping the document cache close to the WebDAV folder.
+    
+    A daemon thread syncs the cache every interval. Requests keep being
+    served from the cache while it revalidates (stale-while-revalidate) and
+    only nudge the thread when the cache is older than the staleness budget,
+    so no request ever waits for a refresh of a loaded cache. Several app
+    replicas sharing a folder converge within one interval.
+    """
+    
+    def __init__(self, webdav_service, interval=300, max_staleness=600):
+        """
+        Initialize the refresher
+        
+        Args:
+            webdav_service (WebDAVService): Service whose cache is refreshed
+            interval (float): Seconds between refreshes
+            max_staleness (float): Cache age in seconds after which a request triggers
+                                   an early refresh, None to only refresh on the interval
+        """
+        self.logger = logging.getLogger(__name__)
+        self.webdav = webdav_service
+        self.interval = interval
+        self.max_staleness = max_staleness
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.worker = None
+        self.last_error = None
+        self.last_duration = 0
+    
+    def start(self):
+        """Start the refresher thread, which loads the cache right away"""
+        if self.worker is not None:
+            return
+        
+        self.worker = threading.Thread(target=self._run, name="cache-refresher", daemon=True)
+        self.worker.start()
+        self.logger.info(f"Started cache refresher with interval {self.interval}s")
+    
+    def stop(self):
+        """Stop the refresher thread after its current refresh"""
+        self.stopping.set()
+        self.wakeup.set()
+    
+    def get_age(self):
+        """
+        Get the age of the cached data
+        
+        Returns:
+            float: Seconds since the cache was last synced, None if it was never loaded
+        """
+        last_reload_time = self.webdav.cache.last_reload_time
+        if not last_reload_time:
+            return None
+        return time.time() - last_reload_time
+    
+    def revalidate_if_stale(self):
+        """Trigger a background refresh if the cache is older than the staleness budget"""
+        if self.max_staleness is None or self.worker is None:
+            return
+        
+        age = self.get_age()
+        if age is not None and age > self.max_staleness and not self.wakeup.is_set():
+            self.logger.info(f"Cache is {age:.0f}s old, triggering refresh")
+            self.wakeup.set()
+    
+    def _run(self):
+        """Worker loop syncing the cache every interval or when woken up"""
+        while not self.stopping.is_set():
+            started = time.monotonic()
+            try:
+                if self.webdav.sync_cache() is None:
+                    self.last_error = "Listing the WebDAV folder failed"
+                else:
+                    self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                self.logger.error(f"Error refreshing document cache: {str(e)}")
+            self.last_duration = time.monotonic() - started
+            
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+    
+    def get_stats(self):
+        """Get refresher statistics"""
+        return {
+            "refresh_interval": f"{self.interval}s",
+            "max_staleness": f"{self.max_staleness}s" if self.max_staleness is not None else "None",
+            "last_refresh_duration": f"{self.last_duration:.2f}s",
+            "last_refresh_error": self.last_error or "None"
+        }
@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import numpy as np
+from typing import Any, Dict, List, Optional
+from utils.file import ensure_dir_exists
+
+class CacheSnapshot:
+    """
+    On-disk snapshot of the document cache for fast warm restarts.
+    
+    Documents, their metadata versions and their embeddings (as raw binary
+    blobs in stored precision) are written to a SQLite file. A snapshot is
+    written to a temporary file and then renamed over the previous one, so
+    a crash during a save never leaves a partial snapshot behind.
+    """
+    
+    # Bump when the table layout changes; older snapshots are ignored
+    FORMAT_VERSION = 2
+    
+    def __init__(self, path):
+        """
+        Initialize the snapshot
+        
+        Args:
+            path (str): SQLite snapshot file
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        ensure_dir_exists(os.path.dirname(path))
+    
+    @staticmethod
+    def _is_empty(embedding) -> bool:
+        """Check whether a document has no embedding of a kind"""
+        return embedding is None or len(embedding) == 0
+    
+    @staticmethod
+    def _from_blob(blob, dtype, dimension, matrix=False):
+        """Rebuild an embedding from its raw bytes"""
+        if blob is None:
+            return None
+        array = np.frombuffer(blob, dtype=dtype)
+        return array.reshape(-1, dimension) if matrix else array
+    
+    def save(self, documents: List[Dict[str, Any]], versions: Dict[str, Optional[str]]) -> bool:
+        """
+        Atomically replace the snapshot
+        
+        Args:
+            documents: Cached document dictionaries
+            versions: WebDAV metadata versions keyed by document ID
+        
+        Returns:
+            bool: Success status
+        """
+        tmp_path = f"{self.path}.tmp"
+        started = time.monotonic()
+        
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            
+            connection = sqlite3.connect(tmp_path)
+            try:
+                connection.execute("PRAGMA journal_mode=OFF")
+                connection.execute("PRAGMA synchronous=OFF")
+                connection.execute("CREATE TABLE info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+                connection.execute(
+                    """
+                    CREATE TABLE documents (
+                        id TEXT PRIMARY KEY,
+                        filename TEXT NOT NULL,
+                        tags TEXT NOT NULL,
+                        version TEXT,
+                        dtype TEXT,
+                        dimension INTEGER,
+                        embedding BLOB,
+                        chunk_embeddings BLOB,
+                        chunk_count INTEGER NOT NULL
+                    )
+                    """
+                )
+                
+                rows = []
+                for doc in documents:
+                    embedding = doc.get('embedding')
+                    chunk_embeddings = doc.get('chunk_embeddings')
+                    
+                    # Both embeddings share the dtype and dimension of whichever exists
+                    dtype = dimension = None
+                    for reference in (embedding, chunk_embeddings):
+                        if not self._is_empty(reference):
+                            reference = np.asarray(reference)
+                            dtype, dimension = reference.dtype.name, reference.shape[-1]
+                            break
+                    
+                    rows.append((
+                        doc['id'],
+                        doc.get('filename', doc['id']),
+                        json.dumps(doc.get('tags', [])),
+                        versions.get(doc['id']),
+                        dtype,
+                        dimension,
+                        None if self._is_empty(embedding) else np.asarray(embedding, dtype=dtype).tobytes(),
+                        None if self._is_empty(chunk_embeddings) else np.asarray(chunk_embeddings, dtype=dtype).tobytes(),
+                        doc.get('chunk_count', 0)
+                    ))
+                
+                connection.executemany("INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                connection.executemany(
+                    "INSERT INTO info VALUES (?, ?)",
+                    [("format_version", str(self.FORMAT_VERSION)), ("saved_at", str(time.time()))]
+                )
+                connection.commit()
+            finally:
+                connection.close()
+            
+            os.replace(tmp_path, self.path)
+            self.logger.info(f"Saved cache snapshot with {len(rows)} documents "
+                             f"in {time.monotonic() - started:.2f}s")
+            return True
+        
+        except (sqlite3.Error, OSError) as e:
+            self.logger.error(f"Error saving cache snapshot: {str(e)}")
+            return False
+    
+    def load(self):
+        """
+        Load the snapshot
+        
+        Returns:
+            tuple: (documents, versions, saved_at), or None if there is no usable snapshot
+        """
+        if not os.path.exists(self.path):
+            return None
+        
+        started = time.monotonic()
+        try:
+            connection = sqlite3.connect(self.path)
+            try:
+                info = dict(connection.execute("SELECT key, value FROM info").fetchall())
+                if int(info.get("format_version", 0)) != self.FORMAT_VERSION:
+                    self.logger.warning(f"Ignoring cache snapshot with format version "
+                                        f"{info.get('format_version')}")
+                    return None
+                
+                documents = []
+                versions = {}
+                for (doc_id, filename, tags, version, dtype, dimension,
+                     embedding, chunk_embeddings, chunk_count) in connection.execute("SELECT * FROM documents"):
+                    documents.append({
+                        'id': doc_id,
+                        'filename': filename,
+                        'tags': json.loads(tags),
+                        'embedding': self._from_blob(embedding, dtype, dimension),
+                        'chunk_embeddings': self._from_blob(chunk_embeddings, dtype, dimension, matrix=True),
+                        'chunk_count': chunk_count,
+                        'similarity': 0
+                    })
+                    versions[doc_id] = version
+            finally:
+                connection.close()
+            
+            self.logger.info(f"Loaded cache snapshot with {len(documents)} documents "
+                             f"in {time.monotonic() - started:.2f}s")
+            return documents, versions, float(info.get("saved_at", 0))
+        
+        except (sqlite3.Error, OSError, ValueError) as e:
+            self.logger.error(f"Error loading cache snapshot: {str(e)}")
+            return None
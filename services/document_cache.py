@@ -3,6 +3,7 @@ import logging
 import threading
 import time
 from typing import Dict, List, Optional, Any
+from services.embedding_matrix import EmbeddingMatrix
 
 class DocumentCache:
     """
@@ -12,13 +13,57 @@ class DocumentCache:
     and only reloads from WebDAV when documents are modified or added.
     """
     
-    def __init__(self):
-        """Initialize the document cache"""
+    # Separates the document ID from the chunk number in chunk index keys
+    CHUNK_KEY_SEPARATOR = '\x1f'
+    
+    def __init__(self, embedding_index=None, chunk_index=None):
+        """
+        Initialize the document cache
+        
+        Args:
+            embedding_index: Index for document embeddings, defaults to an exact EmbeddingMatrix
+            chunk_index: Index for per-chunk embeddings, None to disable chunk matching
+        """
         self.logger = logging.getLogger(__name__)
         self.documents = {}  # Document cache: {id: document_dict}
         self.is_loaded = False  # Flag to track if initial load has happened
         self.lock = threading.RLock()  # Thread-safe lock for cache operations
         self.last_reload_time = 0  # Track when cache was last reloaded
+        self.load_progress = (0, 0)  # (metadata files read, total) of the current load
+        # Embedding index kept in sync with self.documents
+        self.embedding_index = embedding_index if embedding_index is not None else EmbeddingMatrix()
+        self.chunk_index = chunk_index
+        self.chunk_keys = {}  # Chunk index keys per document: {id: [key, ...]}
+        self.versions = {}  # WebDAV version (ETag) of each document's metadata: {id: version}
+        self.revision = 0  # Incremented on every change, used to detect unsaved changes
+    
+    @classmethod
+    def chunk_key(cls, doc_id: str, chunk_number: int) -> str:
+        """Get the chunk index key of one chunk of a document"""
+        return f"{doc_id}{cls.CHUNK_KEY_SEPARATOR}{chunk_number}"
+    
+    @classmethod
+    def chunk_doc_id(cls, chunk_key: str) -> str:
+        """Get the document ID from a chunk index key"""
+        return chunk_key.rsplit(cls.CHUNK_KEY_SEPARATOR, 1)[0]
+    
+    def _index_chunks(self, doc_id: str, chunk_embeddings) -> None:
+        """Replace the chunk index entries of a document"""
+        if self.chunk_index is None:
+            return
+        
+        for key in self.chunk_keys.pop(doc_id, []):
+            self.chunk_index.remove(key)
+        
+        keys = []
+        if chunk_embeddings is None:
+            chunk_embeddings = []
+        for chunk_number, embedding in enumerate(chunk_embeddings):
+            key = self.chunk_key(doc_id, chunk_number)
+            if self.chunk_index.add(key, embedding):
+                keys.append(key)
+        if keys:
+            self.chunk_keys[doc_id] = keys
     
     def get_all_documents(self) -> List[Dict[str, Any]]:
         """
@@ -44,12 +89,33 @@ class DocumentCache:
         with self.lock:
             return self.documents.get(doc_id)
     
-    def update_document(self, document: Dict[str, Any]) -> None:
+    def get_snapshot(self):
+        """
+        Get a consistent copy of the cached documents for saving
+        
+        Returns:
+            tuple: (documents, versions, revision)
+        """
+        with self.lock:
+            return list(self.documents.values()), dict(self.versions), self.revision
+    
+    def get_versions(self) -> Dict[str, Optional[str]]:
+        """
+        Get the metadata versions the cached documents were loaded from
+        
+        Returns:
+            dict: Copy of the versions keyed by document ID, None if unknown
+        """
+        with self.lock:
+            return dict(self.versions)
+    
+    def update_document(self, document: Dict[str, Any], version: Optional[str] = None) -> None:
         """
         Update or add a document in the cache
         
         Args:
             document: Document dictionary
+            version: WebDAV version of the document's metadata, None if unknown
         """
         if not document or 'id' not in document:
             self.logger.warning("Attempted to update document with missing ID")
@@ -58,6 +124,10 @@ class DocumentCache:
         with self.lock:
             doc_id = document['id']
             self.documents[doc_id] = document
+            self.versions[doc_id] = version
+            self.revision += 1
+            self.embedding_index.add(doc_id, document.get('embedding'))
+            self._index_chunks(doc_id, document.get('chunk_embeddings'))
             self.logger.debug(f"Updated document in cache: {doc_id}")
     
     def delete_document(self, doc_id: str) -> None:
@@ -70,15 +140,22 @@ class DocumentCache:
         with self.lock:
             if doc_id in self.documents:
                 del self.documents[doc_id]
+                self.versions.pop(doc_id, None)
+                self.revision += 1
+                self.embedding_index.remove(doc_id)
+                self._index_chunks(doc_id, [])
                 self.logger.debug(f"Deleted document from cache: {doc_id}")
     
-    def set_documents(self, documents: List[Dict[str, Any]]) -> None:
+    def set_documents(self, documents: List[Dict[str, Any]],
+                      versions: Optional[Dict[str, str]] = None) -> None:
         """
         Set the entire document cache (used for initial load)
         
         Args:
             documents: List of document dictionaries
+            versions: WebDAV versions of the documents' metadata, keyed by document ID
         """
+        versions = versions or {}
         with self.lock:
             # Clear existing documents
             self.documents = {}
@@ -89,15 +166,146 @@ class DocumentCache:
                     self.documents[doc['id']] = doc
                 else:
                     self.logger.warning(f"Skipping document with missing ID: {doc}")
+            self.versions = {doc_id: versions.get(doc_id) for doc_id in self.documents}
+            self.revision += 1
+            
+            self.embedding_index.sync(list(self.documents.values()))
+            if self.chunk_index is not None:
+                chunks = []
+                self.chunk_keys = {}
+                for doc_id, doc in self.documents.items():
+                    chunk_embeddings = doc.get('chunk_embeddings')
+                    if chunk_embeddings is None:
+                        continue
+                    for chunk_number, embedding in enumerate(chunk_embeddings):
+                        key = self.chunk_key(doc_id, chunk_number)
+                        chunks.append({'id': key, 'embedding': embedding})
+                        self.chunk_keys.setdefault(doc_id, []).append(key)
+                self.chunk_index.sync(chunks)
             
             self.is_loaded = True
             self.last_reload_time = time.time()
             self.logger.info(f"Loaded {len(self.documents)} documents into cache")
     
+    def apply_changes(self, documents: List[Dict[str, Any]], deleted_ids: List[str],
+                      versions: Dict[str, str], expected_versions: Dict[str, Optional[str]]) -> int:
+        """
+        Apply the result of an incremental sync
+        
+        A document is only replaced or deleted if its cached version still
+        equals the version the sync was computed against, so a document
+        written by this process while the sync was running is not overwritten
+        with older metadata.
+        
+        Args:
+            documents: Added or changed documents
+            deleted_ids: IDs of documents that no longer exist
+            versions: New WebDAV versions of the documents, keyed by document ID
+            expected_versions: Cached versions the sync was computed against
+            
+        Returns:
+            int: Number of documents skipped because they changed concurrently
+        """
+        skipped = 0
+        with self.lock:
+            for doc in documents:
+                doc_id = doc['id']
+                if self.versions.get(doc_id) != expected_versions.get(doc_id):
+                    skipped += 1
+                    continue
+                self.update_document(doc, versions.get(doc_id))
+            
+            for doc_id in deleted_ids:
+                if doc_id not in self.versions or self.versions[doc_id] != expected_versions.get(doc_id):
+                    skipped += 1
+                    continue
+                self.delete_document(doc_id)
+            
+            self.is_loaded = True
+            self.last_reload_time = time.time()
+        
+        return skipped
+    
+    def get_missing_chunks(self) -> Dict[str, Optional[str]]:
+        """
+        Get the documents whose chunk vectors are stored but not loaded yet
+        
+        Returns:
+            dict: Metadata version keyed by document ID, empty if chunk matching is disabled
+        """
+        with self.lock:
+            if self.chunk_index is None:
+                return {}
+            return {
+                doc_id: self.versions.get(doc_id)
+                for doc_id, doc in self.documents.items()
+                if doc.get('chunk_count') and doc.get('chunk_embeddings') is None
+            }
+    
+    def set_chunk_embeddings(self, doc_id: str, chunk_embeddings, version: Optional[str]) -> bool:
+        """
+        Add the chunk vectors of a cached document loaded after its metadata
+        
+        Args:
+            doc_id: Document ID
+            chunk_embeddings: Chunk vectors of the document
+            version: Metadata version the chunk vectors were fetched for
+            
+        Returns:
+            bool: Whether they were added, False if the document changed in the meantime
+        """
+        with self.lock:
+            doc = self.documents.get(doc_id)
+            if doc is None or self.versions.get(doc_id) != version:
+                return False
+            self.documents[doc_id] = {**doc, 'chunk_embeddings': chunk_embeddings}
+            self.revision += 1
+            self._index_chunks(doc_id, chunk_embeddings)
+            return True
+    
+    def mark_chunks_missing(self, doc_id: str, version: Optional[str]) -> bool:
+        """
+        Record that a cached document has no readable chunk vectors, so they are not fetched again
+        
+        The document keeps matching by its pooled vector. A new metadata
+        version replaces the document and lets its chunks be fetched again.
+        
+        Args:
+            doc_id: Document ID
+            version: Metadata version the chunk vectors were fetched for
+            
+        Returns:
+            bool: Whether the miss was recorded, False if the document changed in the meantime
+        """
+        with self.lock:
+            doc = self.documents.get(doc_id)
+            if doc is None or self.versions.get(doc_id) != version:
+                return False
+            self.documents[doc_id] = {**doc, 'chunk_count': 0}
+            self.revision += 1
+            return True
+    
+    def set_load_progress(self, done: int, total: int) -> None:
+        """
+        Record the progress of a running load
+        
+        Args:
+            done: Number of metadata files read so far
+            total: Number of metadata files to read
+        """
+        with self.lock:
+            self.load_progress = (done, total)
+    
     def clear(self) -> None:
         """Clear the entire cache"""
         with self.lock:
             self.documents = {}
+            self.embedding_index.rebuild([])
+            if self.chunk_index is not None:
+                self.chunk_index.rebuild([])
+            self.chunk_keys = {}
+            self.versions = {}
+            self.revision += 1
             self.is_loaded = False
             self.logger.info("Document cache cleared")
     
@@ -107,7 +315,11 @@ class DocumentCache:
             stats = {
                 "document_count": len(self.documents),
                 "is_loaded": self.is_loaded,
+                "load_progress": f"{self.load_progress[0]}/{self.load_progress[1]}",
+                "indexed_embeddings": len(self.embedding_index),
+                "indexed_chunks": len(self.chunk_index) if self.chunk_index is not None else 0,
                 "last_reload": time.strftime("%Y-%m-%d %H:%M:%S", 
-                                            time.localtime(self.last_reload_time)) if self.last_reload_time else "Never"
+                                            time.localtime(self.last_reload_time)) if self.last_reload_time else "Never",
+                "staleness": f"{time.time() - self.last_reload_time:.0f}s" if self.last_reload_time else "Never loaded"
             }
             return stats
\ No newline at end of file
@@ -32,65 +32,32 @@ class DocumentService:
             self.logger.error(f"Error fetching documents: {str(e)}")
             return []
     
-    def add_document(self, filename, tags, file_data=None, text_content=None):
+    def get_document(self, doc_id):
         """
-        Add a document with metadata
+        Get a single cached document
         
         Args:
-            filename (str): Document filename
-            tags (str): Comma-separated tags
-            file_data (bytes, optional): File binary data
-            text_content (str, optional): Extracted text for embedding
+            doc_id (str): Document ID
             
         Returns:
-            bool: Success status
+            dict: Document dictionary or None if not found
         """
-        self.logger.info(f"Adding document: {filename}")
-        
-        try:
-            # Use the webdav service to add the document
-            # This will also update the cache
-            success = self.webdav.add_document(
-                filename=filename,
-                tags=tags,
-                file_data=file_data,
-                content=text_content
-            )
-            
-            if success:
-                self.logger.info(f"Successfully added document: {filename}")
-            else:
-                self.logger.error(f"Failed to add document: {filename}")
-                
-            return success
-            
-        except Exception as e:
-            self.logger.error(f"Error adding document {filename}: {str(e)}")
-            return False
+        return self.webdav.cache.get_document(doc_id)
     
-    def delete_document(self, doc_id):
+    def get_embedding_index(self):
         """
-        Delete a document and its metadata
+        Get the embedding index of all documents
         
-        Args:
-            doc_id (str): Document ID
-            
         Returns:
-            bool: Success status
+            EmbeddingMatrix or FaissIndex: Index kept in sync with the document cache
         """
-        self.logger.info(f"Deleting document: {doc_id}")
+        return self.webdav.get_embedding_index()
+    
+    def get_chunk_index(self):
+        """
+        Get the per-chunk embedding index of all documents
         
-        try:
-            # This will also update the cache
-            success = self.webdav.delete_document(doc_id)
-            
-            if success:
-                self.logger.info(f"Successfully deleted document: {doc_id}")
-            else:
-                self.logger.error(f"Failed to delete document: {doc_id}")
-                
-            return success
-            
-        except Exception as e:
-            self.logger.error(f"Error deleting document {doc_id}: {str(e)}")
-            return False
\ No newline at end of file
+        Returns:
+            EmbeddingMatrix or FaissIndex: Chunk index, or None if chunk matching is disabled
+        """
+        return self.webdav.get_chunk_index()
\ No newline at end of file
@@ -0,0 +1,110 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import List
+
+class EmbeddingBatcher:
+    """
+    Micro-batching worker for one embedding model.
+    
+    Callers submit single texts and get a Future back. A background thread
+    collects the requests that arrive within a short window and encodes them
+    with one model.encode call, so concurrent uploads share a forward pass
+    instead of each running a batch of size one.
+    """
+    
+    def __init__(self, model, max_batch_size=32, max_wait_ms=10):
+        """
+        Initialize the batcher and start its worker thread
+        
+        Args:
+            model: Loaded SentenceTransformer model
+            max_batch_size (int): Maximum number of texts encoded together
+            max_wait_ms (int): Maximum time to wait for a batch to fill up
+        """
+        self.logger = logging.getLogger(__name__)
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000
+        self.requests = queue.Queue()
+        self.worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self.worker.start()
+    
+    def submit(self, text: str) -> Future:
+        """
+        Queue a text for embedding
+        
+        Args:
+            text (str): Text to generate embedding for
+        
+        Returns:
+            Future: Resolves to the embedding vector as a list
+        """
+        future = Future()
+        self.requests.put((text, future))
+        return future
+    
+    def encode(self, text: str) -> List[float]:
+        """
+        Embed a text, blocking until its batch has been encoded
+        
+        Args:
+            text (str): Text to generate embedding for
+        
+        Returns:
+            list: Embedding vector as a list
+        """
+        return self.submit(text).result()
+    
+    def encode_many(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several texts, letting them share batches with other callers
+        
+        Args:
+            texts (list): Texts to generate embeddings for
+        
+        Returns:
+            list: Embedding vectors in the order of the texts
+        """
+        futures = [self.submit(text) for text in texts]
+        return [future.result() for future in futures]
+    
+    def _collect_batch(self):
+        """Block for the first request, then gather more until the batch is full or the window ends"""
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self.requests.get_nowait())
+                else:
+                    batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        return batch
+    
+    def _run(self):
+        """Worker loop encoding one batch at a time"""
+        while True:
+            batch = self._collect_batch()
+            
+            # Skip requests whose callers have given up
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            
+            texts = [text for text, _ in batch]
+            try:
+                embeddings = self.model.encode(texts, batch_size=len(texts))
+                self.logger.debug(f"Encoded batch of {len(texts)} texts")
+                for (_, future), embedding in zip(batch, embeddings):
+                    future.set_result(embedding.tolist())
+            except Exception as e:
+                self.logger.error(f"Error encoding batch of {len(texts)} texts: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
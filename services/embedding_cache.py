@@ -0,0 +1,76 @@
+import hashlib
+import numpy as np
+from typing import Dict, List
+from services.sqlite_lru_store import SQLiteLRUStore
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by model name and content hash.
+    
+    Vectors are stored as float32 blobs in a local SQLite database, keyed by
+    (model name, SHA-256 of the text). The cache is bounded by entry count and
+    evicts the least recently used entries first, so embedding the same
+    content again only costs a lookup.
+    """
+    
+    def __init__(self, path, max_entries=100000):
+        """
+        Open or create the cache database
+        
+        Args:
+            path (str): SQLite database file
+            max_entries (int): Maximum number of cached vectors
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.store = SQLiteLRUStore(path, 'embeddings', 'model', [('vector', 'BLOB NOT NULL')],
+                                    max_entries, 'embedding')
+    
+    @staticmethod
+    def content_hash(text: str) -> str:
+        """
+        Hash text for use as a cache key
+        
+        Args:
+            text (str): Text that is embedded
+        
+        Returns:
+            str: Hex SHA-256 digest of the UTF-8 text
+        """
+        return hashlib.sha256(text.encode('utf-8', errors='replace')).hexdigest()
+    
+    def get_many(self, model_name: str, content_hashes: List[str]) -> Dict[str, List[float]]:
+        """
+        Look up cached embeddings
+        
+        Args:
+            model_name (str): Name of the embedding model
+            content_hashes (list): Content hashes of the texts, see content_hash()
+        
+        Returns:
+            dict: Embeddings of the cached texts, keyed by content hash
+        """
+        rows = self.store.get_many(model_name, content_hashes)
+        return {content_hash: np.frombuffer(vector, dtype=np.float32).tolist()
+                for content_hash, (vector,) in rows.items()}
+    
+    def put_many(self, model_name: str, embeddings: Dict[str, List[float]]) -> None:
+        """
+        Store embeddings and evict the least recently used entries if over the limit
+        
+        Args:
+            model_name (str): Name of the embedding model
+            embeddings (dict): Embedding vectors keyed by content hash
+        """
+        if not embeddings:
+            return
+        
+        self.store.put_many(model_name, {
+            content_hash: (np.asarray(vector, dtype=np.float32).tobytes(),)
+            for content_hash, vector in embeddings.items()
+            if vector is not None and len(vector) > 0
+        })
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get cache statistics"""
+        return self.store.get_stats()
\ No newline at end of file
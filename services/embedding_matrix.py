@@ -0,0 +1,236 @@
+import logging
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Any, Tuple
+
+class EmbeddingMatrix:
+    """
+    Contiguous, pre-normalized float32 matrix of document embeddings.
+    
+    Row i of the matrix holds the unit-length embedding of the document whose
+    ID is at position i of the parallel ID array, so a query is a single
+    matrix-vector product instead of a Python loop over all documents.
+    """
+    
+    def __init__(self, initial_capacity: int = 1024):
+        """
+        Initialize an empty embedding matrix
+        
+        Args:
+            initial_capacity: Number of rows to preallocate once the dimension is known
+        """
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.RLock()
+        self.initial_capacity = initial_capacity
+        self.dimension = None
+        self.matrix = None  # Preallocated (capacity, dimension) float32 buffer
+        self.ids = np.empty(0, dtype=object)  # Parallel array of document IDs
+        self.rows = {}  # Row lookup: {doc_id: row_index}
+        self.size = 0
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def __contains__(self, doc_id: str) -> bool:
+        with self.lock:
+            return doc_id in self.rows
+    
+    @staticmethod
+    def normalize(embedding) -> Optional[np.ndarray]:
+        """
+        Convert an embedding to a unit-length float32 vector
+        
+        Args:
+            embedding: Embedding as a list or numpy array
+        
+        Returns:
+            np.ndarray: Normalized vector, or None if the embedding is empty or zero
+        """
+        if embedding is None or len(embedding) == 0:
+            return None
+        
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+    
+    def rebuild(self, documents: List[Dict[str, Any]]) -> None:
+        """
+        Rebuild the matrix from a list of documents
+        
+        Args:
+            documents: List of document dictionaries with 'id' and 'embedding'
+        """
+        with self.lock:
+            self.dimension = None
+            self.matrix = None
+            self.ids = np.empty(0, dtype=object)
+            self.rows = {}
+            self.size = 0
+            
+            for doc in documents:
+                if 'id' in doc:
+                    self.add(doc['id'], doc.get('embedding'))
+            
+            self.logger.info(f"Built embedding matrix with {self.size} rows")
+    
+    def sync(self, documents: List[Dict[str, Any]]) -> None:
+        """
+        Bring the matrix in line with a list of documents
+        
+        The matrix is cheap to build in memory, so this is a full rebuild.
+        
+        Args:
+            documents: List of document dictionaries with 'id' and 'embedding'
+        """
+        self.rebuild(documents)
+    
+    def save(self) -> bool:
+        """The in-memory matrix is not persisted"""
+        return False
+    
+    def load(self) -> bool:
+        """The in-memory matrix is not persisted"""
+        return False
+    
+    def add(self, doc_id: str, embedding) -> bool:
+        """
+        Add or replace the embedding of a document
+        
+        Args:
+            doc_id: Document ID
+            embedding: Embedding as a list or numpy array
+        
+        Returns:
+            bool: True if the embedding was stored
+        """
+        vector = self.normalize(embedding)
+        
+        with self.lock:
+            if vector is None:
+                # A document without a usable embedding must not keep a stale row
+                self.remove(doc_id)
+                return False
+            
+            if self.dimension is None:
+                self.dimension = vector.shape[0]
+            elif vector.shape[0] != self.dimension:
+                self.logger.warning(f"Embedding dimension mismatch for {doc_id}: "
+                                    f"{vector.shape[0]} vs {self.dimension}")
+                self.remove(doc_id)
+                return False
+            
+            row = self.rows.get(doc_id)
+            if row is None:
+                self._ensure_capacity(self.size + 1)
+                row = self.size
+                self.rows[doc_id] = row
+                self.ids[row] = doc_id
+                self.size += 1
+            
+            self.matrix[row] = vector
+            return True
+    
+    def remove(self, doc_id: str) -> bool:
+        """
+        Remove the embedding of a document
+        
+        The last row is moved into the freed slot so the matrix stays contiguous.
+        
+        Args:
+            doc_id: Document ID
+        
+        Returns:
+            bool: True if a row was removed
+        """
+        with self.lock:
+            row = self.rows.pop(doc_id, None)
+            if row is None:
+                return False
+            
+            last = self.size - 1
+            if row != last:
+                moved_id = self.ids[last]
+                self.matrix[row] = self.matrix[last]
+                self.ids[row] = moved_id
+                self.rows[moved_id] = row
+            
+            self.ids[last] = None
+            self.size = last
+            return True
+    
+    def scores(self, query_embedding) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compute cosine similarity between a query and every stored document
+        
+        Args:
+            query_embedding: Query embedding as a list or numpy array
+        
+        Returns:
+            tuple: (ids, scores) arrays in matrix row order
+        """
+        query = self.normalize(query_embedding)
+        
+        with self.lock:
+            if query is None or self.size == 0 or query.shape[0] != self.dimension:
+                return np.empty(0, dtype=object), np.empty(0, dtype=np.float32)
+            
+            scores = self.matrix[:self.size] @ query
+            return self.ids[:self.size].copy(), scores
+    
+    def top_k(self, query_embedding, k: int) -> List[Tuple[str, float]]:
+        """
+        Get the k most similar documents to a query
+        
+        Uses argpartition so only the selected k rows are sorted.
+        
+        Args:
+            query_embedding: Query embedding as a list or numpy array
+            k: Number of results to return
+        
+        Returns:
+            list: (doc_id, score) pairs sorted by descending score
+        """
+        ids, scores = self.scores(query_embedding)
+        return self.select_top_k(ids, scores, k)
+    
+    @staticmethod
+    def select_top_k(ids: np.ndarray, scores: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """
+        Select the k highest scores from already computed (ids, scores) arrays
+        
+        Args:
+            ids: Document IDs as returned by scores()
+            scores: Similarity scores as returned by scores()
+            k: Number of results to return
+        
+        Returns:
+            list: (doc_id, score) pairs sorted by descending score
+        """
+        n = len(scores)
+        if n == 0 or k <= 0:
+            return []
+        
+        if k < n:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(n)
+        
+        order = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(ids[i], float(scores[i])) for i in order]
+    
+    def _ensure_capacity(self, required: int) -> None:
+        """Grow the preallocated buffers geometrically to fit the required rows"""
+        capacity = 0 if self.matrix is None else self.matrix.shape[0]
+        if required <= capacity:
+            return
+        
+        new_capacity = max(self.initial_capacity, capacity * 2, required)
+        matrix = np.zeros((new_capacity, self.dimension), dtype=np.float32)
+        ids = np.empty(new_capacity, dtype=object)
+        if self.size:
+            matrix[:self.size] = self.matrix[:self.size]
+            ids[:self.size] = self.ids[:self.size]
+        self.matrix = matrix
+        self.ids = ids
@@ -0,0 +1,285 @@
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Tuple
+from utils.text import chunk_text
+from services.embedding_batcher import EmbeddingBatcher
+
+class EmbeddingModelRegistry:
+    """
+    Process-wide registry of SentenceTransformer models.
+    
+    Each model is loaded once, on first use, and then shared by every service
+    in the process. Loading is thread-safe: concurrent callers asking for the
+    same model wait for a single load instead of each constructing their own.
+    Encoding goes through one EmbeddingBatcher per model, so concurrent
+    requests are encoded together, and through an optional EmbeddingCache so
+    identical content is only embedded once. Search queries are one-off
+    texts, so they only go to a small in-memory LRU instead.
+    """
+    
+    def __init__(self):
+        """Initialize an empty registry"""
+        self.logger = logging.getLogger(__name__)
+        self.models = {}  # Loaded models: {model_name: SentenceTransformer}
+        self.lock = threading.Lock()  # Guards self.model_locks
+        self.model_locks = {}  # One load lock per model name
+        self.batchers = {}  # Batching workers: {model_name: EmbeddingBatcher}
+        self.max_batch_size = 32
+        self.max_wait_ms = 10
+        self.cache = None  # Optional persistent EmbeddingCache
+        self.chunk_tokens = None
+        self.chunk_overlap = 20
+        self.max_chunks = 64
+        self.query_cache = OrderedDict()  # Recent search queries: {(model_name, query): embedding}
+        self.query_cache_size = 256
+    
+    def configure(self, max_batch_size=32, max_wait_ms=10, cache=None,
+                  chunk_tokens=None, chunk_overlap=20, max_chunks=64, query_cache_size=256):
+        """
+        Set the micro-batching parameters for batchers created afterwards
+        and the chunking parameters for document embeddings
+        
+        Args:
+            max_batch_size (int): Maximum number of texts encoded together
+            max_wait_ms (int): Maximum time to wait for a batch to fill up
+            cache (EmbeddingCache, optional): Persistent cache of computed embeddings
+            chunk_tokens (int, optional): Maximum tokens per document chunk, capped by the model's input length
+            chunk_overlap (int): Tokens shared by consecutive chunks
+            max_chunks (int): Maximum number of chunks embedded per document
+            query_cache_size (int): Search query embeddings kept in memory
+        """
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.cache = cache
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        self.max_chunks = max_chunks
+        self.query_cache_size = query_cache_size
+    
+    def _get_model_lock(self, model_name: str) -> threading.Lock:
+        """Get the lock serializing loads of one model"""
+        with self.lock:
+            if model_name not in self.model_locks:
+                self.model_locks[model_name] = threading.Lock()
+            return self.model_locks[model_name]
+    
+    def get_model(self, model_name: str):
+        """
+        Get a loaded model, loading it on first use
+        
+        Args:
+            model_name (str): Name of the SentenceTransformer model
+        
+        Returns:
+            SentenceTransformer: The shared model, or None if it could not be loaded
+        """
+        model = self.models.get(model_name)
+        if model is not None:
+            return model
+        
+        with self._get_model_lock(model_name):
+            # Another thread may have finished loading while we waited
+            model = self.models.get(model_name)
+            if model is not None:
+                return model
+            
+            self.logger.info(f"Loading embedding model: {model_name}")
+            try:
+                from sentence_transformers import SentenceTransformer
+                model = SentenceTransformer(model_name)
+                self.models[model_name] = model
+                self.logger.info(f"Embedding model {model_name} loaded successfully")
+                return model
+            except Exception as e:
+                # Not cached, so a later call can retry the load
+                self.logger.error(f"Error loading embedding model {model_name}: {str(e)}")
+                return None
+    
+    def get_batcher(self, model_name: str):
+        """
+        Get the batching worker of a model, creating it on first use
+        
+        Args:
+            model_name (str): Name of the SentenceTransformer model
+        
+        Returns:
+            EmbeddingBatcher: The shared batcher, or None if the model could not be loaded
+        """
+        batcher = self.batchers.get(model_name)
+        if batcher is not None:
+            return batcher
+        
+        model = self.get_model(model_name)
+        if model is None:
+            return None
+        
+        with self._get_model_lock(model_name):
+            if model_name not in self.batchers:
+                self.batchers[model_name] = EmbeddingBatcher(model, self.max_batch_size, self.max_wait_ms)
+            return self.batchers[model_name]
+    
+    def encode(self, model_name: str, text: str) -> List[float]:
+        """
+        Generate an embedding for text with a shared model
+        
+        Args:
+            model_name (str): Name of the SentenceTransformer model
+            text (str): Text to generate embedding for
+        
+        Returns:
+            list: Embedding vector as a list, empty if the model is unavailable
+        """
+        embeddings = self.encode_many(model_name, [text])
+        return embeddings[0] if embeddings else []
+    
+    def encode_query(self, model_name: str, query: str) -> List[float]:
+        """
+        Generate an embedding for a search query, bypassing the persistent cache
+        
+        Args:
+            model_name (str): Name of the SentenceTransformer model
+            query (str): Query text
+        
+        Returns:
+            list: Embedding vector as a list, empty if the model is unavailable
+        """
+        key = (model_name, query)
+        with self.lock:
+            embedding = self.query_cache.get(key)
+            if embedding is not None:
+                self.query_cache.move_to_end(key)
+                return embedding
+        
+        embeddings = self._encode_uncached(model_name, [query])
+        if not embeddings:
+            return []
+        
+        with self.lock:
+            self.query_cache[key] = embeddings[0]
+            while len(self.query_cache) > self.query_cache_size:
+                self.query_cache.popitem(last=False)
+        return embeddings[0]
+    
+    def encode_many(self, model_name: str, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for several texts with a shared model
+        
+        Args:
+            model_name (str): Name of the SentenceTransformer model
+            texts (list): Texts to generate embeddings for
+        
+        Returns:
+            list: Embedding vectors as lists, empty if the model is unavailable
+        """
+        if not texts:
+            return []
+        
+        if self.cache is None:
+            return self._encode_uncached(model_name, texts)
+        
+        # Serve identical content from the cache, only encoding the misses
+        hashes = [self.cache.content_hash(text) for text in texts]
+        embeddings = self.cache.get_many(model_name, hashes)
+        missing = {content_hash: text for content_hash, text in zip(hashes, texts)
+                   if content_hash not in embeddings}
+        
+        if missing:
+            encoded = self._encode_uncached(model_name, list(missing.values()))
+            if not encoded:
+                return []
+            new_embeddings = dict(zip(missing.keys(), encoded))
+            self.cache.put_many(model_name, new_embeddings)
+            embeddings.update(new_embeddings)
+        
+        return [embeddings[content_hash] for content_hash in hashes]
+    
+    def encode_document(self, model_name: str, text: str) -> Tuple[List[float], List[List[float]]]:
+        """
+        Embed a document in token-bounded chunks
+        
+        The model truncates long inputs, so the text is split into windows
+        that fit, measured with the model's own tokenizer, the windows are
+        batch-encoded, and the normalized chunk vectors are mean-pooled into
+        one document vector.
+        
+        Args:
+            model_name (str): Name of the SentenceTransformer model
+            text (str): Document text
+        
+        Returns:
+            tuple: (pooled document vector, per-chunk vectors), both empty on failure
+        """
+        model = self.get_model(model_name)
+        if model is None:
+            self.logger.warning(f"Embedding model {model_name} not loaded, returning empty embedding")
+            return [], []
+        
+        tokenizer = getattr(model, 'tokenizer', None)
+        if not getattr(tokenizer, 'is_fast', False):
+            # Only fast tokenizers report token offsets, fall back to the estimate
+            tokenizer = None
+        
+        chunks = chunk_text(text, self.get_chunk_tokens(model), self.chunk_overlap, self.max_chunks, tokenizer)
+        chunk_embeddings = self.encode_many(model_name, chunks) if chunks else []
+        
+        if not chunk_embeddings:
+            return [], []
+        
+        return self.pool(chunk_embeddings), chunk_embeddings
+    
+    def get_chunk_tokens(self, model) -> int:
+        """
+        Get the tokens per document chunk for a model
+        
+        Args:
+            model (SentenceTransformer): Loaded model
+        
+        Returns:
+            int: The configured chunk size, capped by the tokens the model reads
+            besides its special tokens
+        """
+        chunk_tokens = self.chunk_tokens
+        max_seq_length = getattr(model, 'max_seq_length', None)
+        tokenizer = getattr(model, 'tokenizer', None)
+        
+        if max_seq_length and tokenizer is not None:
+            model_tokens = max_seq_length - tokenizer.num_special_tokens_to_add(pair=False)
+            chunk_tokens = model_tokens if chunk_tokens is None else min(chunk_tokens, model_tokens)
+        
+        # Without a tokenizer the estimate stays clear of MiniLM's 256-token limit
+        return chunk_tokens or 200
+    
+    @staticmethod
+    def pool(embeddings: List[List[float]]) -> List[float]:
+        """
+        Mean-pool normalized vectors into one unit-length vector
+        
+        Args:
+            embeddings (list): Vectors to pool
+        
+        Returns:
+            list: Pooled vector as a list
+        """
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        pooled = (matrix / np.where(norms == 0, 1, norms)).mean(axis=0)
+        norm = np.linalg.norm(pooled)
+        return (pooled / norm if norm else pooled).tolist()
+    
+    def _encode_uncached(self, model_name: str, texts: List[str]) -> List[List[float]]:
+        """Encode texts through the model's batcher"""
+        batcher = self.get_batcher(model_name)
+        if batcher is None:
+            self.logger.warning(f"Embedding model {model_name} not loaded, returning empty embedding")
+            return []
+        
+        try:
+            return batcher.encode_many(texts)
+        except Exception as e:
+            self.logger.error(f"Error generating embedding: {str(e)}")
+            return []
+
+# Shared registry for the whole process
+embedding_models = EmbeddingModelRegistry()
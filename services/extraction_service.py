@@ -0,0 +1,333 @@
+import os
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from starlette.concurrency import run_in_threadpool
+from services.text_extraction import TextExtractor
+from services.extraction_worker import init_worker, extract_in_worker, extract_pdf_pages_in_worker
+from models.extraction_result import ExtractionResult
+from utils.file import SPOOL_MAX_SIZE, create_temp_file, get_file_size, read_file_data
+
+class ExtractionQueueFull(RuntimeError):
+    """Raised when more extraction jobs are waiting than the queue allows"""
+
+class ExtractionService:
+    """
+    Text extraction in a pool of worker processes.
+    
+    PDF and Office parsing is CPU-bound and holds the GIL, so it runs in
+    separate processes and async routes await the result. Each worker runs
+    with a memory limit and extracts within the budgets of the file's format.
+    A job still running timeout_grace seconds after its format's timeout
+    has its pool terminated and replaced, and so does a pool whose worker
+    crashed, so neither can take the app down. Jobs beyond the workers plus
+    max_queue are rejected instead of piling up.
+    """
+    
+    def __init__(self, workers=None, timeout=60, memory_limit_mb=1024, max_queue=32,
+                 max_tasks_per_worker=100, budgets=None, timeout_grace=10,
+                 pdf_parallel_pages=0, text_cache=None):
+        """
+        Initialize the service; worker processes are started on first use
+        
+        Args:
+            workers (int, optional): Worker processes, defaults to the CPU count.
+                                     0 extracts in a thread of this process instead
+            timeout (float): Seconds a job may run before its worker is terminated,
+                             for formats without a timeout budget
+            memory_limit_mb (int): Address space limit per worker in MiB, 0 for no limit
+            max_queue (int): Jobs that may wait for a free worker
+            max_tasks_per_worker (int): Jobs after which a worker is replaced, to
+                                        release memory held by the parsing libraries
+            budgets (dict, optional): Extraction budgets per format, see TextExtractor
+            timeout_grace (float): Seconds past a format's timeout budget before the
+                                   worker is terminated, for a parser stuck in one page
+            pdf_parallel_pages (int): PDFs with at least this many pages are split into
+                                      page ranges extracted by several workers, 0 disables
+            text_cache (TextCache, optional): Cache of extracted texts by content hash
+        """
+        self.logger = logging.getLogger(__name__)
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.timeout = timeout
+        self.memory_limit = memory_limit_mb * 1024 * 1024 if memory_limit_mb else None
+        self.max_jobs = self.workers + max_queue
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.budgets = budgets
+        self.timeout_grace = timeout_grace
+        self.pdf_parallel_pages = pdf_parallel_pages
+        self.text_cache = text_cache
+        self.lock = threading.Lock()
+        self.pool = None
+        self.active_jobs = 0
+        # Jobs are only submitted when a worker is free, so timeouts count running time only.
+        # A document split into page ranges takes one slot per range
+        self.slots = asyncio.Semaphore(max(self.workers, 1))
+        self.slots_lock = asyncio.Lock()  # Held while taking several slots, so two documents cannot each hold part
+        self.text_extractor = TextExtractor(budgets=budgets)
+    
+    def _create_pool(self):
+        """Create a worker pool"""
+        # Spawned workers do not inherit the app's threads, model memory or open connections
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(self.memory_limit, self.budgets),
+            max_tasks_per_child=self.max_tasks_per_worker
+        )
+    
+    def _get_pool(self):
+        """Get the current worker pool, creating it if needed"""
+        with self.lock:
+            if self.pool is None:
+                self.pool = self._create_pool()
+                self.logger.info(f"Started text extraction pool with {self.workers} workers")
+            return self.pool
+    
+    def _replace_pool(self, pool):
+        """
+        Terminate a worker pool and let the next job start a new one
+        
+        Args:
+            pool (ProcessPoolExecutor): Pool to replace, ignored if it was already replaced
+        """
+        with self.lock:
+            if self.pool is not pool:
+                return
+            self.pool = None
+        
+        # The executor cannot cancel a running job, so its workers are terminated
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+    
+    def get_timeout(self, filename):
+        """
+        Get the seconds an extraction job may run before its worker is terminated
+        
+        Args:
+            filename (str): Original filename with extension
+            
+        Returns:
+            float: Hard timeout of the job
+        """
+        budget = self.text_extractor.get_budget(filename)
+        return budget.timeout + self.timeout_grace if budget.timeout else self.timeout
+    
+    async def extract_text(self, file_data, filename):
+        """
+        Extract text from file data in a worker process
+        
+        Args:
+            file_data (bytes/file): Binary file data or file object
+            filename (str): Original filename with extension
+        
+        Returns:
+            str: Extracted text content, empty if the job timed out or its worker crashed
+        
+        Raises:
+            ExtractionQueueFull: If too many jobs are already waiting
+        """
+        return (await self.extract(file_data, filename)).text
+    
+    async def extract(self, file_data, filename):
+        """
+        Extract text from file data in a worker process, within the budget of its format
+        
+        Args:
+            file_data (bytes/file): Binary file data or file object
+            filename (str): Original filename with extension
+        
+        Returns:
+            ExtractionResult: Extracted text and the budget that truncated it; the text
+                              is empty if the job was terminated or its worker crashed
+        
+        Raises:
+            ExtractionQueueFull: If too many jobs are already waiting
+        """
+        # Files extracted before only cost a hash and a lookup
+        extractor = self.text_extractor.get_cache_key(filename)
+        content_hash = None
+        if self.text_cache is not None:
+            content_hash, result = await run_in_threadpool(self._get_cached_result, extractor, file_data)
+            if result is not None:
+                self.logger.info(f"Using cached text of {filename}")
+                return result
+        
+        with self.lock:
+            if self.active_jobs >= self.max_jobs:
+                raise ExtractionQueueFull(f"Text extraction queue is full ({self.active_jobs} jobs)")
+            self.active_jobs += 1
+        
+        try:
+            if self.workers <= 0:
+                result = await run_in_threadpool(self.text_extractor.extract, file_data, filename)
+            else:
+                result = await self._extract_in_pool(file_data, filename)
+        finally:
+            with self.lock:
+                self.active_jobs -= 1
+        
+        # Failed jobs and timeouts depend on load, so they are not cached
+        if result is None:
+            return ExtractionResult()
+        if content_hash is not None and result.truncated_by != 'timeout':
+            await run_in_threadpool(self.text_cache.put, extractor, content_hash, result)
+        return result
+    
+    def _get_cached_result(self, extractor, file_data):
+        """
+        Hash file data and look up its extraction result
+        
+        Returns:
+            tuple: (content_hash, result), result is None if the file is not cached
+        """
+        content_hash = self.text_cache.content_hash(file_data)
+        return content_hash, self.text_cache.get(extractor, content_hash)
+    
+    async def _extract_in_pool(self, file_data, filename):
+        """Run one extraction job in the worker pool, returning None if it failed"""
+        # Workers read files by path. File objects without one are sent as bytes
+        # if they are small and copied to disk otherwise
+        temp_path = None
+        if hasattr(file_data, 'read'):
+            path = getattr(file_data, 'name', None)
+            if isinstance(path, str) and os.path.isfile(path):
+                source = path
+            elif get_file_size(file_data) <= SPOOL_MAX_SIZE:
+                source = await run_in_threadpool(read_file_data, file_data)
+            else:
+                temp_path = source = await run_in_threadpool(
+                    create_temp_file, file_data, os.path.splitext(filename)[1]
+                )
+        else:
+            source = file_data
+        
+        try:
+            jobs, pages_cut = await self._plan_jobs(source, filename)
+            timeout = self.get_timeout(filename)
+            
+            slots = await self._acquire_slots(len(jobs))
+            try:
+                # A job whose pool was terminated because of another job gets one retry
+                for attempt in range(2):
+                    pool = self._get_pool()
+                    try:
+                        futures = [asyncio.wrap_future(pool.submit(*job)) for job in jobs]
+                        results = await asyncio.wait_for(asyncio.gather(*futures), timeout)
+                        return results[0] if len(jobs) == 1 else self._merge_results(results, pages_cut, filename)
+                    except asyncio.TimeoutError:
+                        self.logger.error(f"Text extraction from {filename} timed out after {timeout}s")
+                        self._replace_pool(pool)
+                        return ExtractionResult(truncated_by='timeout')
+                    except BrokenProcessPool:
+                        if pool is self.pool or attempt > 0:
+                            self.logger.error(f"Text extraction worker crashed on {filename}")
+                            self._replace_pool(pool)
+                            return None
+                        self.logger.warning(f"Retrying text extraction from {filename} after pool restart")
+                    except Exception as e:
+                        self.logger.error(f"Error extracting text from {filename}: {str(e)}")
+                        return None
+            finally:
+                for _ in range(slots):
+                    self.slots.release()
+        finally:
+            if temp_path is not None:
+                os.unlink(temp_path)
+    
+    async def _acquire_slots(self, jobs):
+        """
+        Wait until enough workers are free to run a document's jobs at once
+        
+        Args:
+            jobs (int): Jobs submitted for the document
+            
+        Returns:
+            int: Slots taken, to be released when the jobs are done
+        """
+        slots = min(jobs, max(self.workers, 1))
+        async with self.slots_lock:
+            for taken in range(slots):
+                try:
+                    await self.slots.acquire()
+                except BaseException:
+                    for _ in range(taken):
+                        self.slots.release()
+                    raise
+        return slots
+    
+    async def _plan_jobs(self, source, filename):
+        """
+        Split a document into the jobs submitted to the pool
+        
+        Args:
+            source (str/bytes): File path or file data
+            filename (str): Original filename with extension
+            
+        Returns:
+            tuple: (jobs, pages_cut) with (function, *args) tuples, one per page range
+                   for large PDFs, and whether the page budget left pages out
+        """
+        single_job = [(extract_in_worker, source, filename)], False
+        if not self.pdf_parallel_pages or self.text_extractor.get_format(filename) != 'pdf':
+            return single_job
+        
+        # PDFs over the size budget are left to the extractor, which skips them
+        budget = self.text_extractor.get_budget(filename)
+        size = os.path.getsize(source) if isinstance(source, str) else len(source)
+        if budget.max_bytes and size > budget.max_bytes:
+            return single_job
+        
+        page_count = await run_in_threadpool(self._count_pdf_pages, source)
+        if not page_count or page_count < self.pdf_parallel_pages:
+            return single_job
+        
+        pages = min(page_count, budget.max_pages) if budget.max_pages else page_count
+        pages_per_job = -(-pages // self.workers)
+        jobs = [(extract_pdf_pages_in_worker, source, start, min(start + pages_per_job, pages))
+                for start in range(0, pages, pages_per_job)]
+        self.logger.info(f"Extracting {pages} of {page_count} pages of {filename} in {len(jobs)} ranges")
+        return jobs, pages < page_count
+    
+    def _merge_results(self, results, pages_cut, filename):
+        """
+        Join the results of the page ranges of one PDF
+        
+        Args:
+            results (list): ExtractionResult of each range, in page order
+            pages_cut (bool): Whether the page budget left pages out
+            filename (str): Original filename with extension
+            
+        Returns:
+            ExtractionResult: Text of the whole document within its character budget
+        """
+        merged = ExtractionResult("\n".join(result.text for result in results))
+        if pages_cut:
+            merged.truncate('max_pages')
+        for result in results:
+            if result.truncated:
+                merged.truncate(result.truncated_by)
+        
+        max_chars = self.text_extractor.get_budget(filename).max_chars
+        if max_chars and len(merged.text) > max_chars:
+            merged.text = merged.text[:max_chars]
+            merged.truncate('max_chars')
+        return merged
+    
+    def _count_pdf_pages(self, source):
+        """Count the pages of a PDF given by file path or file data"""
+        if isinstance(source, str):
+            with open(source, 'rb') as file:
+                return self.text_extractor.count_pdf_pages(file)
+        return self.text_extractor.count_pdf_pages(source)
+    
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
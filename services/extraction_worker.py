@@ -0,0 +1,34 @@
+# Entry points of the text extraction worker processes.
+# Workers import this module first, so it only imports the standard library:
+# the memory limit is set before the parsing libraries are loaded
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, workers then run without a memory limit
+    resource = None
+
+# Extractor of the current worker process, created by init_worker
+_worker_extractor = None
+
+def init_worker(memory_limit, budgets):
+    """Set up a worker process: cap its address space and create its extractor"""
+    global _worker_extractor
+    if memory_limit and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    
+    from services.text_extraction import TextExtractor
+    _worker_extractor = TextExtractor(budgets=budgets)
+
+def extract_in_worker(source, filename):
+    """Extract text in a worker process from a file path or from bytes"""
+    if isinstance(source, str):
+        with open(source, 'rb') as file:
+            return _worker_extractor.extract(file, filename)
+    return _worker_extractor.extract(source, filename)
+
+def extract_pdf_pages_in_worker(source, start, stop):
+    """Extract a range of PDF pages in a worker process from a file path or from bytes"""
+    if isinstance(source, str):
+        with open(source, 'rb') as file:
+            return _worker_extractor.extract_pdf_pages(file, start, stop)
+    return _worker_extractor.extract_pdf_pages(source, start, stop)
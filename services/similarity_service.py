@@ -1,51 +1,47 @@
 import logging
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from services.text_extraction import TextExtractor
+from services.embedding_models import embedding_models
+from services.embedding_matrix import EmbeddingMatrix
+from services.document_cache import DocumentCache
+from models.search_result import SearchResult
 
 class SimilarityService:
     """
     Service for calculating similarities between documents and queries
     """
     
-    def __init__(self, document_service, model_name='all-MiniLM-L6-v2'):
+    def __init__(self, document_service, model_name='all-MiniLM-L6-v2', suggestion_candidates=50,
+                 chunk_oversample=4):
         """
         Initialize similarity service
         
         Args:
             document_service: Document service for accessing documents
             model_name (str): Name of the SentenceTransformer model
+            suggestion_candidates (int): Number of top matches considered for tag suggestions
+            chunk_oversample (int): Chunk hits fetched per requested document hit, since
+                                    several chunks of one document can match
         """
         self.document_service = document_service
+        self.suggestion_candidates = suggestion_candidates
+        self.chunk_oversample = chunk_oversample
         self.logger = logging.getLogger(__name__)
-        self.text_extractor = TextExtractor()
-        
-        # Initialize embedding model
-        self.logger.info(f"Loading embedding model: {model_name}")
-        try:
-            self.model = SentenceTransformer(model_name)
-            self.logger.info("Embedding model loaded successfully")
-        except Exception as e:
-            self.logger.error(f"Error loading embedding model: {str(e)}")
-            self.model = None
+        
+        # The model itself is loaded lazily and shared through the registry
+        self.model_name = model_name
     
-    def calculate_similarities_from_file(self, file_data, filename, tags=None):
+    def calculate_similarities_from_text(self, extracted_text, filename, tags=None):
         """
-        Calculate similarities from file data by first extracting text
+        Calculate similarities from text already extracted from a file
         
         Args:
-            file_data (bytes): Binary file data
+            extracted_text (str): Text extracted from the file
             filename (str): Original filename
-            tags (str, optional): Tags to use as fallback if text extraction fails
+            tags (str, optional): Tags to use as fallback if text extraction failed
             
         Returns:
             tuple: (similarity_dict, sorted_documents, tag_suggestions)
         """
-        self.logger.info(f"Calculating similarities for file: {filename}")
-        
-        # Extract text from the file
-        extracted_text = self.text_extractor.extract_text(file_data, filename)
-        
         if not extracted_text or len(extracted_text.strip()) < 10:
             self.logger.warning(f"Text extraction produced little or no content from {filename}")
             # Fall back to tags if text extraction fails
@@ -56,10 +52,69 @@ class SimilarityService:
         
         self.logger.info(f"Extracted {len(extracted_text)} characters of text")
         
-        # Use the extracted text for similarity calculation
-        return self.calculate_similarities(extracted_text)
+        # Embed the whole document in chunks, the same way stored documents are embedded
+        document_embedding, _ = embedding_models.encode_document(self.model_name, extracted_text)
+        return self.calculate_similarities(extracted_text, embedding=document_embedding)
+    
+    def search(self, query, k=20, min_score=None, offset=0):
+        """
+        Find the k documents most similar to a query
+        
+        The cached documents are not modified and only the top offset + k
+        matches are ranked, so concurrent searches do not interfere.
+        
+        Args:
+            query (str): Query text
+            k (int): Number of hits to return
+            min_score (int, optional): Minimum similarity percentage of a hit
+            offset (int): Number of best hits to skip, for pagination
+            
+        Returns:
+            SearchResult: Top-k (doc_id, score) pairs
+        """
+        self.logger.info(f"Searching top {k} documents from rank {offset} for: {query[:50]}...")
+        
+        query_embedding = embedding_models.encode_query(self.model_name, query)
+        if not query_embedding:
+            self.logger.error("Failed to generate embedding for query")
+            return SearchResult(query, [], offset)
+        
+        # Fetch one extra hit to know whether another page exists
+        embedding_index = self.document_service.get_embedding_index()
+        hits = embedding_index.top_k(query_embedding, offset + k + 1)
+        hits = self._merge_chunk_hits(hits, query_embedding, offset + k + 1)
+        
+        if min_score is not None:
+            hits = [(doc_id, score) for doc_id, score in hits if score * 100 >= min_score]
+        
+        page = hits[offset:offset + k]
+        return SearchResult(query, page, offset, has_more=len(hits) > offset + k)
     
-    def calculate_similarities(self, text_content, existing_docs=None):
+    def _merge_chunk_hits(self, hits, query_embedding, k):
+        """
+        Let documents match by their best chunk as well as by their pooled vector
+        
+        Args:
+            hits (list): Document-level (doc_id, score) pairs
+            query_embedding (list): Query embedding
+            k (int): Number of hits to return
+            
+        Returns:
+            list: (doc_id, score) pairs scored by the better of both, highest first
+        """
+        chunk_index = self.document_service.get_chunk_index()
+        if chunk_index is None or len(chunk_index) == 0:
+            return hits
+        
+        best_scores = dict(hits)
+        for chunk_key, score in chunk_index.top_k(query_embedding, k * self.chunk_oversample):
+            doc_id = DocumentCache.chunk_doc_id(chunk_key)
+            if score > best_scores.get(doc_id, -1.0):
+                best_scores[doc_id] = score
+        
+        return sorted(best_scores.items(), key=lambda hit: hit[1], reverse=True)[:k]
+    
+    def calculate_similarities(self, text_content, existing_docs=None, embedding=None):
         """
         Calculate similarities between text content and documents
         
@@ -67,14 +122,16 @@ class SimilarityService:
             text_content (str): Text to compare with documents
             existing_docs (list, optional): List of documents with embeddings.
                                         If None, will fetch all documents.
+            embedding (list, optional): Precomputed embedding of text_content
         
         Returns:
-            tuple: (similarity_dict, sorted_documents, tag_suggestions)
+            tuple: (similarity_dict, top_documents, tag_suggestions) where
+                   top_documents are copies of the best matches, highest first
         """
         self.logger.info(f"Calculating similarities for text: {text_content[:50]}...")
         
         # Generate embedding for the content
-        content_embedding = self.generate_embedding(text_content)
+        content_embedding = embedding if embedding else self.generate_embedding(text_content)
         
         if not content_embedding:
             self.logger.error("Failed to generate embedding for content")
@@ -82,61 +139,58 @@ class SimilarityService:
             
         self.logger.info(f"Generated embedding with length: {len(content_embedding)}")
         
-        # Get all documents if not provided
-        documents = existing_docs
-        if documents is None:
-            documents = self.document_service.get_all_documents()
+        # Use the shared index for the full corpus, or build a matrix for the given documents
+        if existing_docs is None:
+            embedding_index = self.document_service.get_embedding_index()
+            get_document = self.document_service.get_document
+        else:
+            embedding_index = EmbeddingMatrix()
+            embedding_index.rebuild(existing_docs)
+            get_document = {doc['id']: doc for doc in existing_docs if 'id' in doc}.get
         
-        self.logger.info(f"Comparing with {len(documents)} documents")
+        self.logger.info(f"Comparing with {len(embedding_index)} document embeddings")
         
-        # Calculate similarity with each document
-        similarity_data = {}
-        doc_similarities = []
+        # Score every document with one index query
+        ids, scores = embedding_index.scores(content_embedding)
+        percentages = np.rint(scores * 100).astype(int)
+        similarity_data = dict(zip(ids.tolist(), percentages.tolist()))
+        
+        # Only the best matches are ranked; cached documents are copied, never modified
+        candidates = EmbeddingMatrix.select_top_k(ids, scores, self.suggestion_candidates)
+        if existing_docs is None:
+            candidates = self._merge_chunk_hits(candidates, content_embedding, self.suggestion_candidates)
         
-        for doc in documents:
-            doc_embedding = doc.get('embedding', [])
+        top_documents = []
+        doc_similarities = []
+        for doc_id, score in candidates:
+            doc = get_document(doc_id)
+            if doc is None:
+                continue
             
-            if doc_embedding and len(doc_embedding) > 0:
-                similarity = self.compute_similarity(content_embedding, doc_embedding)
-                similarity_value = round(similarity * 100)  # Convert to percentage
-                
-                # Store in dictionary with ID as key
-                similarity_data[doc['id']] = similarity_value
-                
-                # Also update the similarity in the document for sorting
-                doc['similarity'] = similarity_value
-                
-                # Get tags as string if they're a list
-                tags = doc['tags']
-                if isinstance(tags, list):
-                    tags_str = ", ".join(tags)
-                else:
-                    tags_str = tags
-                
-                # Store document info with similarity for tag suggestions
-                doc_similarities.append({
-                    'id': doc['id'],
-                    'filename': doc['filename'],
-                    'tags': tags_str,
-                    'similarity': similarity_value
-                })
-                
-                self.logger.debug(f"Document {doc['id']} similarity: {similarity_value}%")
+            similarity_value = round(score * 100)
+            similarity_data[doc_id] = similarity_value
+            top_documents.append({**doc, 'similarity': similarity_value})
+            
+            # Get tags as string if they're a list
+            tags = doc['tags']
+            if isinstance(tags, list):
+                tags_str = ", ".join(tags)
             else:
-                self.logger.warning(f"Document {doc['id']} has no embedding")
-        
-        # Sort documents by similarity (highest first)
-        documents = sorted(documents, key=lambda x: x.get('similarity', 0), reverse=True)
-        
-        # Sort similarity info for tag suggestions
-        doc_similarities.sort(key=lambda x: x['similarity'], reverse=True)
+                tags_str = tags
+            
+            doc_similarities.append({
+                'id': doc_id,
+                'filename': doc['filename'],
+                'tags': tags_str,
+                'similarity': similarity_value
+            })
         
         # Get diverse tag suggestions
         tag_suggestions = self._get_diverse_tag_suggestions(doc_similarities)
         
         self.logger.info(f"Calculated {len(similarity_data)} similarities and found {len(tag_suggestions)} tag suggestions")
         
-        return similarity_data, documents, tag_suggestions
+        return similarity_data, top_documents, tag_suggestions
     
     def generate_embedding(self, text):
         """
@@ -148,64 +202,9 @@ class SimilarityService:
         Returns:
             list: Embedding vector as a list
         """
-        if self.model is None:
-            self.logger.warning("Embedding model not loaded, returning empty embedding")
-            return []
-        
-        try:
-            # Generate embedding
-            embedding = self.model.encode(text)
-            # Convert to list for JSON serialization
-            embedding_list = embedding.tolist()
-            self.logger.debug(f"Generated embedding of dimension {len(embedding_list)}")
-            return embedding_list
-        except Exception as e:
-            self.logger.error(f"Error generating embedding: {str(e)}")
-            return []
-    
-    def compute_similarity(self, embedding1, embedding2):
-        """
-        Compute cosine similarity between two embeddings with better error handling
-        
-        Args:
-            embedding1 (list): First embedding
-            embedding2 (list): Second embedding
-            
-        Returns:
-            float: Cosine similarity
-        """
-        self.logger.debug(f"Computing similarity between embeddings of lengths {len(embedding1)} and {len(embedding2)}")
-        
-        # Basic validation
-        if not embedding1 or not embedding2:
-            self.logger.warning("Empty embedding detected")
-            return 0
-        
-        if len(embedding1) != len(embedding2):
-            self.logger.warning(f"Embedding dimension mismatch: {len(embedding1)} vs {len(embedding2)}")
-            # If dimensions don't match, we have to return 0
-            return 0
-        
-        try:
-            # Convert to numpy arrays
-            vec1 = np.array(embedding1)
-            vec2 = np.array(embedding2)
-            
-            # Compute cosine similarity
-            norm1 = np.linalg.norm(vec1)
-            norm2 = np.linalg.norm(vec2)
-            
-            if norm1 == 0 or norm2 == 0:
-                self.logger.warning("Zero vector detected")
-                return 0
-                
-            similarity = np.dot(vec1, vec2) / (norm1 * norm2)
-            self.logger.debug(f"Computed similarity: {similarity}")
-            return similarity
-            
-        except Exception as e:
-            self.logger.error(f"Error computing similarity: {str(e)}")
-            return 0
+        embedding_list = embedding_models.encode(self.model_name, text)
+        self.logger.debug(f"Generated embedding of dimension {len(embedding_list)}")
+        return embedding_list
     
     def _get_diverse_tag_suggestions(self, sorted_similarities, threshold=30, max_suggestions=3):
         """
@@ -0,0 +1,177 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, Sequence, Tuple
+from utils.file import ensure_dir_exists
+
+class SQLiteLRUStore:
+    """
+    Size-bounded key-value table in a local SQLite database.
+    
+    Rows are keyed by a namespace, such as a model name or extractor key,
+    and a content hash, and hold one or more value columns. The table is
+    bounded by row count and evicts the least recently used rows first.
+    EmbeddingCache and TextCache store their entries in one each.
+    """
+    
+    # Evict this fraction below the limit at once so eviction runs rarely
+    EVICTION_SLACK = 0.1
+    
+    # Stay below SQLite's default bound-parameter limit
+    LOOKUP_BATCH_SIZE = 500
+    
+    def __init__(self, path, table, namespace_column, value_columns, max_entries, description):
+        """
+        Open or create the database and its table
+        
+        Args:
+            path (str): SQLite database file
+            table (str): Table name
+            namespace_column (str): Name of the namespace key column
+            value_columns (list): (name, SQL type) of each value column. Columns missing
+                                  from an existing table are added, so they must be nullable
+            max_entries (int): Maximum number of rows
+            description (str): What the rows are, for log messages
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.table = table
+        self.namespace_column = namespace_column
+        self.value_names = [name for name, _ in value_columns]
+        self.max_entries = max_entries
+        self.description = description
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        
+        ensure_dir_exists(os.path.dirname(path))
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        columns = ",\n".join(f"{name} {sql_type}" for name, sql_type in value_columns)
+        self.connection.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {namespace_column} TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                {columns},
+                last_used REAL NOT NULL,
+                PRIMARY KEY ({namespace_column}, content_hash)
+            )
+            """
+        )
+        # Tables created by older versions may lack newer value columns
+        existing = [row[1] for row in self.connection.execute(f"PRAGMA table_info({table})")]
+        for name, sql_type in value_columns:
+            if name not in existing:
+                self.connection.execute(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}")
+        self.connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_lru ON {table} (last_used)")
+        self.connection.commit()
+        self.size = self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        self.logger.info(f"Opened {description} cache {path} with {self.size} entries")
+    
+    def get_many(self, namespace: str, content_hashes: Sequence[str]) -> Dict[str, Tuple]:
+        """
+        Look up rows and mark them as recently used
+        
+        Args:
+            namespace (str): Namespace key of the rows
+            content_hashes (list): Content hash keys of the rows
+        
+        Returns:
+            dict: Value tuples of the rows found, keyed by content hash
+        """
+        hashes = list(set(content_hashes))
+        if not hashes:
+            return {}
+        
+        found = {}
+        values = ", ".join(self.value_names)
+        with self.lock:
+            try:
+                for start in range(0, len(hashes), self.LOOKUP_BATCH_SIZE):
+                    chunk = hashes[start:start + self.LOOKUP_BATCH_SIZE]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = self.connection.execute(
+                        f"SELECT content_hash, {values} FROM {self.table} "
+                        f"WHERE {self.namespace_column} = ? AND content_hash IN ({placeholders})",
+                        [namespace, *chunk]
+                    ).fetchall()
+                    for content_hash, *row in rows:
+                        found[content_hash] = tuple(row)
+                
+                if found:
+                    now = time.time()
+                    self.connection.executemany(
+                        f"UPDATE {self.table} SET last_used = ? "
+                        f"WHERE {self.namespace_column} = ? AND content_hash = ?",
+                        [(now, namespace, content_hash) for content_hash in found]
+                    )
+                    self.connection.commit()
+            except sqlite3.Error as e:
+                self.logger.error(f"Error reading {self.description} cache: {str(e)}")
+                return {}
+            
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        
+        return found
+    
+    def put_many(self, namespace: str, rows: Dict[str, Tuple]) -> None:
+        """
+        Store rows and evict the least recently used ones if over the limit
+        
+        Args:
+            namespace (str): Namespace key of the rows
+            rows (dict): Value tuples keyed by content hash, in the order of the value columns
+        """
+        if not rows:
+            return
+        
+        now = time.time()
+        columns = ", ".join([self.namespace_column, "content_hash", *self.value_names, "last_used"])
+        placeholders = ", ".join("?" * (len(self.value_names) + 3))
+        assignments = ", ".join(f"{name} = ?" for name in [*self.value_names, "last_used"])
+        with self.lock:
+            size = self.size
+            try:
+                # Update existing rows, then insert the new ones; the inserted row count
+                # keeps the size current without counting the whole table
+                self.connection.executemany(
+                    f"UPDATE {self.table} SET {assignments} "
+                    f"WHERE {self.namespace_column} = ? AND content_hash = ?",
+                    [(*values, now, namespace, content_hash) for content_hash, values in rows.items()]
+                )
+                inserted = self.connection.executemany(
+                    f"INSERT OR IGNORE INTO {self.table} ({columns}) VALUES ({placeholders})",
+                    [(namespace, content_hash, *values, now) for content_hash, values in rows.items()]
+                ).rowcount
+                self.size += inserted
+                
+                if self.size > self.max_entries:
+                    evicted = self.connection.execute(
+                        f"DELETE FROM {self.table} WHERE rowid IN "
+                        f"(SELECT rowid FROM {self.table} ORDER BY last_used LIMIT ?)",
+                        (self.size - int(self.max_entries * (1 - self.EVICTION_SLACK)),)
+                    ).rowcount
+                    self.size -= evicted
+                    self.logger.info(f"Evicted {evicted} least recently used {self.description} entries")
+                
+                self.connection.commit()
+            except sqlite3.Error as e:
+                # Nothing of the failed write is kept
+                self.connection.rollback()
+                self.size = size
+                self.logger.error(f"Error writing {self.description} cache: {str(e)}")
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get row count and lookup statistics"""
+        with self.lock:
+            return {
+                "entries": self.size,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses
+            }
@@ -0,0 +1,129 @@
+import zlib
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from models.extraction_result import ExtractionResult
+from services.sqlite_lru_store import SQLiteLRUStore
+from utils.file import iter_file_chunks, STREAM_CHUNK_SIZE
+
+class TextCache:
+    """
+    Persistent cache of extracted text keyed by extractor and content hash.
+    
+    Texts are stored zlib-compressed, with the budget that truncated them,
+    in a local SQLite database, keyed by (extractor key, SHA-256 of the file
+    bytes). The extractor key names the extractor version, its budgets and
+    the file extension, so changing the extractor invalidates old entries.
+    A small in-memory LRU in front of the database serves the files of the
+    current tagging session, so extracting the same bytes again only costs
+    a hash and a lookup.
+    """
+    
+    def __init__(self, path, max_entries=20000, memory_chars=32 * 1024 * 1024):
+        """
+        Open or create the cache database
+        
+        Args:
+            path (str): SQLite database file
+            max_entries (int): Maximum number of cached texts on disk
+            memory_chars (int): Maximum total characters of texts kept in memory
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_chars = memory_chars
+        self.lock = threading.Lock()  # Guards the in-memory LRU
+        self.memory = OrderedDict()  # {(extractor, content_hash): (text, truncated_by)}, least recently used first
+        self.memory_size = 0
+        self.memory_hits = 0
+        # Databases created before extraction budgets lack truncated_by, the store adds it
+        self.store = SQLiteLRUStore(path, 'texts', 'extractor',
+                                    [('text', 'BLOB NOT NULL'), ('truncated_by', 'TEXT')],
+                                    max_entries, 'extracted text')
+    
+    @staticmethod
+    def content_hash(file_data) -> str:
+        """
+        Hash file data for use as a cache key
+        
+        Args:
+            file_data (bytes/file): File content, file objects are read in chunks from the start
+        
+        Returns:
+            str: Hex SHA-256 digest of the file bytes
+        """
+        digest = hashlib.sha256()
+        if hasattr(file_data, 'read'):
+            for chunk in iter_file_chunks(file_data, STREAM_CHUNK_SIZE):
+                digest.update(chunk)
+            file_data.seek(0)
+        else:
+            digest.update(file_data)
+        return digest.hexdigest()
+    
+    def get(self, extractor: str, content_hash: str) -> Optional[ExtractionResult]:
+        """
+        Look up an extracted text
+        
+        Args:
+            extractor (str): Extractor key, see TextExtractor.get_cache_key()
+            content_hash (str): Hash of the file bytes, see content_hash()
+        
+        Returns:
+            ExtractionResult: Cached result, or None if the file was not extracted with this extractor
+        """
+        key = (extractor, content_hash)
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return ExtractionResult(*entry)
+        
+        row = self.store.get_many(extractor, [content_hash]).get(content_hash)
+        if row is None:
+            return None
+        
+        entry = (zlib.decompress(row[0]).decode('utf-8'), row[1])
+        with self.lock:
+            self._remember(key, entry)
+        return ExtractionResult(*entry)
+    
+    def put(self, extractor: str, content_hash: str, result: ExtractionResult) -> None:
+        """
+        Store an extracted text and evict the least recently used entries if over the limit
+        
+        Args:
+            extractor (str): Extractor key, see TextExtractor.get_cache_key()
+            content_hash (str): Hash of the file bytes, see content_hash()
+            result (ExtractionResult): Extracted text and the budget that truncated it
+        """
+        key = (extractor, content_hash)
+        entry = (result.text, result.truncated_by)
+        compressed = zlib.compress(result.text.encode('utf-8', errors='replace'))
+        
+        with self.lock:
+            self._remember(key, entry)
+        self.store.put_many(extractor, {content_hash: (compressed, result.truncated_by)})
+    
+    def _remember(self, key, entry):
+        """Keep a (text, truncated_by) entry in the in-memory LRU, evicting the least recently used texts beyond its size"""
+        previous = self.memory.pop(key, None)
+        if previous is not None:
+            self.memory_size -= len(previous[0])
+        if len(entry[0]) > self.memory_chars:
+            return
+        
+        self.memory[key] = entry
+        self.memory_size += len(entry[0])
+        while self.memory_size > self.memory_chars:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_size -= len(evicted[0])
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get cache statistics"""
+        stats = self.store.get_stats()
+        with self.lock:
+            stats["memory_entries"] = len(self.memory)
+            stats["hits"] += self.memory_hits
+        return stats
\ No newline at end of file
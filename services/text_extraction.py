@@ -1,33 +1,240 @@
+import io
 import os
-import tempfile
+import time
+import datetime
 import logging
 import mimetypes
 from pathlib import Path
+from models.extraction_budget import ExtractionBudget
+from models.extraction_result import ExtractionResult
+from utils.file import create_temp_file, read_file_data, get_file_size
+
+try:
+    import pymupdf
+except ImportError:
+    try:
+        import fitz as pymupdf  # PyMuPDF before 1.24.3
+    except ImportError:
+        pymupdf = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
 
 class TextExtractor:
     """
     Class to extract text from different file types
     """
     
-    def __init__(self):
-        """Initialize TextExtractor"""
+    # Bump when extracted text changes, so cached texts of older versions are not reused
+    VERSION = 3
+    
+    # Workbook formats openpyxl reads; legacy .xls files are left to pandas
+    OPENPYXL_EXTENSIONS = ('.xlsx', '.xlsm', '.xltx', '.xltm')
+    
+    def __init__(self, budgets=None):
+        """
+        Initialize TextExtractor
+        
+        Args:
+            budgets (dict, optional): ExtractionBudget arguments per format ('pdf',
+                                      'spreadsheet', 'presentation', 'document',
+                                      'image', 'text'), each applied on top of the
+                                      'default' entry. No limits if omitted
+        """
         self.logger = logging.getLogger(__name__)
+        budgets = budgets or {}
+        self.default_budget = budgets.get('default', {})
+        self.budgets = {
+            file_format: ExtractionBudget(**{**self.default_budget, **overrides})
+            for file_format, overrides in budgets.items()
+        }
+    
+    def get_budget(self, filename):
+        """
+        Get the extraction budget for a file
+        
+        Args:
+            filename (str): Filename with extension
+            
+        Returns:
+            ExtractionBudget: Budget of the file's format
+        """
+        return self._get_format_budget(self.get_format(filename))
+    
+    def get_cache_key(self, filename):
+        """
+        Get the key under which texts extracted from a file are cached
+        
+        Args:
+            filename (str): Filename with extension
+            
+        Returns:
+            str: Extractor version, file extension and budget, so texts are only
+                 reused by an extractor that would extract the same text
+        """
+        return f"v{self.VERSION}{os.path.splitext(filename)[1].lower()}:{self.get_budget(filename)!r}"
+    
+    def _get_format_budget(self, file_format):
+        """Get the budget of a format, falling back to the default budget"""
+        budget = self.budgets.get(file_format)
+        return budget if budget is not None else ExtractionBudget(**self.default_budget)
+    
+    @staticmethod
+    def get_format(filename):
+        """
+        Get the format a file is budgeted as
+        
+        Args:
+            filename (str): Filename with extension
+            
+        Returns:
+            str: 'pdf', 'spreadsheet', 'presentation', 'document', 'image' or 'text'
+        """
+        ext = os.path.splitext(filename)[1].lower()
+        mime_type, _ = mimetypes.guess_type(filename)
+        
+        if mime_type and mime_type.startswith('text/'):
+            return 'text'
+        if mime_type == 'application/pdf' or ext == '.pdf':
+            return 'pdf'
+        if mime_type and mime_type.startswith('image/'):
+            return 'image'
+        if '.xls' in ext or (mime_type and ('excel' in mime_type or 'spreadsheet' in mime_type)):
+            return 'spreadsheet'
+        if '.ppt' in ext or (mime_type and ('powerpoint' in mime_type or 'presentation' in mime_type)):
+            return 'presentation'
+        if '.doc' in ext or (mime_type and 'word' in mime_type):
+            return 'document'
+        return 'text'
     
     def extract_text(self, file_data, filename):
         """
         Extract text from file data based on file type
         
         Args:
-            file_data (bytes): Binary file data
+            file_data (bytes/file): Binary file data, or a file object that is
+                                    copied to disk in chunks where possible
             filename (str): Original filename with extension
             
         Returns:
             str: Extracted text content
         """
+        return self.extract(file_data, filename).text
+    
+    def extract(self, file_data, filename):
+        """
+        Extract text from file data within the budget of its format
+        
+        Args:
+            file_data (bytes/file): Binary file data or file object
+            filename (str): Original filename with extension
+            
+        Returns:
+            ExtractionResult: Extracted text and the budget that truncated it, if any
+        """
+        result = ExtractionResult()
+        result.text = "\n".join(self.iter_text(file_data, filename, result))
+        return result
+    
+    def iter_text(self, file_data, filename, result=None):
+        """
+        Extract text from file data segment by segment
+        
+        PDFs are split into pages, presentations into slides and Word
+        documents into paragraphs; other formats are a single segment. Pages
+        are only extracted when the consumer asks for them, and the budget of
+        the file's format stops extraction early.
+        
+        Args:
+            file_data (bytes/file): Binary file data or file object
+            filename (str): Original filename with extension
+            result (ExtractionResult, optional): Receives the budget that stopped extraction
+            
+        Yields:
+            str: Next text segment
+        """
         if not file_data:
             self.logger.warning("No file data provided for text extraction")
-            return ""
+            return
+        
+        if result is None:
+            result = ExtractionResult()
+        file_format = self.get_format(filename)
+        budget = self.get_budget(filename)
+        
+        # Text formats are read up to the size budget, larger binary files are skipped
+        if budget.max_bytes and file_format != 'image':
+            size = get_file_size(file_data) if hasattr(file_data, 'read') else len(file_data)
+            if size > budget.max_bytes:
+                result.truncate('max_bytes')
+                if file_format != 'text':
+                    self.logger.warning(f"Skipping text extraction from {filename}: "
+                                        f"{size} bytes exceed the budget of {budget.max_bytes}")
+                    return
+                file_data = read_file_data(file_data, budget.max_bytes)
+        
+        deadline = time.monotonic() + budget.timeout if budget.timeout else None
+        produced = False
+        segments = self._iter_segments(file_data, filename, budget, result)
+        try:
+            for segment in self._limit_segments(segments, result, budget.max_pages, budget.max_chars, deadline):
+                produced = True
+                yield segment
+        except Exception as e:
+            self.logger.error(f"Error extracting text from {filename}: {str(e)}")
+            # Keep what was extracted before the error
+            if not produced:
+                yield f"Error extracting text: {str(e)}"
+        finally:
+            segments.close()
+        
+        if result.truncated:
+            self.logger.info(f"Text extraction from {filename} stopped by budget {result.truncated_by}")
+    
+    @staticmethod
+    def _limit_segments(segments, result, max_pages=None, max_chars=None, deadline=None):
+        """
+        Pass on text segments until a page, character or time budget is used up
+        
+        Args:
+            segments (iterator): Text segments
+            result (ExtractionResult): Receives the budget that stopped the segments
+            max_pages (int, optional): Segments passed on at most
+            max_chars (int, optional): Characters of the segments joined with newlines at most
+            deadline (float, optional): time.monotonic() value after which no further segment is read
+            
+        Yields:
+            str: Next text segment
+        """
+        pages = 0
+        length = 0
+        for segment in segments:
+            # Another segment exists, so stopping here truncates the text
+            if max_pages and pages >= max_pages:
+                result.truncate('max_pages')
+                return
+            # Segments are joined with newlines, which count towards the characters
+            separator = 1 if pages else 0
+            if max_chars and length + separator + len(segment) > max_chars:
+                result.truncate('max_chars')
+                remaining = max_chars - length - separator
+                if remaining > 0:
+                    yield segment[:remaining]
+                return
+            
+            pages += 1
+            length += separator + len(segment)
+            yield segment
             
+            # A segment already extracted is kept, only the next one is not started
+            if deadline is not None and time.monotonic() > deadline:
+                result.truncate('timeout')
+                return
+    
+    def _iter_segments(self, file_data, filename, budget, result):
+        """Extract text segments with the extractor matching the file type"""
         # Get file extension and mime type
         ext = os.path.splitext(filename)[1].lower()
         mime_type, _ = mimetypes.guess_type(filename)
@@ -35,41 +242,36 @@ class TextExtractor:
         self.logger.info(f"Extracting text from {filename} ({mime_type})")
         
         # Handle different file types
-        try:
-            # Text files
-            if mime_type and mime_type.startswith('text/'):
-                return self._extract_from_text_file(file_data)
-                
-            # PDF files
-            elif mime_type == 'application/pdf' or ext == '.pdf':
-                return self._extract_from_pdf(file_data)
-                
-            # Microsoft Office documents
-            elif mime_type and ('officedocument' in mime_type or 
-                               mime_type in ['application/msword', 'application/vnd.ms-excel', 'application/vnd.ms-powerpoint']):
-                return self._extract_from_office_document(file_data, mime_type, ext)
-                
-            # HTML files
-            elif mime_type in ['text/html', 'application/xhtml+xml'] or ext in ['.html', '.htm', '.xhtml']:
-                return self._extract_from_html(file_data)
-                
-            # CSV, JSON, XML
-            elif ext in ['.csv', '.json', '.xml']:
-                return self._extract_from_text_file(file_data)
-                
-            # Image files (OCR would be ideal but requires additional dependencies)
-            elif mime_type and mime_type.startswith('image/'):
-                self.logger.warning(f"Image file detected but OCR is not implemented: {filename}")
-                return f"Image file: {filename}"
-                
-            # Fallback - try as UTF-8 text
-            else:
-                self.logger.warning(f"Unsupported file type: {mime_type}, trying as text")
-                return self._extract_as_text(file_data)
-                
-        except Exception as e:
-            self.logger.error(f"Error extracting text from {filename}: {str(e)}")
-            return f"Error extracting text: {str(e)}"
+        # Text files
+        if mime_type and mime_type.startswith('text/'):
+            yield self._extract_from_text_file(read_file_data(file_data))
+            
+        # PDF files
+        elif mime_type == 'application/pdf' or ext == '.pdf':
+            yield from self._iter_pdf(file_data)
+            
+        # Microsoft Office documents
+        elif mime_type and ('officedocument' in mime_type or 
+                           mime_type in ['application/msword', 'application/vnd.ms-excel', 'application/vnd.ms-powerpoint']):
+            yield from self._iter_office_document(file_data, mime_type, ext, budget, result)
+            
+        # HTML files
+        elif mime_type in ['text/html', 'application/xhtml+xml'] or ext in ['.html', '.htm', '.xhtml']:
+            yield self._extract_from_html(read_file_data(file_data))
+            
+        # CSV, JSON, XML
+        elif ext in ['.csv', '.json', '.xml']:
+            yield self._extract_from_text_file(read_file_data(file_data))
+            
+        # Image files (OCR would be ideal but requires additional dependencies)
+        elif mime_type and mime_type.startswith('image/'):
+            self.logger.warning(f"Image file detected but OCR is not implemented: {filename}")
+            yield f"Image file: {filename}"
+            
+        # Fallback - try as UTF-8 text
+        else:
+            self.logger.warning(f"Unsupported file type: {mime_type}, trying as text")
+            yield self._extract_as_text(read_file_data(file_data))
     
     def _extract_from_text_file(self, file_data):
         """Extract text from a text file"""
@@ -85,48 +287,122 @@ class TextExtractor:
             # Fallback
             return file_data.decode('utf-8', errors='replace')
     
-    def _extract_from_pdf(self, file_data):
-        """Extract text from a PDF file"""
+    def _iter_pdf(self, file_data):
+        """Extract text from a PDF file page by page"""
+        if pymupdf is not None:
+            try:
+                pdf = self._open_pdf(file_data)
+            except Exception as e:
+                self.logger.warning(f"PyMuPDF could not read the PDF, trying other libraries: {str(e)}")
+            else:
+                with pdf:
+                    yield from self._iter_pdf_pages(pdf)
+                return
+        yield from self._iter_pdf_file(file_data)
+    
+    @staticmethod
+    def _open_pdf(file_data):
+        """Open a PDF with PyMuPDF, from its file if it has one and from memory otherwise"""
+        path = getattr(file_data, 'name', None)
+        if isinstance(path, str) and os.path.isfile(path):
+            return pymupdf.open(path)
+        return pymupdf.open(stream=read_file_data(file_data), filetype='pdf')
+    
+    def count_pdf_pages(self, file_data):
+        """
+        Count the pages of a PDF
+        
+        Args:
+            file_data (bytes/file): PDF data
+            
+        Returns:
+            int: Number of pages, None if PyMuPDF is not available or cannot read the PDF
+        """
+        if pymupdf is None:
+            return None
+        try:
+            with self._open_pdf(file_data) as pdf:
+                page_count = pdf.page_count
+        except Exception as e:
+            self.logger.warning(f"Error counting PDF pages: {str(e)}")
+            return None
+        return page_count
+    
+    def extract_pdf_pages(self, file_data, start=0, stop=None):
+        """
+        Extract text from a range of PDF pages with PyMuPDF, without a temporary file
+        
+        The character and time budgets for PDFs apply to the range; the
+        caller chooses ranges within the page budget.
+        
+        Args:
+            file_data (bytes/file): PDF data
+            start (int): First page, zero-based
+            stop (int, optional): Page after the last one, defaults to the end of the document
+            
+        Returns:
+            ExtractionResult: Text of the pages
+        """
+        budget = self._get_format_budget('pdf')
+        deadline = time.monotonic() + budget.timeout if budget.timeout else None
+        result = ExtractionResult()
+        with self._open_pdf(file_data) as pdf:
+            pages = self._iter_pdf_pages(pdf, start, stop)
+            result.text = "\n".join(self._limit_segments(pages, result, None, budget.max_chars, deadline))
+        return result
+    
+    def _iter_pdf_pages(self, pdf, start=0, stop=None):
+        """Extract text from the pages of an open PyMuPDF document"""
+        stop = pdf.page_count if stop is None else min(stop, pdf.page_count)
+        for page_number in range(start, stop):
+            yield pdf.load_page(page_number).get_text()
+    
+    def _iter_pdf_file(self, file_data):
+        """Extract text from a PDF file on disk page by page with PyPDF2 or pdfplumber"""
         try:
             # Create a temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                temp_path = temp_file.name
-                temp_file.write(file_data)
+            temp_path = create_temp_file(file_data, suffix='.pdf')
             
             try:
                 # Try using PyPDF2 if available
                 import PyPDF2
-                text = ""
+            except ImportError:
+                PyPDF2 = None
+            
+            if PyPDF2 is not None:
                 with open(temp_path, 'rb') as file:
                     reader = PyPDF2.PdfReader(file)
-                    for page_num in range(len(reader.pages)):
-                        text += reader.pages[page_num].extract_text() + "\n"
-                return text
-            except ImportError:
+                    for page in reader.pages:
+                        yield page.extract_text() or ""
+                return
+            
+            try:
                 # Try using pdfplumber if available
-                try:
-                    import pdfplumber
-                    text = ""
-                    with pdfplumber.open(temp_path) as pdf:
-                        for page in pdf.pages:
-                            text += page.extract_text() or "" + "\n"
-                    return text
-                except ImportError:
-                    # If neither library is available
-                    self.logger.warning("PDF extraction libraries not available")
-                    return "PDF file (text extraction libraries not available)"
+                import pdfplumber
+            except ImportError:
+                # If neither library is available
+                self.logger.warning("PDF extraction libraries not available")
+                yield "PDF file (text extraction libraries not available)"
+                return
+            
+            with pdfplumber.open(temp_path) as pdf:
+                for page in pdf.pages:
+                    yield page.extract_text() or ""
         finally:
             # Clean up the temporary file
             if 'temp_path' in locals() and os.path.exists(temp_path):
                 os.unlink(temp_path)
     
-    def _extract_from_office_document(self, file_data, mime_type, ext):
-        """Extract text from Microsoft Office documents"""
+    def _iter_office_document(self, file_data, mime_type, ext, budget, result):
+        """Extract text from Microsoft Office documents by paragraph, sheet or slide"""
+        # Workbooks are streamed from the file data, without a temporary copy
+        if ext in self.OPENPYXL_EXTENSIONS and openpyxl is not None:
+            yield from self._iter_workbook(file_data, budget, result)
+            return
+        
         try:
             # Create a temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as temp_file:
-                temp_path = temp_file.name
-                temp_file.write(file_data)
+            temp_path = create_temp_file(file_data, suffix=ext)
             
             try:
                 # Try using different libraries based on file type
@@ -136,53 +412,123 @@ class TextExtractor:
                     try:
                         # Try docx2txt first (for .docx)
                         import docx2txt
-                        return docx2txt.process(temp_path)
+                        text = docx2txt.process(temp_path)
                     except (ImportError, Exception):
-                        # Try python-docx
-                        try:
-                            import docx
-                            doc = docx.Document(temp_path)
-                            return "\n".join([para.text for para in doc.paragraphs])
-                        except ImportError:
-                            self.logger.warning("Word document libraries not available")
-                            return "Word document (text extraction libraries not available)"
+                        text = None
+                    if text is not None:
+                        yield text
+                        return
+                    
+                    # Try python-docx
+                    try:
+                        import docx
+                    except ImportError:
+                        self.logger.warning("Word document libraries not available")
+                        yield "Word document (text extraction libraries not available)"
+                        return
+                    for para in docx.Document(temp_path).paragraphs:
+                        yield para.text
                 
                 # Excel documents
                 elif '.xls' in ext or 'excel' in mime_type:
                     try:
                         import pandas as pd
-                        df = pd.read_excel(temp_path)
-                        return df.to_string()
                     except ImportError:
                         self.logger.warning("Excel libraries not available")
-                        return "Excel document (text extraction libraries not available)"
+                        yield "Excel document (text extraction libraries not available)"
+                        return
+                    # Read one row more than the budget to tell whether rows were cut off
+                    nrows = budget.max_rows + 1 if budget.max_rows else None
+                    df = pd.read_excel(temp_path, nrows=nrows)
+                    if budget.max_rows and len(df) > budget.max_rows:
+                        result.truncate('max_rows')
+                        df = df.head(budget.max_rows)
+                    yield df.to_csv(sep='\t', index=False)
                 
                 # PowerPoint documents
                 elif '.ppt' in ext or 'powerpoint' in mime_type:
                     try:
                         import pptx
-                        presentation = pptx.Presentation(temp_path)
-                        text = ""
-                        for slide in presentation.slides:
-                            for shape in slide.shapes:
-                                if hasattr(shape, "text"):
-                                    text += shape.text + "\n"
-                        return text
                     except ImportError:
                         self.logger.warning("PowerPoint libraries not available")
-                        return "PowerPoint document (text extraction libraries not available)"
+                        yield "PowerPoint document (text extraction libraries not available)"
+                        return
+                    for slide in pptx.Presentation(temp_path).slides:
+                        yield "\n".join(shape.text for shape in slide.shapes if hasattr(shape, "text"))
                 
                 # Default case
-                return "Microsoft Office document (type not specifically supported)"
+                else:
+                    yield "Microsoft Office document (type not specifically supported)"
                 
             except Exception as e:
                 self.logger.error(f"Error extracting from Office document: {str(e)}")
-                return f"Error extracting from Office document: {str(e)}"
+                yield f"Error extracting from Office document: {str(e)}"
         finally:
             # Clean up the temporary file
             if 'temp_path' in locals() and os.path.exists(temp_path):
                 os.unlink(temp_path)
     
+    def _iter_workbook(self, file_data, budget, result):
+        """
+        Extract text from an Excel workbook sheet by sheet as tab-separated rows
+        
+        The workbook is opened read-only, so openpyxl parses rows as they are
+        iterated instead of loading whole sheets, and at most one sheet of
+        text within the row and character budgets is held at a time.
+        
+        Args:
+            file_data (bytes/file): Binary file data or file object
+            budget (ExtractionBudget): Budget of the spreadsheet format
+            result (ExtractionResult): Receives the budget that stopped extraction
+            
+        Yields:
+            str: Sheet title followed by its non-empty rows
+        """
+        if hasattr(file_data, 'read'):
+            file_data.seek(0)
+        else:
+            file_data = io.BytesIO(file_data)
+        
+        workbook = openpyxl.load_workbook(file_data, read_only=True, data_only=True)
+        try:
+            rows = 0
+            for sheet in workbook.worksheets:
+                lines = [sheet.title]
+                length = len(sheet.title)
+                for values in sheet.iter_rows(values_only=True):
+                    line = "\t".join(self._format_cell(value) for value in values).rstrip("\t")
+                    if not line:
+                        continue
+                    if budget.max_rows and rows >= budget.max_rows:
+                        result.truncate('max_rows')
+                        break
+                    # Stop reading a sheet that alone exceeds the character budget
+                    if budget.max_chars and length > budget.max_chars:
+                        result.truncate('max_chars')
+                        break
+                    lines.append(line)
+                    length += len(line) + 1
+                    rows += 1
+                
+                yield "\n".join(lines)
+                if result.truncated:
+                    return
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def _format_cell(value):
+        """Render a cell value compactly for tab-separated text"""
+        if value is None:
+            return ""
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        if isinstance(value, datetime.datetime) and value.time() == datetime.time():
+            return value.date().isoformat()
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return value.isoformat()
+        return " ".join(str(value).split())
+    
     def _extract_from_html(self, file_data):
         """Extract text from HTML content"""
         try:
@@ -0,0 +1,502 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import numpy as np
+from typing import Dict, List, Any, Tuple
+from services.embedding_matrix import EmbeddingMatrix
+from utils.file import ensure_dir_exists
+
+INDEX_TYPES = ('exact', 'flat', 'ivf', 'hnsw')
+
+def create_vector_index(index_config=None, path_suffix=''):
+    """
+    Create the document embedding index selected by configuration
+    
+    Every index exposes the same interface as EmbeddingMatrix: sync, rebuild,
+    add, remove, scores, top_k, save and load.
+    
+    Args:
+        index_config (dict, optional): Index settings, see config.index_config
+        path_suffix (str): Appended to the configured path, to persist several indexes
+    
+    Returns:
+        EmbeddingMatrix or FaissIndex: The configured index
+    """
+    logger = logging.getLogger(__name__)
+    index_config = index_config or {}
+    index_type = index_config.get('type', 'exact')
+    
+    if index_type not in INDEX_TYPES:
+        logger.warning(f"Unknown index type '{index_type}', using exact index")
+        index_type = 'exact'
+    
+    if index_type == 'exact':
+        return EmbeddingMatrix()
+    
+    try:
+        import faiss  # noqa: F401
+    except ImportError:
+        logger.warning("faiss is not available, falling back to exact numpy index")
+        return EmbeddingMatrix()
+    
+    index = FaissIndex(
+        index_type=index_type,
+        path=f"{index_config['path']}{path_suffix}" if index_config.get('path') else None,
+        nlist=index_config.get('nlist', 256),
+        nprobe=index_config.get('nprobe', 16),
+        hnsw_m=index_config.get('hnsw_m', 32),
+        ef_construction=index_config.get('ef_construction', 80),
+        ef_search=index_config.get('ef_search', 64),
+        save_interval=index_config.get('save_interval', 60)
+    )
+    index.load()
+    return index
+
+class FaissIndex:
+    """
+    FAISS-backed approximate nearest-neighbour index keyed by document ID.
+    
+    Supports exact inner-product search (flat), inverted file lists (ivf) and
+    HNSW graphs (hnsw). Embeddings are normalized before insertion so inner
+    product equals cosine similarity. The index can be persisted to disk so a
+    restart only has to apply the difference to the current documents.
+    """
+    
+    # HNSW graphs cannot delete vectors, so removals are tombstoned until
+    # this fraction of the index is dead and it gets rebuilt
+    MAX_TOMBSTONE_RATIO = 0.2
+    
+    # FAISS warns when training IVF with fewer points than this per list
+    MIN_POINTS_PER_LIST = 39
+    
+    # Bump when the saved file layout changes, older files are rebuilt
+    FORMAT_VERSION = 2
+    
+    def __init__(self, index_type='flat', path=None, nlist=256, nprobe=16,
+                 hnsw_m=32, ef_construction=80, ef_search=64, save_interval=60):
+        """
+        Initialize an empty FAISS index
+        
+        Args:
+            index_type (str): One of 'flat', 'ivf' or 'hnsw'
+            path (str, optional): File to persist the index to
+            nlist (int): Number of inverted lists for IVF
+            nprobe (int): Number of lists probed per IVF query
+            hnsw_m (int): Number of graph neighbours per HNSW node
+            ef_construction (int): HNSW build-time search depth
+            ef_search (int): HNSW query-time search depth
+            save_interval (int): Minimum seconds between saves after single updates
+        """
+        import faiss
+        self.faiss = faiss
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.RLock()
+        self.index_type = index_type
+        self.path = path
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.save_interval = save_interval
+        self.last_save_time = 0
+        self._reset()
+    
+    def _reset(self, dimension=None) -> None:
+        """Drop all vectors and ID mappings"""
+        self.dimension = dimension
+        self.index = None
+        self.labels = {}  # {doc_id: faiss label}
+        self.doc_ids = {}  # {faiss label: doc_id}
+        self.fingerprints = {}  # {doc_id: hash of the stored vector}
+        self.tombstones = set()  # Labels removed from an index that cannot delete
+        self.next_label = 0
+        self.dirty = False
+    
+    def __len__(self) -> int:
+        return len(self.labels)
+    
+    def __contains__(self, doc_id: str) -> bool:
+        with self.lock:
+            return doc_id in self.labels
+    
+    @staticmethod
+    def _fingerprint(vector: np.ndarray) -> str:
+        """Short hash used to detect changed embeddings during sync"""
+        return hashlib.blake2b(vector.tobytes(), digest_size=8).hexdigest()
+    
+    def _new_index(self, vectors: np.ndarray):
+        """
+        Create an empty FAISS index of the configured type, training it if needed
+        
+        Args:
+            vectors: Training sample for IVF, shape (n, dimension)
+        """
+        faiss = self.faiss
+        
+        if self.index_type == 'hnsw':
+            base = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            base.hnsw.efConstruction = self.ef_construction
+            base.hnsw.efSearch = self.ef_search
+            return faiss.IndexIDMap2(base)
+        
+        if self.index_type == 'ivf':
+            nlist = self.nlist
+            if len(vectors) >= nlist * self.MIN_POINTS_PER_LIST:
+                quantizer = faiss.IndexFlatIP(self.dimension)
+                index = faiss.IndexIVFFlat(quantizer, self.dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+                index.train(vectors)
+                index.nprobe = self.nprobe
+                return index
+            self.logger.info(f"Only {len(vectors)} vectors, using flat index until IVF can be trained")
+        
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(self.dimension))
+    
+    def _supports_remove(self) -> bool:
+        return self.index_type != 'hnsw'
+    
+    def _collect(self, documents: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """Normalize the usable embeddings of a list of documents"""
+        vectors = {}
+        for doc in documents:
+            if 'id' not in doc:
+                continue
+            vector = EmbeddingMatrix.normalize(doc.get('embedding'))
+            if vector is None:
+                continue
+            if self.dimension is None:
+                self.dimension = vector.shape[0]
+            if vector.shape[0] != self.dimension:
+                self.logger.warning(f"Embedding dimension mismatch for {doc['id']}: "
+                                    f"{vector.shape[0]} vs {self.dimension}")
+                continue
+            vectors[doc['id']] = vector
+        return vectors
+    
+    def rebuild(self, documents: List[Dict[str, Any]]) -> None:
+        """
+        Rebuild the index from scratch
+        
+        Args:
+            documents: List of document dictionaries with 'id' and 'embedding'
+        """
+        with self.lock:
+            self._reset()
+            vectors = self._collect(documents)
+            self._build(vectors)
+            self.logger.info(f"Built {self.index_type} index with {len(self.labels)} vectors")
+    
+    def _build(self, vectors: Dict[str, np.ndarray]) -> None:
+        """Create a fresh index containing exactly the given vectors"""
+        self.labels = {}
+        self.doc_ids = {}
+        self.fingerprints = {}
+        self.tombstones = set()
+        self.next_label = 0
+        self.index = None
+        self.dirty = True
+        
+        if not vectors:
+            return
+        
+        doc_ids = list(vectors.keys())
+        matrix = np.vstack([vectors[doc_id] for doc_id in doc_ids]).astype(np.float32)
+        labels = np.arange(len(doc_ids), dtype=np.int64)
+        
+        self.index = self._new_index(matrix)
+        self.index.add_with_ids(matrix, labels)
+        
+        for label, doc_id in zip(labels.tolist(), doc_ids):
+            self.labels[doc_id] = label
+            self.doc_ids[label] = doc_id
+            self.fingerprints[doc_id] = self._fingerprint(vectors[doc_id])
+        self.next_label = len(doc_ids)
+    
+    def sync(self, documents: List[Dict[str, Any]]) -> None:
+        """
+        Bring the index in line with a list of documents
+        
+        Only documents that are missing or whose embedding changed are added,
+        and vectors of documents that no longer exist are removed. This lets a
+        persisted index survive restarts without being rebuilt.
+        
+        Args:
+            documents: List of document dictionaries with 'id' and 'embedding'
+        """
+        with self.lock:
+            vectors = self._collect(documents)
+            
+            can_train_ivf = (self.index_type == 'ivf' and not self._is_trained_ivf()
+                             and len(vectors) >= self.nlist * self.MIN_POINTS_PER_LIST)
+            if self.index is None or can_train_ivf:
+                # Nothing to reuse, or enough data to replace the IVF stand-in
+                self._build(vectors)
+            else:
+                stale = [doc_id for doc_id in self.labels if doc_id not in vectors]
+                for doc_id in stale:
+                    self._remove(doc_id)
+                
+                changed = 0
+                for doc_id, vector in vectors.items():
+                    if self.fingerprints.get(doc_id) != self._fingerprint(vector):
+                        self._add(doc_id, vector)
+                        changed += 1
+                
+                self.logger.info(f"Synced {self.index_type} index: {changed} added or updated, "
+                                 f"{len(stale)} removed")
+                self._compact_if_needed()
+            
+            self.save()
+    
+    def add(self, doc_id: str, embedding) -> bool:
+        """
+        Add or replace the embedding of a document
+        
+        Args:
+            doc_id: Document ID
+            embedding: Embedding as a list or numpy array
+        
+        Returns:
+            bool: True if the embedding was stored
+        """
+        vector = EmbeddingMatrix.normalize(embedding)
+        
+        with self.lock:
+            if vector is None or (self.dimension is not None and vector.shape[0] != self.dimension):
+                self.remove(doc_id)
+                return False
+            
+            if self.dimension is None:
+                self.dimension = vector.shape[0]
+            
+            self._add(doc_id, vector)
+            self._compact_if_needed()
+            self._save_if_due()
+            return True
+    
+    def _add(self, doc_id: str, vector: np.ndarray) -> None:
+        """Insert a normalized vector under a fresh label"""
+        if doc_id in self.labels:
+            self._remove(doc_id)
+        
+        if self.index is None:
+            self.index = self._new_index(vector.reshape(1, -1))
+        
+        label = self.next_label
+        self.next_label += 1
+        self.index.add_with_ids(vector.reshape(1, -1).astype(np.float32), np.array([label], dtype=np.int64))
+        self.labels[doc_id] = label
+        self.doc_ids[label] = doc_id
+        self.fingerprints[doc_id] = self._fingerprint(vector)
+        self.dirty = True
+    
+    def remove(self, doc_id: str) -> bool:
+        """
+        Remove the embedding of a document
+        
+        Args:
+            doc_id: Document ID
+        
+        Returns:
+            bool: True if a vector was removed
+        """
+        with self.lock:
+            removed = self._remove(doc_id)
+            if removed:
+                self._compact_if_needed()
+                self._save_if_due()
+            return removed
+    
+    def _remove(self, doc_id: str) -> bool:
+        """Remove a document's vector, tombstoning it if the index cannot delete"""
+        label = self.labels.pop(doc_id, None)
+        if label is None:
+            return False
+        
+        self.fingerprints.pop(doc_id, None)
+        self.doc_ids.pop(label, None)
+        if self._supports_remove():
+            self.index.remove_ids(np.array([label], dtype=np.int64))
+        else:
+            self.tombstones.add(label)
+        self.dirty = True
+        return True
+    
+    def _compact_if_needed(self) -> None:
+        """Rebuild the index once too many tombstoned vectors accumulate"""
+        if not self.tombstones or self.index is None:
+            return
+        if len(self.tombstones) <= self.index.ntotal * self.MAX_TOMBSTONE_RATIO:
+            return
+        
+        self.logger.info(f"Compacting {self.index_type} index with {len(self.tombstones)} removed vectors")
+        vectors = {doc_id: self.index.reconstruct(int(label)) for doc_id, label in self.labels.items()}
+        self._build(vectors)
+    
+    def _is_trained_ivf(self) -> bool:
+        return self.index is not None and isinstance(self.index, self.faiss.IndexIVF)
+    
+    def _search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """Run a FAISS search, skipping empty slots and tombstoned labels"""
+        if self.index is None or self.index.ntotal == 0 or k <= 0:
+            return []
+        
+        k = min(k + len(self.tombstones), self.index.ntotal)
+        scores, labels = self.index.search(query.reshape(1, -1), k)
+        
+        results = []
+        for score, label in zip(scores[0].tolist(), labels[0].tolist()):
+            if label < 0 or label in self.tombstones:
+                continue
+            doc_id = self.doc_ids.get(label)
+            if doc_id is not None:
+                results.append((doc_id, float(score)))
+        return results
+    
+    def scores(self, query_embedding) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compute similarity between a query and every reachable document
+        
+        Only flat indexes score every document. An IVF index scores the
+        documents in the nprobe inverted lists closest to the query and an
+        HNSW index the graph nodes its search visits, so both return a
+        subset and callers must treat a missing document as not scored.
+        
+        Args:
+            query_embedding: Query embedding as a list or numpy array
+        
+        Returns:
+            tuple: (ids, scores) arrays ordered by descending score
+        """
+        query = EmbeddingMatrix.normalize(query_embedding)
+        
+        with self.lock:
+            if query is None or query.shape[0] != self.dimension:
+                return np.empty(0, dtype=object), np.empty(0, dtype=np.float32)
+            
+            results = self._search(query, len(self.labels))
+        
+        ids = np.empty(len(results), dtype=object)
+        ids[:] = [doc_id for doc_id, _ in results]
+        return ids, np.array([score for _, score in results], dtype=np.float32)
+    
+    def top_k(self, query_embedding, k: int) -> List[Tuple[str, float]]:
+        """
+        Get the k most similar documents to a query
+        
+        Args:
+            query_embedding: Query embedding as a list or numpy array
+            k: Number of results to return
+        
+        Returns:
+            list: (doc_id, score) pairs sorted by descending score
+        """
+        query = EmbeddingMatrix.normalize(query_embedding)
+        
+        with self.lock:
+            if query is None or query.shape[0] != self.dimension:
+                return []
+            return self._search(query, k)[:k]
+    
+    def _save_if_due(self) -> None:
+        """Save after single updates at most once per save interval"""
+        if time.time() - self.last_save_time >= self.save_interval:
+            self.save()
+    
+    def save(self) -> bool:
+        """
+        Atomically persist the index and its ID mapping to disk
+        
+        Both go into one file, a JSON line with the mapping followed by the
+        serialized index, so a crash cannot leave an index paired with the
+        mapping of another version.
+        
+        Returns:
+            bool: True if the index was written
+        """
+        if not self.path:
+            return False
+        
+        with self.lock:
+            if not self.dirty:
+                return False
+            
+            try:
+                ensure_dir_exists(os.path.dirname(self.path))
+                mapping = {
+                    'format_version': self.FORMAT_VERSION,
+                    'index_type': self.index_type,
+                    'dimension': self.dimension,
+                    'next_label': self.next_label,
+                    'labels': self.labels,
+                    'fingerprints': self.fingerprints,
+                    'tombstones': sorted(self.tombstones),
+                    'has_index': self.index is not None
+                }
+                
+                with open(f"{self.path}.tmp", 'wb') as index_file:
+                    index_file.write(json.dumps(mapping).encode('utf-8') + b"\n")
+                    if self.index is not None:
+                        index_file.write(self.faiss.serialize_index(self.index).tobytes())
+                os.replace(f"{self.path}.tmp", self.path)
+                
+                # Mapping file of the previous format, no longer read
+                if os.path.exists(f"{self.path}.ids.json"):
+                    os.unlink(f"{self.path}.ids.json")
+                
+                self.dirty = False
+                self.last_save_time = time.time()
+                self.logger.debug(f"Saved {self.index_type} index with {len(self.labels)} vectors to {self.path}")
+                return True
+            except Exception as e:
+                self.logger.error(f"Error saving index to {self.path}: {str(e)}")
+                return False
+    
+    def load(self) -> bool:
+        """
+        Load a previously saved index from disk
+        
+        An index that cannot be read, was saved in another format or with
+        another index type is ignored, and the next sync rebuilds it.
+        
+        Returns:
+            bool: True if an index was loaded
+        """
+        if not self.path or not os.path.exists(self.path):
+            return False
+        
+        with self.lock:
+            try:
+                with open(self.path, 'rb') as index_file:
+                    mapping = json.loads(index_file.readline())
+                    if mapping.get('format_version') != self.FORMAT_VERSION:
+                        self.logger.info(f"Saved index {self.path} has an old format, it will be rebuilt")
+                        return False
+                    if mapping.get('index_type') != self.index_type:
+                        self.logger.info(f"Saved index type {mapping.get('index_type')} differs from "
+                                         f"{self.index_type}, it will be rebuilt")
+                        return False
+                    serialized = index_file.read()
+                
+                self._reset(mapping.get('dimension'))
+                if mapping.get('has_index'):
+                    self.index = self.faiss.deserialize_index(np.frombuffer(serialized, dtype=np.uint8))
+                    if self._is_trained_ivf():
+                        self.index.nprobe = self.nprobe
+                    elif self.index_type == 'hnsw':
+                        self.faiss.downcast_index(self.index.index).hnsw.efSearch = self.ef_search
+                
+                self.labels = mapping.get('labels', {})
+                self.doc_ids = {label: doc_id for doc_id, label in self.labels.items()}
+                self.fingerprints = mapping.get('fingerprints', {})
+                self.tombstones = set(mapping.get('tombstones', []))
+                self.next_label = mapping.get('next_label', len(self.labels))
+                self.logger.info(f"Loaded {self.index_type} index with {len(self.labels)} vectors from {self.path}")
+                return True
+            except Exception as e:
+                self.logger.error(f"Error loading index from {self.path}, it will be rebuilt: {str(e)}")
+                self._reset()
+                return False
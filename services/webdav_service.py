@@ -3,15 +3,30 @@ import json
 import logging
 import requests
 import datetime
-from urllib.parse import urljoin, unquote
+import threading
+import numpy as np
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin
 from services.document_cache import DocumentCache
+from services.cache_refresher import CacheRefresher
+from services.embedding_models import embedding_models
+from utils.embedding import EMBEDDING_FORMAT_VERSION, CHUNKS_SUFFIX, encode_embedding, decode_embedding, decode_embedding_file
+from utils.propfind import PROPFIND_BODY, iter_propfind_entries
 
 class WebDAVService:
     """
     Service for WebDAV storage operations
     """
     
-    def __init__(self, webdav_url, webdav_username, webdav_password, folder_path, folder_path_raw):
+    # Bytes read from the network at a time while parsing a folder listing
+    PROPFIND_CHUNK_SIZE = 64 * 1024
+    
+    def __init__(self, webdav_url, webdav_username, webdav_password, folder_path, folder_path_raw,
+                 embedding_index=None, model_name='all-MiniLM-L6-v2', chunk_index=None,
+                 embedding_dtype='float16', metadata_concurrency=16, retries=3,
+                 connect_timeout=5, timeout=15, transfer_timeout=60, pool_size=None, snapshot=None):
         """
         Initialize the WebDAV service
         
@@ -21,6 +36,17 @@ class WebDAVService:
             webdav_password (str): WebDAV password
             folder_path (str): Path to the folder for documents
             folder_path_raw (str): Path to the folder for raw documents
+            embedding_index (optional): Index for document embeddings, see create_vector_index
+            model_name (str): Name of the SentenceTransformer model for document embeddings
+            chunk_index (optional): Index for per-chunk embeddings, None to disable chunk matching
+            embedding_dtype (str): Precision embeddings are stored with, 'float16' or 'float32'
+            metadata_concurrency (int): Parallel metadata downloads when loading the cache
+            retries (int): Retries of a request failing with a connection error, 429 or 5xx
+            connect_timeout (float): Seconds to wait for a connection
+            timeout (float): Seconds to wait for listing and metadata responses
+            transfer_timeout (float): Seconds to wait for document body transfers
+            pool_size (int, optional): Kept-alive connections, at least metadata_concurrency
+            snapshot (CacheSnapshot, optional): On-disk snapshot of the document cache
         """
         self.webdav_url = webdav_url
         self.auth = (webdav_username, webdav_password)
@@ -28,10 +54,21 @@ class WebDAVService:
         self.folder_path_raw = folder_path_raw.strip('/')
         self.base_url = urljoin(self.webdav_url, self.folder_path)
         self.base_url_raw = urljoin(self.webdav_url, self.folder_path_raw)
+        self.model_name = model_name
+        self.embedding_dtype = embedding_dtype
+        self.metadata_concurrency = max(1, metadata_concurrency)
+        self.timeout = (connect_timeout, timeout)
+        self.transfer_timeout = (connect_timeout, transfer_timeout)
+        self.session = self._create_session(retries, max(pool_size or 0, self.metadata_concurrency))
         self.logger = logging.getLogger(__name__)
         
         # Initialize document cache
-        self.cache = DocumentCache()
+        self.cache = DocumentCache(embedding_index, chunk_index)
+        self.sync_lock = threading.RLock()  # Serializes cache syncs
+        self.refresher = None  # Optional background refresher, see start_refresher
+        self.chunk_fetcher = None  # Background thread loading chunk vectors, see _start_chunk_fetch
+        self.snapshot = snapshot
+        self.snapshot_revision = None  # Cache revision of the last saved snapshot
         
         self.logger.info(f"Initializing WebDAV service with base URL: {self.base_url}")
         
@@ -41,19 +78,48 @@ class WebDAVService:
         except Exception as e:
             self.logger.error(f"Error initializing WebDAV folder: {str(e)}")
     
+    def _create_session(self, retries, pool_size):
+        """
+        Create the HTTP session shared by all WebDAV calls
+        
+        The session keeps connections alive in a pool sized for concurrent
+        metadata downloads and retries transient failures with backoff.
+        
+        Args:
+            retries (int): Retries of a request failing with a connection error, 429 or 5xx
+            pool_size (int): Maximum number of pooled connections
+            
+        Returns:
+            requests.Session: Configured session
+        """
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.3,
+            status_forcelist=(429, 500, 502, 503, 504),
+            # MOVE, MKCOL and POST are not idempotent, so they are never retried
+            allowed_methods=frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "PROPFIND"}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=retry)
+        
+        session = requests.Session()
+        session.auth = self.auth
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+    
     def _check_or_create_folder(self):
         """Create the base folder if it doesn't exist"""
-        response = requests.request(
+        response = self.session.request(
             "PROPFIND", 
             self.base_url, 
-            auth=self.auth, 
             headers={"Depth": "0"},
-            timeout=10
+            timeout=self.timeout
         )
         
         if response.status_code == 404:
             self.logger.info(f"Creating folder: {self.folder_path}")
-            response = requests.request("MKCOL", self.base_url, auth=self.auth)
+            response = self.session.request("MKCOL", self.base_url, timeout=self.timeout)
             if response.status_code >= 400:
                 self.logger.error(f"Failed to create folder: {response.status_code}")
         elif response.status_code >= 400:
@@ -79,290 +145,400 @@ class WebDAVService:
         # If cache is already loaded, return cached documents
         if self.cache.is_loaded:
             self.logger.info("Using cached documents")
+            self._revalidate_if_stale()
             return self.cache.get_all_documents()
-            
-        self.logger.info(f"Loading documents from WebDAV folder: {self.base_url}")
         
-        # List files
-        files = self._list_files()
+        # Wait for a load that is already running instead of starting another
+        with self.sync_lock:
+            if not self.cache.is_loaded:
+                self.logger.info(f"Loading documents from WebDAV folder: {self.base_url}")
+                self.sync_cache()
         
-        # Find document and metadata pairs
-        documents = []
-        metadata_files = [f for f in files if f.endswith('.metadata.json')]
+        documents = self.cache.get_all_documents()
+        self.logger.info(f"Retrieved {len(documents)} documents with metadata")
+        return documents
+    
+    def sync_cache(self):
+        """
+        Bring the document cache up to date with the WebDAV folder
         
-        self.logger.info(f"Found {len(metadata_files)} metadata files")
+        One PROPFIND lists the folder with ETags. Only metadata files that
+        were added or whose version changed since they were cached are
+        downloaded, and documents that no longer exist are dropped, so
+        syncing an unchanged folder costs a single request.
         
-        # Process each metadata file to get document info
-        for metadata_file in metadata_files:
-            # Get the corresponding document filename
-            doc_file = metadata_file.replace(".metadata.json", "")
-            
-            # Skip if the document doesn't exist in the file list
-            if doc_file not in files:
+        Returns:
+            dict: Number of 'added', 'changed' and 'deleted' documents, or None if listing failed
+        """
+        with self.sync_lock:
+            return self._sync_cache()
+    
+    def sync_in_background(self):
+        """Run one cache sync on a background thread, e.g. to revalidate a loaded snapshot"""
+        threading.Thread(target=self.sync_cache, name="cache-sync", daemon=True).start()
+    
+    def _sync_cache(self):
+        """Run one cache sync, see sync_cache"""
+        entries = self._list_file_versions()
+        if entries is None:
+            return None
+        
+        # Version of each document's metadata, skipping metadata without a document
+        versions = {}
+        for filename, version in entries.items():
+            if not filename.endswith('.metadata.json'):
+                continue
+            doc_file = filename[:-len('.metadata.json')]
+            if doc_file not in entries:
                 self.logger.warning(f"Metadata exists but document missing: {doc_file}")
                 continue
-                
-            # Read metadata
-            metadata = self.read_metadata(metadata_file)
-            
-            # Create document info
-            documents.append({
-                'id': doc_file,  # Use filename as ID
-                'filename': doc_file,
-                'tags': metadata.get('tags', []),
-                'embedding': metadata.get('embedding', []),
-                'similarity': 0  # Default value, will be calculated when needed
-            })
+            versions[doc_file] = version
         
-        # Update the cache with all documents
-        self.cache.set_documents(documents)
+        known_versions = self.cache.get_versions()
+        added = [doc_id for doc_id in versions if doc_id not in known_versions]
+        changed = [doc_id for doc_id, version in versions.items()
+                   if doc_id in known_versions and (version is None or known_versions[doc_id] != version)]
+        deleted = [doc_id for doc_id in known_versions if doc_id not in versions]
         
-        self.logger.info(f"Retrieved {len(documents)} documents with metadata")
-        return documents
+        # Read new and changed metadata concurrently
+        fetch = added + changed
+        all_metadata = self._read_all_metadata([f"{doc_id}.metadata.json" for doc_id in fetch])
+        documents = []
+        failed = 0
+        for doc_id in fetch:
+            metadata = all_metadata[f"{doc_id}.metadata.json"]
+            if metadata is None:
+                # Read again by the next sync: a changed document keeps its cached
+                # entry, a new one is listed without tags under an unknown version
+                failed += 1
+                if doc_id in known_versions:
+                    continue
+                metadata = {}
+                versions[doc_id] = None
+            documents.append(self._document_from_metadata(doc_id, metadata))
+        if failed:
+            self.logger.warning(f"Could not read the metadata of {failed} documents, retrying on the next sync")
+        
+        if not self.cache.is_loaded:
+            self.cache.set_documents(documents, versions)
+        else:
+            skipped = self.cache.apply_changes(documents, deleted, versions, known_versions)
+            if skipped:
+                self.logger.info(f"Skipped {skipped} documents modified during the sync")
+        
+        changes = {'added': len(added), 'changed': len(changed), 'deleted': len(deleted)}
+        self.logger.info(f"Synced document cache: {changes['added']} added, "
+                         f"{changes['changed']} changed, {changes['deleted']} deleted")
+        
+        # Also persists uploads and deletions made since the last sync
+        self.save_snapshot()
+        self._start_chunk_fetch()
+        return changes
+    
+    def _start_chunk_fetch(self):
+        """Load missing chunk vectors in the background, unless a fetch is already running"""
+        if self.chunk_fetcher is not None and self.chunk_fetcher.is_alive():
+            return
+        missing = self.cache.get_missing_chunks()
+        if not missing:
+            return
+        
+        self.chunk_fetcher = threading.Thread(target=self._fetch_chunks, args=(missing,),
+                                              name="chunk-fetcher", daemon=True)
+        self.chunk_fetcher.start()
     
-    def _list_files(self):
+    def _fetch_chunks(self, missing):
         """
-        List files in the WebDAV folder
+        Download chunk vector sidecars concurrently and add them to the cache
+        
+        Documents are searchable by their pooled vector right away; their
+        chunks join the chunk index as they arrive. Failed downloads are
+        retried after the next sync. Missing or invalid sidecars are recorded
+        in the cache, so they are only fetched again once the metadata changes.
+        
+        Args:
+            missing (dict): Metadata version keyed by document ID, see DocumentCache.get_missing_chunks
+        """
+        self.logger.info(f"Loading chunk vectors of {len(missing)} documents")
+        loaded = 0
+        unavailable = 0
+        with ThreadPoolExecutor(max_workers=self.metadata_concurrency,
+                                thread_name_prefix="chunk-reader") as executor:
+            futures = {executor.submit(self.read_chunk_embeddings, doc_id): doc_id for doc_id in missing}
+            for future in as_completed(futures):
+                doc_id = futures[future]
+                chunk_embeddings = future.result()
+                if chunk_embeddings is None:
+                    continue
+                if len(chunk_embeddings) == 0:
+                    unavailable += self.cache.mark_chunks_missing(doc_id, missing[doc_id])
+                elif self.cache.set_chunk_embeddings(doc_id, chunk_embeddings, missing[doc_id]):
+                    loaded += 1
+        
+        self.logger.info(f"Loaded chunk vectors of {loaded}/{len(missing)} documents, "
+                         f"{unavailable} without readable chunk vectors")
+        self.save_snapshot()
+    
+    def load_snapshot(self):
+        """
+        Fill the document cache from the on-disk snapshot
+        
+        The loaded cache is served right away and revalidated against
+        WebDAV by the next sync.
         
         Returns:
-            list: List of filenames
+            bool: Whether a snapshot was loaded
         """
-        try:
-            # Send PROPFIND request to list files
-            response = requests.request(
-                "PROPFIND", 
-                self.base_url, 
-                auth=self.auth, 
-                headers={"Depth": "1"},
-                timeout=15
-            )
-            
-            self.logger.debug(f"PROPFIND response status: {response.status_code}")
-            
-            if response.status_code >= 400:
-                self.logger.error(f"Error listing files: {response.status_code}")
-                return []
-            
-            # Simple parsing of XML response to get filenames
-            content = response.text
-            files = []
-            
-            # Extract hrefs from the XML
-            import re
-            href_pattern = r'<[^>]*?href[^>]*?>(.*?)</[^>]*?href[^>]*?>'
+        if self.snapshot is None:
+            return False
+        
+        loaded = self.snapshot.load()
+        if loaded is None:
+            return False
+        
+        documents, versions, saved_at = loaded
+        with self.sync_lock:
+            self.cache.set_documents(documents, versions)
+            # Report the age of the snapshot, not the time it was read
+            self.cache.last_reload_time = saved_at
+            self.snapshot_revision = self.cache.revision
+        return True
+    
+    def save_snapshot(self):
+        """
+        Save the document cache to the on-disk snapshot if it changed
+        
+        Returns:
+            bool: Whether a snapshot was written
+        """
+        if self.snapshot is None or not self.cache.is_loaded:
+            return False
+        
+        documents, versions, revision = self.cache.get_snapshot()
+        if revision == self.snapshot_revision:
+            return False
+        
+        if self.snapshot.save(documents, versions):
+            self.snapshot_revision = revision
+            return True
+        return False
+    
+    def _document_from_metadata(self, doc_file, metadata, chunk_embeddings=None):
+        """
+        Create a cached document from its metadata
+        
+        Embeddings are decoded from either the binary or the legacy list
+        format and kept as numpy arrays in their stored precision.
+        
+        Args:
+            doc_file (str): Document filename, used as ID
+            metadata (dict): Parsed .metadata.json content
+            chunk_embeddings (optional): Chunk vectors if already at hand; otherwise they are
+                                         read from metadata written before format version 3,
+                                         or left None to be loaded from the sidecar
             
-            matches = re.findall(href_pattern, content, re.IGNORECASE | re.DOTALL)
+        Returns:
+            dict: Document dictionary
+        """
+        if chunk_embeddings is None:
+            chunk_embeddings = decode_embedding(metadata.get('chunk_embeddings'))
+        return {
+            'id': doc_file,  # Use filename as ID
+            'filename': doc_file,
+            'tags': metadata.get('tags', []),
+            'embedding': decode_embedding(metadata.get('embedding')),
+            'chunk_embeddings': chunk_embeddings,
+            'chunk_count': len(chunk_embeddings) if chunk_embeddings is not None else metadata.get('chunk_count', 0),
+            'similarity': 0  # Default value, will be calculated when needed
+        }
+    
+    def _iter_entries(self, folder_url):
+        """
+        List a WebDAV folder, parsing the response while it downloads
+        
+        Args:
+            folder_url (str): URL of the folder
             
-            for href in matches:
-                # Clean up the href
-                href = href.strip()
-                
-                # Skip the folder itself and other folders
-                if href.rstrip('/') == self.base_url.rstrip('/') or href.endswith('/'):
-                    continue
-                
-                # Extract filename from the URL
-                filename = os.path.basename(href)
-                if filename:
-                    # URL decode the filename
-                    try:
-                        filename = unquote(filename)
-                        files.append(filename)
-                    except Exception as e:
-                        self.logger.error(f"Error decoding filename: {e}")
+        Yields:
+            WebDAVEntry: Files and subfolders of the folder
             
-            self.logger.debug(f"Found {len(files)} files")
-            return files
+        Raises:
+            IOError: If the server rejects the listing
+            requests.RequestException: If the request fails
+        """
+        with self.session.request(
+            "PROPFIND",
+            folder_url,
+            data=PROPFIND_BODY,
+            headers={"Depth": "1", "Content-Type": "application/xml; charset=utf-8"},
+            timeout=self.timeout,
+            stream=True
+        ) as response:
+            self.logger.debug(f"PROPFIND response status: {response.status_code}")
+            if response.status_code >= 400:
+                raise IOError(f"PROPFIND failed with status {response.status_code}")
             
+            yield from iter_propfind_entries(response.iter_content(self.PROPFIND_CHUNK_SIZE), folder_url)
+    
+    def _list_file_versions(self):
+        """
+        List files in the WebDAV folder with their versions
+        
+        Returns:
+            dict: Version of each file keyed by filename, or None on error
+        """
+        try:
+            return {
+                entry.name: entry.version
+                for entry in self._iter_entries(self.base_url)
+                if not entry.is_collection
+            }
         except Exception as e:
-            self.logger.error(f"Error listing files: {str(e)}")
-            return []
+            self.logger.error(f"Error listing file versions: {str(e)}")
+            return None
     
     def read_metadata(self, metadata_filename):
         """
         Read metadata from a .metadata.json file
         
+        Transient failures (connection errors, 429 and 5xx responses) are
+        retried with backoff by the session's retry policy.
+        
         Args:
             metadata_filename (str): Filename of the metadata file
             
         Returns:
-            dict: Metadata as a dictionary
+            dict: Metadata as a dictionary, or None if it could not be read
         """
         self.logger.debug(f"Reading metadata from {metadata_filename}")
         metadata_url = self._get_file_url(metadata_filename)
         
         try:
-            response = requests.get(metadata_url, auth=self.auth, timeout=10)
+            response = self.session.get(metadata_url, timeout=self.timeout)
             
             if response.status_code >= 400:
                 self.logger.error(f"Error downloading metadata: {response.status_code}")
-                return {"tags": [], "embedding": []}
+                return None
             
             try:
                 metadata = response.json()
                 return metadata
             except json.JSONDecodeError as e:
                 self.logger.error(f"Error parsing metadata JSON: {str(e)}")
-                return {"tags": [], "embedding": []}
+                return None
                 
         except Exception as e:
             self.logger.error(f"Error reading metadata from {metadata_filename}: {str(e)}")
-            return {"tags": [], "embedding": []}
-        
-    def get_raw_document(self, filename):
+            return None
+    
+    def read_chunk_embeddings(self, doc_id):
         """
-        Read file from raw documents folder
+        Read the chunk vectors of a document from its sidecar
         
         Args:
-            filename (str): Filename to read
+            doc_id (str): Document ID (filename)
             
         Returns:
-            bytes: Filedata as bytes
+            np.ndarray: Chunk vectors, empty if the sidecar is missing or invalid,
+                        or None if it could not be read this time
         """
-        self.logger.debug(f"Reading file from {self.folder_path_raw}: {filename}")
-        raw_file_url = self._get_file_url_raw_folder(filename)
+        chunks_url = self._get_file_url(f"{doc_id}{CHUNKS_SUFFIX}")
         
         try:
-            response = requests.get(raw_file_url, auth=self.auth, timeout=10)
-            
+            response = self.session.get(chunks_url, timeout=self.timeout)
+            if response.status_code in (404, 410):
+                self.logger.warning(f"Chunk vectors of {doc_id} are missing")
+                return np.empty((0, 0), dtype=np.float32)
             if response.status_code >= 400:
-                self.logger.error(f"Error downloading raw file ({raw_file_url}): {response.status_code}")
-                return
-            return response.content
-                
+                self.logger.error(f"Error downloading chunk vectors of {doc_id}: {response.status_code}")
+                return None
+            
+            chunk_embeddings = decode_embedding_file(response.content)
+            if chunk_embeddings is None:
+                self.logger.error(f"Invalid chunk vectors of {doc_id}")
+                return np.empty((0, 0), dtype=np.float32)
+            return chunk_embeddings
         except Exception as e:
-            self.logger.error(f"Error downloading raw file ({raw_file_url}): {str(e)}")
-            return
+            self.logger.error(f"Error reading chunk vectors of {doc_id}: {str(e)}")
+            return None
     
-    def add_document(self, filename, tags, file_data=None, content=None):
+    def _read_all_metadata(self, metadata_files):
         """
-        Add a document with metadata to WebDAV
+        Read many metadata files concurrently
+        
+        Args:
+            metadata_files (list): Filenames of the metadata files
+            
+        Returns:
+            dict: Metadata dictionaries keyed by metadata filename, None for files that could not be read
+        """
+        total = len(metadata_files)
+        results = {}
+        if not total:
+            return results
+        
+        self.cache.set_load_progress(0, total)
+        report_every = max(1, total // 10)
+        
+        with ThreadPoolExecutor(max_workers=self.metadata_concurrency,
+                                thread_name_prefix="metadata-reader") as executor:
+            futures = {executor.submit(self.read_metadata, f): f for f in metadata_files}
+            
+            for done, future in enumerate(as_completed(futures), start=1):
+                results[futures[future]] = future.result()
+                self.cache.set_load_progress(done, total)
+                if done % report_every == 0 or done == total:
+                    self.logger.info(f"Loaded metadata {done}/{total}")
+        
+        return results
+    
+    def build_metadata(self, tags, content=None, truncated_by=None):
+        """
+        Create the .metadata.json content for a document
+        
+        Only the pooled document vector is stored in the metadata, so the
+        metadata of long documents stays small. The chunk vectors are
+        returned separately and stored in a .chunks.npy sidecar.
         
         Args:
-            filename (str): Name of the document
             tags (str): Comma-separated tags
-            file_data (bytes, optional): Binary file data
             content (str, optional): Text content for embedding
+            truncated_by (str, optional): Extraction budget that cut the content short
             
         Returns:
-            bool: Success status
+            tuple: (metadata, chunk vectors or None), with an encoded embedding if content is provided
         """
-        self.logger.info(f"Adding document: {filename} with tags: {tags}")
-        
         # Convert tags string to list
         tag_list = [tag.strip() for tag in tags.split(',')]
         
         # Create metadata
         metadata = {
+            "format_version": EMBEDDING_FORMAT_VERSION,
             "tags": tag_list,
             "embedding": [],  # Will be updated if content is provided
-            "upload_date": datetime.datetime.now().isoformat()
+            "chunk_count": 0,
+            "upload_date": datetime.datetime.now().isoformat(),
+            "text_truncated": truncated_by is not None
         }
+        if truncated_by is not None:
+            metadata["truncated_by"] = truncated_by
         
         # Add embedding if content is provided
+        chunks = None
         if content:
             try:
-                from services.similarity_service import SimilarityService
-                # Create a temporary service just for embedding generation
-                temp_service = SimilarityService(None)
-                embedding = temp_service.generate_embedding(content)
-                metadata["embedding"] = embedding
-                self.logger.info(f"Generated embedding with {len(embedding)} dimensions")
+                # The model is shared process-wide, so this does not reload it
+                embedding, chunk_embeddings = embedding_models.encode_document(self.model_name, content)
+                metadata["embedding"] = encode_embedding(embedding, self.embedding_dtype)
+                if len(chunk_embeddings):
+                    chunks = np.asarray(chunk_embeddings, dtype=self.embedding_dtype)
+                    metadata["chunk_count"] = len(chunks)
+                self.logger.info(f"Generated embedding with {len(embedding)} dimensions "
+                                 f"from {len(chunk_embeddings)} chunks")
             except Exception as e:
                 self.logger.error(f"Error generating embedding: {str(e)}")
         
-        # Create document on WebDAV
-        doc_url = self._get_file_url(filename)
-        metadata_url = self._get_file_url(f"{filename}.metadata.json")
-        
-        # Upload document
-        doc_content = file_data if file_data is not None else content.encode('utf-8') if content else b"Empty document"
-        success = True
-        
-        try:
-            response = requests.put(doc_url, data=doc_content, auth=self.auth, timeout=30)
-            if response.status_code >= 400:
-                self.logger.error(f"Error uploading document: {response.status_code}")
-                success = False
-            else:
-                self.logger.debug(f"Document uploaded successfully")
-        except Exception as e:
-            self.logger.error(f"Error uploading document: {str(e)}")
-            success = False
-        
-        # Upload metadata
-        try:
-            metadata_json = json.dumps(metadata)
-            response = requests.put(metadata_url, data=metadata_json, auth=self.auth, timeout=10)
-            if response.status_code >= 400:
-                self.logger.error(f"Error uploading metadata: {response.status_code}")
-                success = False
-            else:
-                self.logger.debug(f"Metadata uploaded successfully")
-        except Exception as e:
-            self.logger.error(f"Error uploading metadata: {str(e)}")
-            success = False
-        
-        # If successful, update the document cache
-        if success:
-            # Create document object
-            doc = {
-                'id': filename,
-                'filename': filename,
-                'tags': tag_list,
-                'embedding': metadata.get('embedding', []),
-                'similarity': 0
-            }
-            # Update cache
-            self.cache.update_document(doc)
-        
-        return success
-    
-    def delete_document(self, doc_id):
-        """
-        Delete a document and its metadata from WebDAV
-        
-        Args:
-            doc_id (str): Document ID (filename)
-            
-        Returns:
-            bool: Success status
-        """
-        self.logger.info(f"Deleting document: {doc_id}")
-        doc_url = self._get_file_url(doc_id)
-        metadata_url = self._get_file_url(f"{doc_id}.metadata.json")
-        
-        success = True
-        
-        # Delete document
-        try:
-            response = requests.delete(doc_url, auth=self.auth, timeout=10)
-            if response.status_code >= 400 and response.status_code != 404:
-                self.logger.error(f"Error deleting document: {response.status_code}")
-                success = False
-            else:
-                self.logger.debug(f"Document deleted successfully")
-        except Exception as e:
-            self.logger.error(f"Error deleting document: {str(e)}")
-            success = False
-        
-        # Delete metadata
-        try:
-            response = requests.delete(metadata_url, auth=self.auth, timeout=10)
-            if response.status_code >= 400 and response.status_code != 404:
-                self.logger.error(f"Error deleting metadata: {response.status_code}")
-                success = False
-            else:
-                self.logger.debug(f"Metadata deleted successfully")
-        except Exception as e:
-            self.logger.error(f"Error deleting metadata: {str(e)}")
-            success = False
-        
-        # Update the cache if the deletion was successful
-        if success:
-            self.cache.delete_document(doc_id)
-        
-        return success
+        return metadata, chunks
     
     def get_all_files_without_metadata(self, raw_folder):
         """
@@ -378,6 +554,7 @@ class WebDAVService:
         
         # List files
         files = self._list_files_in_folder(raw_folder)
+        file_set = set(files)
         
         # Create file info
         file_list = []
@@ -388,7 +565,7 @@ class WebDAVService:
                 
             # Check if there's a metadata file
             metadata_file = f"{filename}.metadata.json"
-            if metadata_file in files:
+            if metadata_file in file_set:
                 # Skip files that already have metadata
                 continue
                 
@@ -415,49 +592,7 @@ class WebDAVService:
         folder_url = urljoin(self.webdav_url, folder_path.strip('/'))
         
         try:
-            # Send PROPFIND request to list files
-            response = requests.request(
-                "PROPFIND", 
-                folder_url, 
-                auth=self.auth, 
-                headers={"Depth": "1"},
-                timeout=15
-            )
-            
-            self.logger.debug(f"PROPFIND response status: {response.status_code}")
-            
-            if response.status_code >= 400:
-                self.logger.error(f"Error listing files: {response.status_code}")
-                return []
-            
-            # Simple parsing of XML response to get filenames
-            content = response.text
-            files = []
-            
-            # Extract hrefs from the XML
-            import re
-            href_pattern = r'<[^>]*?href[^>]*?>(.*?)</[^>]*?href[^>]*?>'
-            
-            matches = re.findall(href_pattern, content, re.IGNORECASE | re.DOTALL)
-            
-            for href in matches:
-                # Clean up the href
-                href = href.strip()
-                
-                # Skip the folder itself and other folders
-                if href.rstrip('/') == folder_url.rstrip('/') or href.endswith('/'):
-                    continue
-                
-                # Extract filename from the URL
-                filename = os.path.basename(href)
-                if filename:
-                    # URL decode the filename
-                    try:
-                        filename = unquote(filename)
-                        files.append(filename)
-                    except Exception as e:
-                        self.logger.error(f"Error decoding filename: {e}")
-            
+            files = [entry.name for entry in self._iter_entries(folder_url) if not entry.is_collection]
             self.logger.debug(f"Found {len(files)} files in {folder_path}")
             return files
             
@@ -465,61 +600,59 @@ class WebDAVService:
             self.logger.error(f"Error listing files in {folder_path}: {str(e)}")
             return []
 
-    def move_file_with_metadata(self, filename, tags, content=None):
+    def reload_cache(self):
         """
-        Move a file from raw documents folder to the documents folder and add metadata
+        Refresh the document cache, fetching only added or changed metadata
         
-        Args:
-            filename (str): Filename (will be used in target folder)
-            tags (str): Comma-separated tags
-            content (str, optional): Text content for embedding
-            
         Returns:
-            bool: Success status
+            int: Number of documents in the cache
         """
-        self.logger.info(f"Moving file {filename} from raw documents to documents folder with tags: {tags}")
+        self.logger.info("Refreshing document cache")
+        self.sync_cache()
+        return len(self.cache.get_all_documents())
         
-        try:
-            # Download the file
-            source_url = self._get_file_url_raw_folder(filename)
-            response = requests.get(source_url, auth=self.auth, timeout=30)
-            
-            if response.status_code >= 400:
-                self.logger.error(f"Error downloading source file: {response.status_code}")
-                return False
-            
-            file_data = response.content
-            
-            # Add the file to documents folder with metadata
-            success = self.add_document(filename, tags, file_data, content)
-            
-            if success:
-                # Delete the original file
-                try:
-                    delete_response = requests.delete(source_url, auth=self.auth, timeout=10)
-                    if delete_response.status_code >= 400 and delete_response.status_code != 404:
-                        self.logger.error(f"Error deleting source file: {delete_response.status_code}")
-                except Exception as e:
-                    self.logger.error(f"Error deleting source file: {str(e)}")
-            
-            return success
-            
-        except Exception as e:
-            self.logger.error(f"Error moving file: {str(e)}")
-            return False
-            
-    def reload_cache(self):
+    def start_refresher(self, interval=300, max_staleness=600):
         """
-        Force a reload of the document cache
+        Keep the document cache fresh with a background refresher
+        
+        Args:
+            interval (float): Seconds between refreshes
+            max_staleness (float): Cache age in seconds after which a request triggers
+                                   an early refresh, None to only refresh on the interval
+        """
+        if self.refresher is None:
+            self.refresher = CacheRefresher(self, interval, max_staleness)
+            self.refresher.start()
+    
+    def _revalidate_if_stale(self):
+        """Let the refresher revalidate a stale cache without blocking the caller"""
+        if self.refresher is not None:
+            self.refresher.revalidate_if_stale()
+    
+    def get_embedding_index(self):
+        """
+        Get the embedding index of the cached documents, loading the cache if needed
         
         Returns:
-            int: Number of documents loaded
+            EmbeddingMatrix or FaissIndex: Index kept in sync with the document cache
         """
-        self.logger.info("Forcing reload of document cache")
-        self.cache.clear()
-        documents = self.get_all_documents()  # This will reload and update the cache
-        return len(documents)
+        if not self.cache.is_loaded:
+            self.get_all_documents()
+        else:
+            self._revalidate_if_stale()
+        return self.cache.embedding_index
+    
+    def get_chunk_index(self):
+        """
+        Get the per-chunk embedding index, loading the cache if needed
         
+        Returns:
+            EmbeddingMatrix or FaissIndex: Chunk index, or None if chunk matching is disabled
+        """
+        if not self.cache.is_loaded:
+            self.get_all_documents()
+        return self.cache.chunk_index
+    
     def get_cache_stats(self):
         """
         Get document cache statistics
@@ -527,4 +660,7 @@ class WebDAVService:
         Returns:
             dict: Cache statistics
         """
-        return self.cache.get_stats()
\ No newline at end of file
+        stats = self.cache.get_stats()
+        if self.refresher is not None:
+            stats.update(self.refresher.get_stats())
+        return stats
\ No newline at end of file
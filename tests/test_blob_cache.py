@@ -0,0 +1,71 @@
+import os
+import asyncio
+import httpx
+import pytest
+from services.blob_cache import BlobCache
+from services.webdav_service import WebDAVService
+from services.async_webdav_service import AsyncWebDAVService
+
+@pytest.fixture
+def cache(tmp_path):
+    return BlobCache(str(tmp_path), max_bytes=10, revalidate_after=30)
+
+def put(cache, key, etag, body):
+    temp_file = cache.create_temp_file()
+    temp_file.write(body)
+    return cache.put(key, etag, None, temp_file)
+
+def test_eviction_keeps_a_pinned_file_until_it_is_released(cache):
+    entry = put(cache, 'a', 'etag-a', b'123456')
+    assert cache.pin(entry)
+    
+    put(cache, 'b', 'etag-b', b'123456')
+    assert cache.get('a') is None
+    assert os.path.exists(entry.path)
+    assert not os.path.exists(f"{entry.path}.json")
+    
+    cache.release(entry)
+    assert not os.path.exists(entry.path)
+
+def test_evicted_entry_cannot_be_pinned(cache):
+    entry = put(cache, 'a', 'etag-a', b'123456')
+    put(cache, 'b', 'etag-b', b'123456')
+    assert not cache.pin(entry)
+
+def test_release_keeps_a_new_download_of_the_same_version(cache):
+    entry = put(cache, 'a', 'etag-a', b'123')
+    assert cache.pin(entry)
+    cache.discard('a')
+    
+    current = put(cache, 'a', 'etag-a', b'123')
+    cache.release(entry)
+    assert cache.get('a') is current
+    assert os.path.exists(current.path)
+
+def test_restart_removes_files_evicted_while_sent(tmp_path, cache):
+    entry = put(cache, 'a', 'etag-a', b'123456')
+    cache.pin(entry)
+    put(cache, 'b', 'etag-b', b'123456')
+    
+    # The process ends before the response released the file
+    reopened = BlobCache(str(tmp_path), max_bytes=10)
+    assert not os.path.exists(entry.path)
+    assert reopened.get('b') is not None
+
+def test_preview_miss_fills_the_cache_in_the_background(tmp_path, monkeypatch):
+    monkeypatch.setattr(WebDAVService, '_check_or_create_folder', lambda self: None)
+    webdav = WebDAVService('http://webdav.test/', 'user', 'password', 'documents', 'raw')
+    service = AsyncWebDAVService(webdav, blob_cache=BlobCache(str(tmp_path / 'blobs'), max_bytes=1000))
+    service.client = httpx.AsyncClient(transport=httpx.MockTransport(
+        lambda request: httpx.Response(200, content=b'body', headers={'ETag': '"v1"'})
+    ))
+    
+    async def preview():
+        assert await service.get_cached_raw_document('a.pdf', wait=False) is None
+        await asyncio.gather(*service.blob_fetches.values())
+        return await service.get_cached_raw_document('a.pdf', wait=False)
+    
+    entry = asyncio.run(preview())
+    assert entry.etag == '"v1"'
+    with open(entry.path, 'rb') as file:
+        assert file.read() == b'body'
@@ -0,0 +1,78 @@
+import sqlite3
+from services.sqlite_lru_store import SQLiteLRUStore
+from services.embedding_cache import EmbeddingCache
+from services.text_cache import TextCache
+from services.embedding_models import EmbeddingModelRegistry
+from models.extraction_result import ExtractionResult
+
+def test_least_recently_used_rows_are_evicted(tmp_path):
+    store = SQLiteLRUStore(str(tmp_path / 'cache.db'), 'items', 'namespace', [('value', 'TEXT')], 10, 'test')
+    store.put_many('n', {f"h{i}": (str(i),) for i in range(10)})
+    store.get_many('n', ['h0'])
+    
+    # Over the limit, the cache shrinks to 10% below it
+    store.put_many('n', {'h10': ('10',)})
+    assert store.size == 9
+    found = store.get_many('n', [f"h{i}" for i in range(11)])
+    assert len(found) == 9
+    assert found['h0'] == ('0',) and found['h10'] == ('10',)
+
+def test_embeddings_round_trip(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / 'embeddings.db'))
+    content_hash = cache.content_hash('text')
+    cache.put_many('model', {content_hash: [0.5, 1.0]})
+    
+    assert cache.get_many('model', [content_hash, 'missing']) == {content_hash: [0.5, 1.0]}
+    assert cache.get_many('other-model', [content_hash]) == {}
+    assert cache.get_stats()['entries'] == 1
+
+def test_text_cache_reads_databases_without_truncated_by(tmp_path):
+    path = str(tmp_path / 'texts.db')
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE texts (extractor TEXT NOT NULL, content_hash TEXT NOT NULL, text BLOB NOT NULL, "
+        "last_used REAL NOT NULL, PRIMARY KEY (extractor, content_hash))"
+    )
+    connection.commit()
+    connection.close()
+    
+    cache = TextCache(path)
+    cache.put('pdf', 'hash', ExtractionResult('text', 'max_pages'))
+    
+    # A new instance has to read the text from disk
+    result = TextCache(path).get('pdf', 'hash')
+    assert (result.text, result.truncated_by) == ('text', 'max_pages')
+    assert TextCache(path).get('docx', 'hash') is None
+
+def test_size_is_tracked_without_counting(tmp_path):
+    store = SQLiteLRUStore(str(tmp_path / 'cache.db'), 'items', 'namespace', [('value', 'TEXT')], 100, 'test')
+    store.put_many('n', {'a': ('1',), 'b': ('2',)})
+    store.put_many('n', {'b': ('3',), 'c': ('4',)})
+    store.put_many('m', {'a': ('5',)})
+    
+    assert store.size == 4
+    assert store.size == store.connection.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+    assert store.get_many('n', ['b']) == {'b': ('3',)}
+    
+    # A reopened store counts once
+    assert SQLiteLRUStore(store.path, 'items', 'namespace', [('value', 'TEXT')], 100, 'test').size == 4
+
+def test_search_queries_are_not_persisted(tmp_path):
+    registry = EmbeddingModelRegistry()
+    registry.configure(cache=EmbeddingCache(str(tmp_path / 'embeddings.db')), query_cache_size=2)
+    encoded = []
+    
+    def encode(model_name, texts):
+        encoded.extend(texts)
+        return [[float(len(text))] for text in texts]
+    
+    registry._encode_uncached = encode
+    
+    assert registry.encode_query('model', 'query') == [5.0]
+    assert registry.encode_query('model', 'query') == [5.0]
+    assert encoded == ['query']
+    assert registry.cache.get_stats()['entries'] == 0
+    
+    registry.encode_query('model', 'a')
+    registry.encode_query('model', 'b')
+    assert ('model', 'query') not in registry.query_cache
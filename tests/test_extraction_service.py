@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+import asyncio
+import pytest
+from services.extraction_service import ExtractionService
+
+def slow_echo(value, seconds):
+    """Worker job returning value after some seconds"""
+    time.sleep(seconds)
+    return value
+
+def loaded_modules(names):
+    """Worker job returning which of the named modules are imported"""
+    return [name for name in names if name in sys.modules]
+
+@pytest.fixture
+def service():
+    """Two-worker service whose jobs and timeouts are chosen per filename"""
+    service = ExtractionService(workers=2, max_queue=2)
+    service.jobs = {}
+    service.timeouts = {}
+    
+    async def plan_jobs(source, filename):
+        return [service.jobs[filename]], False
+    
+    service._plan_jobs = plan_jobs
+    service.get_timeout = lambda filename: service.timeouts.get(filename, 30)
+    yield service
+    service.shutdown()
+
+def run(*coroutines):
+    async def gather():
+        return await asyncio.gather(*coroutines)
+    return asyncio.run(gather())
+
+def test_workers_do_not_import_the_app_services(service):
+    modules = ['requests', 'services.webdav_service', 'services.embedding_models']
+    service.jobs['a.txt'] = (loaded_modules, modules)
+    assert run(service.extract(b'a', 'a.txt')) == [[]]
+
+def test_job_past_its_timeout_is_terminated(service):
+    service.jobs['slow.txt'] = (slow_echo, 'late', 30)
+    service.timeouts['slow.txt'] = 1
+    
+    started = time.monotonic()
+    [result] = run(service.extract(b'slow', 'slow.txt'))
+    assert result.truncated_by == 'timeout'
+    assert time.monotonic() - started < 10
+    assert service.pool is None
+    
+    # The next job starts a new pool
+    service.jobs['fast.txt'] = (slow_echo, 'done', 0)
+    assert run(service.extract(b'fast', 'fast.txt')) == ['done']
+
+def test_crashed_worker_is_replaced(service):
+    service.jobs['crash.txt'] = (os._exit, 1)
+    [result] = run(service.extract(b'crash', 'crash.txt'))
+    assert result.text == '' and not result.truncated
+    assert service.pool is None
+    
+    service.jobs['fast.txt'] = (slow_echo, 'done', 0)
+    assert run(service.extract(b'fast', 'fast.txt')) == ['done']
+
+def test_job_in_a_terminated_pool_is_retried(service):
+    service.jobs['slow.txt'] = (slow_echo, 'late', 30)
+    service.timeouts['slow.txt'] = 1
+    service.jobs['other.txt'] = (slow_echo, 'other', 2)
+    
+    slow, other = run(service.extract(b'slow', 'slow.txt'), service.extract(b'other', 'other.txt'))
+    assert slow.truncated_by == 'timeout'
+    assert other == 'other'
+    assert service.slots._value == 2
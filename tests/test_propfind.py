@@ -0,0 +1,104 @@
+from utils.propfind import PropfindParser, iter_propfind_entries
+
+FOLDER_URL = 'http://webdav.test/remote.php/dav/files/user/My%20Documents'
+
+def response(href, *propstats):
+    return f"<d:response><d:href>{href}</d:href>{''.join(propstats)}</d:response>"
+
+def propstat(status, props):
+    return f"<d:propstat><d:prop>{props}</d:prop><d:status>HTTP/1.1 {status}</d:status></d:propstat>"
+
+def multistatus(*responses, prefix='d'):
+    body = (f'<?xml version="1.0" encoding="utf-8"?>'
+            f'<d:multistatus xmlns:d="DAV:">{"".join(responses)}</d:multistatus>')
+    return body.replace('d:', f'{prefix}:').replace(':d=', f':{prefix}=').encode('utf-8')
+
+FILE_PROPS = ('<d:getetag>"abc"</d:getetag><d:getcontentlength>1234</d:getcontentlength>'
+              '<d:getlastmodified>Tue, 01 Oct 2024 10:00:00 GMT</d:getlastmodified>'
+              '<d:getcontenttype>application/pdf</d:getcontenttype><d:resourcetype/>')
+
+def parse(body, chunk_size=None):
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] if chunk_size else [body]
+    return list(iter_propfind_entries(chunks, FOLDER_URL))
+
+def test_files_and_folders_are_listed_without_the_folder_itself():
+    body = multistatus(
+        response('/remote.php/dav/files/user/My%20Documents/', propstat('200 OK', '<d:resourcetype><d:collection/></d:resourcetype>')),
+        response('/remote.php/dav/files/user/My%20Documents/a.pdf', propstat('200 OK', FILE_PROPS)),
+        response('/remote.php/dav/files/user/My%20Documents/Sub/', propstat('200 OK', '<d:resourcetype><d:collection/></d:resourcetype>'))
+    )
+    
+    entries = parse(body)
+    assert [(entry.name, entry.is_collection) for entry in entries] == [('a.pdf', False), ('Sub', True)]
+    
+    entry = entries[0]
+    assert (entry.etag, entry.size, entry.content_type) == ('"abc"', 1234, 'application/pdf')
+    assert entry.mtime == 1727776800.0
+    assert entry.version == '"abc"'
+
+def test_any_namespace_prefix_is_accepted():
+    body = multistatus(response('/remote.php/dav/files/user/My%20Documents/a.pdf', propstat('200 OK', FILE_PROPS)),
+                       prefix='D')
+    assert [entry.etag for entry in parse(body)] == ['"abc"']
+
+def test_properties_come_from_every_successful_propstat():
+    body = multistatus(response(
+        '/remote.php/dav/files/user/My%20Documents/a.pdf',
+        propstat('200 OK', '<d:getetag>"abc"</d:getetag>'),
+        propstat('200 OK', '<d:getcontentlength>10</d:getcontentlength>')
+    ))
+    [entry] = parse(body)
+    assert (entry.etag, entry.size) == ('"abc"', 10)
+
+def test_properties_of_a_failed_propstat_are_ignored():
+    # Servers list the properties they cannot return, empty, under a 404 propstat
+    body = multistatus(response(
+        '/remote.php/dav/files/user/My%20Documents/a.pdf',
+        propstat('404 Not Found', '<d:getetag/><d:getcontentlength/><d:resourcetype><d:collection/></d:resourcetype>'),
+        propstat('200 OK', '<d:getetag>"abc"</d:getetag><d:getcontentlength>10</d:getcontentlength>')
+    ))
+    [entry] = parse(body)
+    assert (entry.etag, entry.size, entry.is_collection) == ('"abc"', 10, False)
+
+def test_entry_without_etag_is_versioned_by_time_and_size():
+    body = multistatus(response(
+        '/remote.php/dav/files/user/My%20Documents/a.pdf',
+        propstat('200 OK', '<d:getcontentlength>10</d:getcontentlength>'
+                           '<d:getlastmodified>Tue, 01 Oct 2024 10:00:00 GMT</d:getlastmodified>'),
+        propstat('404 Not Found', '<d:getetag/>')
+    ))
+    [entry] = parse(body)
+    assert entry.etag is None
+    assert entry.version == '1727776800.0/10'
+
+def test_percent_encoded_hrefs_are_decoded():
+    body = multistatus(
+        # Absolute href and an unencoded folder path both match the listed folder
+        response('http://webdav.test/remote.php/dav/files/user/My Documents/', propstat('200 OK', '')),
+        response('/remote.php/dav/files/user/My%20Documents/Gr%C3%BC%C3%9Fe%20%26%20more.pdf', propstat('200 OK', FILE_PROPS)),
+        response('/remote.php/dav/files/user/My%20Documents/100%25.txt', propstat('200 OK', FILE_PROPS))
+    )
+    entries = parse(body)
+    assert [entry.name for entry in entries] == ['Grüße & more.pdf', '100%.txt']
+    assert entries[0].href.endswith('Gr%C3%BC%C3%9Fe%20%26%20more.pdf')
+
+def test_entries_are_the_same_however_the_body_is_chunked():
+    body = multistatus(*[
+        response(f'/remote.php/dav/files/user/My%20Documents/{i}.pdf', propstat('200 OK', FILE_PROPS))
+        for i in range(20)
+    ])
+    names = [entry.name for entry in parse(body)]
+    assert names == [f'{i}.pdf' for i in range(20)]
+    assert [entry.name for entry in parse(body, chunk_size=7)] == names
+
+def test_parsed_responses_are_dropped():
+    parser = PropfindParser(FOLDER_URL)
+    body = multistatus(*[
+        response(f'/remote.php/dav/files/user/My%20Documents/{i}.pdf', propstat('200 OK', FILE_PROPS))
+        for i in range(50)
+    ])
+    
+    assert len(parser.feed(body[:-len('</d:multistatus>')])) == 50
+    assert len(parser.root) == 0
+    assert parser.feed(b'</d:multistatus>') == []
+    assert parser.close() == []
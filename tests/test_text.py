@@ -0,0 +1,66 @@
+import re
+import pytest
+import utils.text
+from utils.text import chunk_text
+from services.embedding_models import EmbeddingModelRegistry
+
+class FakeTokenizer:
+    """Fast tokenizer stand-in splitting words into pieces of at most three characters"""
+    is_fast = True
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def __call__(self, text, add_special_tokens=True, return_offsets_mapping=False):
+        self.calls += 1
+        offsets = []
+        for match in re.finditer(r'\S+', text):
+            for start in range(match.start(), match.end(), 3):
+                offsets.append((start, min(start + 3, match.end())))
+        return {'offset_mapping': offsets}
+    
+    def num_special_tokens_to_add(self, pair=False):
+        return 2
+
+class FakeModel:
+    max_seq_length = 10
+    tokenizer = FakeTokenizer()
+
+def words(count):
+    return " ".join(f"w{i}" for i in range(count))
+
+def test_chunks_are_bounded_by_tokenizer_tokens():
+    # Long words are several tokens for the tokenizer but one estimated token
+    text = "abcdefg hi jklmno"
+    assert chunk_text(text, 3, 0) == ["abcdefg hi jklmno"]
+    assert chunk_text(text, 3, 0, tokenizer=FakeTokenizer()) == ["abcdefg", "hi jklmno"]
+    assert chunk_text(text, 2, 0, tokenizer=FakeTokenizer()) == ["abcdef", "g hi", "jklmno"]
+
+def test_consecutive_chunks_overlap():
+    assert chunk_text(words(7), 3, 1) == ["w0 w1 w2", "w2 w3 w4", "w4 w5 w6"]
+    assert chunk_text(words(7), 4, 2, tokenizer=FakeTokenizer()) == ["w0 w1 w2 w3", "w2 w3 w4 w5", "w4 w5 w6"]
+
+def test_remainder_covered_by_previous_chunk_is_dropped():
+    assert chunk_text(words(5), 3, 1) == ["w0 w1 w2", "w2 w3 w4"]
+    assert chunk_text(words(2), 3, 1) == ["w0 w1"]
+
+def test_max_chunks_stops_tokenizing(monkeypatch):
+    monkeypatch.setattr(utils.text, 'TOKENIZE_SLICE_CHARS', 30)
+    tokenizer = FakeTokenizer()
+    text = words(1000)
+    
+    chunks = chunk_text(text, 5, 0, max_chunks=2, tokenizer=tokenizer)
+    assert chunks == ["w0 w1 w2 w3 w4", "w5 w6 w7 w8 w9"]
+    assert tokenizer.calls == 1
+
+def test_slices_tokenize_like_the_whole_text(monkeypatch):
+    text = words(200)
+    whole = chunk_text(text, 7, 2, tokenizer=FakeTokenizer())
+    monkeypatch.setattr(utils.text, 'TOKENIZE_SLICE_CHARS', 25)
+    assert chunk_text(text, 7, 2, tokenizer=FakeTokenizer()) == whole
+
+@pytest.mark.parametrize("configured, expected", [(None, 8), (5, 5), (100, 8)])
+def test_chunk_tokens_fit_the_model_input(configured, expected):
+    registry = EmbeddingModelRegistry()
+    registry.configure(chunk_tokens=configured)
+    assert registry.get_chunk_tokens(FakeModel()) == expected
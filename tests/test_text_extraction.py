@@ -0,0 +1,88 @@
+import io
+import types
+import pytest
+import services.text_extraction
+from services.text_extraction import TextExtractor
+
+pymupdf = pytest.importorskip('pymupdf')
+openpyxl = pytest.importorskip('openpyxl')
+
+def make_pdf(pages):
+    """PDF whose pages read 'Page 1', 'Page 2', ..."""
+    document = pymupdf.open()
+    for number in range(1, pages + 1):
+        document.new_page().insert_text((72, 72), f"Page {number}")
+    data = document.tobytes()
+    document.close()
+    return data
+
+def make_xlsx(sheets, rows):
+    """Workbook with the given number of sheets, each with numbered rows"""
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for sheet_number in range(1, sheets + 1):
+        sheet = workbook.create_sheet(f"Sheet{sheet_number}")
+        for row in range(1, rows + 1):
+            sheet.append([f"s{sheet_number}r{row}", row])
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Monotonic clock of the extractor that advances 10 seconds on every reading"""
+    readings = iter(range(0, 10000, 10))
+    monkeypatch.setattr(services.text_extraction, 'time', types.SimpleNamespace(monotonic=lambda: next(readings)))
+
+def test_pdf_within_budget_is_complete():
+    result = TextExtractor({'pdf': {'max_pages': 5, 'max_chars': 1000, 'timeout': 60}}).extract(make_pdf(3), 'a.pdf')
+    assert [f"Page {n}" in result.text for n in (1, 2, 3)] == [True, True, True]
+    assert result.truncated_by is None
+
+def test_pdf_page_budget():
+    result = TextExtractor({'pdf': {'max_pages': 2}}).extract(make_pdf(5), 'a.pdf')
+    assert "Page 2" in result.text and "Page 3" not in result.text
+    assert result.truncated_by == 'max_pages'
+
+def test_pdf_char_budget():
+    result = TextExtractor({'pdf': {'max_chars': 10}}).extract(make_pdf(5), 'a.pdf')
+    assert len(result.text) <= 10
+    assert result.text.startswith("Page 1")
+    assert result.truncated_by == 'max_chars'
+
+def test_pdf_time_budget(clock):
+    # The deadline is 15s after the start: page 1 ends at 10s, page 2 at 20s
+    result = TextExtractor({'pdf': {'timeout': 15}}).extract(make_pdf(5), 'a.pdf')
+    assert "Page 2" in result.text and "Page 3" not in result.text
+    assert result.truncated_by == 'timeout'
+
+def test_pdf_over_size_budget_is_skipped():
+    result = TextExtractor({'pdf': {'max_bytes': 100}}).extract(make_pdf(1), 'a.pdf')
+    assert result.text == ''
+    assert result.truncated_by == 'max_bytes'
+
+def test_workbook_within_budget_is_complete():
+    result = TextExtractor({'spreadsheet': {'max_pages': 2, 'max_rows': 10}}).extract(make_xlsx(2, 5), 'a.xlsx')
+    assert "Sheet2" in result.text and "s2r5\t5" in result.text
+    assert result.truncated_by is None
+
+def test_workbook_sheet_budget():
+    result = TextExtractor({'spreadsheet': {'max_pages': 2}}).extract(make_xlsx(3, 2), 'a.xlsx')
+    assert "s2r2" in result.text and "Sheet3" not in result.text
+    assert result.truncated_by == 'max_pages'
+
+def test_workbook_row_budget():
+    result = TextExtractor({'spreadsheet': {'max_rows': 4}}).extract(make_xlsx(2, 3), 'a.xlsx')
+    assert "s2r1" in result.text and "s2r2" not in result.text
+    assert result.truncated_by == 'max_rows'
+
+def test_workbook_char_budget():
+    result = TextExtractor({'spreadsheet': {'max_chars': 30}}).extract(make_xlsx(1, 100), 'a.xlsx')
+    assert len(result.text) <= 30
+    assert "s1r1" in result.text
+    assert result.truncated_by == 'max_chars'
+
+def test_workbook_time_budget(clock):
+    result = TextExtractor({'spreadsheet': {'timeout': 15}}).extract(make_xlsx(3, 2), 'a.xlsx')
+    assert "Sheet2" in result.text and "Sheet3" not in result.text
+    assert result.truncated_by == 'timeout'
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from services.vector_index import FaissIndex
+
+pytest.importorskip('faiss')
+
+DIMENSION = 8
+
+def documents(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{'id': f"doc{i}", 'embedding': rng.normal(size=DIMENSION).tolist()} for i in range(count)]
+
+def make_index(index_type, path=None):
+    # Few lists so a small test corpus is enough to train IVF
+    return FaissIndex(index_type, path=path, nlist=2, nprobe=2, save_interval=0)
+
+@pytest.mark.parametrize("index_type", ['flat', 'ivf', 'hnsw'])
+def test_added_documents_are_found(index_type):
+    docs = documents(100)
+    index = make_index(index_type)
+    index.sync(docs)
+    assert len(index) == 100
+    assert index._is_trained_ivf() == (index_type == 'ivf')
+    
+    assert index.top_k(docs[7]['embedding'], 1)[0][0] == 'doc7'
+    
+    index.add('new', docs[3]['embedding'])
+    assert {doc_id for doc_id, _ in index.top_k(docs[3]['embedding'], 2)} == {'doc3', 'new'}
+
+@pytest.mark.parametrize("index_type", ['flat', 'ivf', 'hnsw'])
+def test_removed_documents_are_not_found(index_type):
+    docs = documents(100)
+    index = make_index(index_type)
+    index.sync(docs)
+    
+    assert index.remove('doc7')
+    assert not index.remove('doc7')
+    assert 'doc7' not in index
+    assert all(doc_id != 'doc7' for doc_id, _ in index.top_k(docs[7]['embedding'], 10))
+
+def test_hnsw_tombstones_are_compacted():
+    docs = documents(50)
+    index = make_index('hnsw')
+    index.sync(docs)
+    
+    for doc in docs[:10]:
+        index.remove(doc['id'])
+    assert len(index.tombstones) == 10
+    
+    # Past MAX_TOMBSTONE_RATIO the graph is rebuilt without the removed vectors
+    index.remove(docs[10]['id'])
+    assert not index.tombstones
+    assert index.index.ntotal == len(index) == 39
+    assert index.top_k(docs[20]['embedding'], 1)[0][0] == 'doc20'
+
+@pytest.mark.parametrize("index_type", ['flat', 'ivf', 'hnsw'])
+def test_saved_index_is_loaded(tmp_path, index_type):
+    path = str(tmp_path / 'documents.faiss')
+    docs = documents(100)
+    index = make_index(index_type, path)
+    index.sync(docs)
+    index.remove('doc5')
+    index.save()
+    
+    loaded = make_index(index_type, path)
+    assert loaded.load()
+    assert len(loaded) == 99 and 'doc5' not in loaded
+    assert loaded.top_k(docs[9]['embedding'], 1)[0][0] == 'doc9'
+    assert loaded.fingerprints == index.fingerprints
+
+def test_unreadable_index_is_rebuilt(tmp_path):
+    path = tmp_path / 'documents.faiss'
+    path.write_bytes(b'\x00not an index')
+    docs = documents(10)
+    
+    index = make_index('flat', str(path))
+    assert not index.load()
+    
+    index.sync(docs)
+    assert len(index) == 10
+    assert make_index('flat', str(path)).load()
+
+def test_index_of_another_type_is_rebuilt(tmp_path):
+    path = str(tmp_path / 'documents.faiss')
+    index = make_index('flat', path)
+    index.sync(documents(10))
+    
+    assert not make_index('hnsw', path).load()
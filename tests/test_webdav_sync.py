@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from services.webdav_service import WebDAVService
+from services.embedding_matrix import EmbeddingMatrix
+
+@pytest.fixture
+def webdav(monkeypatch):
+    """WebDAV service whose folder listing and metadata reads are faked"""
+    monkeypatch.setattr(WebDAVService, '_check_or_create_folder', lambda self: None)
+    service = WebDAVService('http://webdav.test/', 'user', 'password', 'documents', 'raw',
+                            chunk_index=EmbeddingMatrix())
+    service.entries = {}
+    service.metadata = {}
+    service._list_file_versions = lambda: dict(service.entries)
+    service.read_metadata = lambda filename: service.metadata.get(filename)
+    return service
+
+def add_file(webdav, doc_id, version, tags, chunk_count=0):
+    """Put a document and its metadata into the fake folder"""
+    webdav.entries[doc_id] = 'doc'
+    webdav.entries[f"{doc_id}.metadata.json"] = version
+    webdav.metadata[f"{doc_id}.metadata.json"] = {"tags": tags, "embedding": [], "chunk_count": chunk_count}
+
+def sync_with_chunks(webdav):
+    """Sync the cache and wait for the chunk vectors it fetches"""
+    webdav.sync_cache()
+    if webdav.chunk_fetcher is not None:
+        webdav.chunk_fetcher.join()
+
+def test_failed_metadata_read_of_new_document_is_retried(webdav):
+    add_file(webdav, 'a.pdf', 'etag-a', ['a'])
+    add_file(webdav, 'b.pdf', 'etag-b', ['b'])
+    fetched = webdav.metadata.pop('b.pdf.metadata.json')
+    
+    webdav.sync_cache()
+    assert webdav.cache.get_document('b.pdf')['tags'] == []
+    assert webdav.cache.get_versions()['b.pdf'] is None
+    
+    webdav.metadata['b.pdf.metadata.json'] = fetched
+    assert webdav.sync_cache() == {'added': 0, 'changed': 1, 'deleted': 0}
+    assert webdav.cache.get_document('b.pdf')['tags'] == ['b']
+    assert webdav.cache.get_versions()['b.pdf'] == 'etag-b'
+
+def test_failed_metadata_read_of_changed_document_keeps_cached_entry(webdav):
+    add_file(webdav, 'a.pdf', 'etag-1', ['old'])
+    webdav.sync_cache()
+    
+    add_file(webdav, 'a.pdf', 'etag-2', ['new'])
+    fetched = webdav.metadata.pop('a.pdf.metadata.json')
+    webdav.sync_cache()
+    assert webdav.cache.get_document('a.pdf')['tags'] == ['old']
+    assert webdav.cache.get_versions()['a.pdf'] == 'etag-1'
+    
+    webdav.metadata['a.pdf.metadata.json'] = fetched
+    assert webdav.sync_cache() == {'added': 0, 'changed': 1, 'deleted': 0}
+    assert webdav.cache.get_document('a.pdf')['tags'] == ['new']
+
+def test_missing_chunk_sidecar_is_not_fetched_again(webdav):
+    add_file(webdav, 'a.pdf', 'etag-1', ['a'], chunk_count=2)
+    fetched = []
+    responses = {'a.pdf': None}
+    
+    def read_chunk_embeddings(doc_id):
+        fetched.append(doc_id)
+        return responses[doc_id]
+    
+    webdav.read_chunk_embeddings = read_chunk_embeddings
+    
+    # A failed download is retried after the next sync
+    sync_with_chunks(webdav)
+    responses['a.pdf'] = np.empty((0, 0), dtype=np.float32)
+    sync_with_chunks(webdav)
+    assert fetched == ['a.pdf', 'a.pdf']
+    
+    # A missing sidecar is recorded and only fetched again for new metadata
+    sync_with_chunks(webdav)
+    assert fetched == ['a.pdf', 'a.pdf']
+    assert webdav.cache.get_document('a.pdf')['chunk_count'] == 0
+    
+    add_file(webdav, 'a.pdf', 'etag-2', ['a'], chunk_count=2)
+    responses['a.pdf'] = np.ones((2, 4), dtype=np.float32)
+    sync_with_chunks(webdav)
+    assert fetched == ['a.pdf', 'a.pdf', 'a.pdf']
+    assert webdav.cache.get_missing_chunks() == {}
@@ -7,7 +7,7 @@ from ui.components.common.navigation import create_navigation
 # Import from documents components
 from ui.components.documents.document_table import create_document_table, format_tags
 from ui.components.documents.upload_section import create_upload_section, create_new_file_section
-from ui.components.documents.search_section import create_search_section, create_similarity_table
+from ui.components.documents.search_section import create_search_section, create_pagination, create_similarity_table
 
 # Import from raw_documents components
 from ui.components.raw_documents.raw_files_table import create_raw_files_table
@@ -41,6 +41,10 @@ class UIComponents:
     def create_search_section(*args, **kwargs):
         return create_search_section(*args, **kwargs)
         
+    @staticmethod
+    def create_pagination(*args, **kwargs):
+        return create_pagination(*args, **kwargs)
+        
     @staticmethod
     def create_similarity_table(*args, **kwargs):
         return create_similarity_table(*args, **kwargs)
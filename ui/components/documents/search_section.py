@@ -1,3 +1,4 @@
+from urllib.parse import urlencode
 from fasthtml.common import *
 
 def create_search_section(query=None):
@@ -21,6 +22,27 @@ def create_search_section(query=None):
         cls="container search-container"
     )
 
+def create_pagination(query, page, has_more):
+    """
+    Create previous/next links for paginated search results
+    
+    Args:
+        query (str): Search query
+        page (int): Current page number (1-based)
+        has_more (bool): Whether a next page exists
+    
+    Returns:
+        Div: Pagination container
+    """
+    links = []
+    if page > 1:
+        links.append(A("Previous", href=f"/search?{urlencode({'query': query, 'page': page - 1})}", cls="nav-link"))
+    links.append(Span(f"Page {page}", cls="page-info"))
+    if has_more:
+        links.append(A("Next", href=f"/search?{urlencode({'query': query, 'page': page + 1})}", cls="nav-link"))
+    
+    return Div(*links, cls="container pagination")
+
 def create_similarity_table(similarities):
     """Create a table showing similarity with other documents"""
     # Create table header
@@ -145,4 +145,12 @@ def get_document_list_css():
   border-radius: 4px;
   z-index: 100;
 }
+
+/* Search result pagination */
+.pagination {
+  display: flex;
+  gap: 15px;
+  align-items: center;
+  justify-content: center;
+}
 """
\ No newline at end of file
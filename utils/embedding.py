@@ -0,0 +1,88 @@
+import io
+import base64
+import numpy as np
+
+# Version of the metadata embedding format written by encode_embedding
+# 1: JSON list of floats, 2: base64-encoded binary blob,
+# 3: chunk vectors moved from the metadata into a .chunks.npy sidecar
+EMBEDDING_FORMAT_VERSION = 3
+
+# Appended to a document's filename for the sidecar holding its chunk vectors
+CHUNKS_SUFFIX = '.chunks.npy'
+
+def encode_embedding(embedding, dtype='float16'):
+    """
+    Encode an embedding vector or matrix as a compact JSON-serializable blob
+    
+    Args:
+        embedding: Vector or matrix as a list or numpy array
+        dtype (str): Storage type, 'float16' or 'float32'
+    
+    Returns:
+        dict: {'dtype', 'shape', 'data'} with base64 data, or an empty list for no embedding
+    """
+    if embedding is None or len(embedding) == 0:
+        return []
+    
+    array = np.asarray(embedding, dtype=dtype)
+    return {
+        'dtype': array.dtype.name,
+        'shape': list(array.shape),
+        'data': base64.b64encode(array.tobytes()).decode('ascii')
+    }
+
+def decode_embedding(value):
+    """
+    Decode an embedding stored in either metadata format
+    
+    Args:
+        value: Blob dict written by encode_embedding, or a legacy list of floats
+    
+    Returns:
+        np.ndarray: Embedding array in its stored precision, or None if empty or invalid
+    """
+    if not value:
+        return None
+    
+    if isinstance(value, dict):
+        try:
+            data = base64.b64decode(value['data'])
+            return np.frombuffer(data, dtype=value.get('dtype', 'float32')).reshape(value['shape'])
+        except (KeyError, ValueError, TypeError):
+            return None
+    
+    # Legacy format: plain JSON list of floats (or list of lists for chunks)
+    try:
+        return np.asarray(value, dtype=np.float32)
+    except (ValueError, TypeError):
+        return None
+
+def encode_embedding_file(embeddings, dtype='float16'):
+    """
+    Encode an embedding matrix as the content of a .npy file
+    
+    Args:
+        embeddings: Matrix as a list of vectors or numpy array
+        dtype (str): Storage type, 'float16' or 'float32'
+    
+    Returns:
+        bytes: .npy file content
+    """
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(embeddings, dtype=dtype), allow_pickle=False)
+    return buffer.getvalue()
+
+def decode_embedding_file(data):
+    """
+    Decode the content of a .npy file written by encode_embedding_file
+    
+    Args:
+        data (bytes): .npy file content
+    
+    Returns:
+        np.ndarray: Embedding matrix in its stored precision, or None if invalid
+    """
+    try:
+        return np.load(io.BytesIO(data), allow_pickle=False)
+    except (ValueError, OSError, EOFError):
+        return None
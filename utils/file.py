@@ -1,8 +1,15 @@
 import os
+import shutil
 import tempfile
 import mimetypes
 from pathlib import Path
 
+# Streamed files up to this size stay in memory, larger ones roll over to disk
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Bytes read or written at a time when streaming file bodies
+STREAM_CHUNK_SIZE = 64 * 1024
+
 def get_file_extension(filename):
     """
     Get the file extension from a filename
@@ -32,7 +39,7 @@ def create_temp_file(content, suffix=None):
     Create a temporary file with given content
     
     Args:
-        content (bytes/str): File content
+        content (bytes/str/file): File content, file objects are copied in chunks
         suffix (str, optional): File extension
         
     Returns:
@@ -42,11 +49,72 @@ def create_temp_file(content, suffix=None):
         temp_path = temp_file.name
         if isinstance(content, str):
             temp_file.write(content.encode('utf-8'))
+        elif hasattr(content, 'read'):
+            content.seek(0)
+            shutil.copyfileobj(content, temp_file, STREAM_CHUNK_SIZE)
         else:
             temp_file.write(content)
     
     return temp_path
 
+def create_spooled_file():
+    """
+    Create a temporary file for a streamed body
+    
+    Returns:
+        SpooledTemporaryFile: File kept in memory up to SPOOL_MAX_SIZE, on disk beyond
+    """
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+
+def iter_file_chunks(file, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Read a file object from the start in chunks
+    
+    Args:
+        file: Binary file object
+        chunk_size (int): Bytes per chunk
+        
+    Yields:
+        bytes: Next chunk of the file
+    """
+    file.seek(0)
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+def get_file_size(file):
+    """
+    Get the size of a file object without reading it
+    
+    Args:
+        file: Seekable binary file object
+        
+    Returns:
+        int: Size in bytes
+    """
+    position = file.tell()
+    size = file.seek(0, os.SEEK_END)
+    file.seek(position)
+    return size
+
+def read_file_data(file_data, max_size=None):
+    """
+    Get the content of file data passed as bytes or as a file object
+    
+    Args:
+        file_data (bytes/file): File content
+        max_size (int, optional): Read at most this many bytes from the start
+        
+    Returns:
+        bytes: File content, up to max_size bytes
+    """
+    if hasattr(file_data, 'read'):
+        file_data.seek(0)
+        return file_data.read() if max_size is None else file_data.read(max_size)
+    return file_data if max_size is None else file_data[:max_size]
+
 def ensure_dir_exists(directory):
     """
     Create directory if it doesn't exist
@@ -0,0 +1,154 @@
+import os
+import xml.etree.ElementTree as ET
+from email.utils import parsedate_to_datetime
+from urllib.parse import unquote, urlparse
+from models.webdav_entry import WebDAVEntry
+
+# PROPFIND body asking only for the properties the listings use
+PROPFIND_BODY = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<d:propfind xmlns:d="DAV:"><d:prop>'
+    '<d:getetag/><d:getlastmodified/><d:getcontentlength/><d:getcontenttype/><d:resourcetype/>'
+    '</d:prop></d:propfind>'
+)
+
+class PropfindParser:
+    """
+    Incremental parser for PROPFIND multistatus responses.
+    
+    Feed the response body in chunks as it arrives and collect the entries
+    completed so far. Each <response> element is discarded once parsed, so
+    memory stays bounded by the chunk size however large the folder is.
+    """
+    
+    def __init__(self, folder_url=None):
+        """
+        Args:
+            folder_url (str, optional): URL of the listed folder, whose own entry is skipped
+        """
+        self.parser = ET.XMLPullParser(events=('start', 'end'))
+        self.root = None
+        self.folder_path = urlparse(folder_url).path.rstrip('/') if folder_url else None
+    
+    def feed(self, data):
+        """
+        Parse the next chunk of the response body
+        
+        Args:
+            data (bytes): Next chunk of the body
+        
+        Returns:
+            list: WebDAVEntry objects completed by this chunk
+        """
+        self.parser.feed(data)
+        return self._read_events()
+    
+    def close(self):
+        """
+        Finish parsing
+        
+        Returns:
+            list: WebDAVEntry objects completed by the end of the body
+        """
+        self.parser.close()
+        return self._read_events()
+    
+    def _read_events(self):
+        """Turn completed <response> elements into entries and drop them"""
+        entries = []
+        for event, element in self.parser.read_events():
+            if event == 'start':
+                if self.root is None:
+                    self.root = element
+                continue
+            
+            if element.tag != '{DAV:}response':
+                continue
+            
+            entry = self._parse_response(element)
+            if entry is not None:
+                entries.append(entry)
+            # Drop parsed responses so the tree never grows
+            self.root.clear()
+        return entries
+    
+    def _parse_response(self, response):
+        """Create an entry from one <response> element"""
+        href = (response.findtext('{DAV:}href') or '').strip()
+        if not href:
+            return None
+        
+        path = urlparse(href).path.rstrip('/')
+        if self.folder_path is not None and unquote(path) == unquote(self.folder_path):
+            return None
+        
+        name = unquote(os.path.basename(path))
+        if not name:
+            return None
+        
+        # Properties the server could not return are listed empty in a non-2xx propstat
+        props = [
+            propstat.find('{DAV:}prop') for propstat in response.findall('{DAV:}propstat')
+            if _is_success(propstat.findtext('{DAV:}status'))
+        ]
+        props = [prop for prop in props if prop is not None]
+        
+        is_collection = href.endswith('/') or any(
+            prop.find('{DAV:}resourcetype/{DAV:}collection') is not None for prop in props
+        )
+        
+        return WebDAVEntry(
+            name=name,
+            href=href,
+            size=_parse_int(_find_property(props, '{DAV:}getcontentlength')),
+            mtime=_parse_http_date(_find_property(props, '{DAV:}getlastmodified')),
+            etag=_find_property(props, '{DAV:}getetag'),
+            content_type=_find_property(props, '{DAV:}getcontenttype'),
+            is_collection=is_collection
+        )
+
+def iter_propfind_entries(chunks, folder_url=None):
+    """
+    Parse a PROPFIND response body incrementally
+    
+    Args:
+        chunks: Iterable of body chunks as bytes, e.g. response.iter_content()
+        folder_url (str, optional): URL of the listed folder, whose own entry is skipped
+    
+    Yields:
+        WebDAVEntry: Files and folders in document order
+    """
+    parser = PropfindParser(folder_url)
+    for chunk in chunks:
+        if chunk:
+            yield from parser.feed(chunk)
+    yield from parser.close()
+
+def _is_success(status):
+    """Check whether a propstat status line like 'HTTP/1.1 200 OK' is a 2xx status, missing counts as success"""
+    if not status:
+        return True
+    parts = status.split()
+    return len(parts) > 1 and parts[1].startswith('2')
+
+def _find_property(props, tag):
+    """Get the stripped text of the first non-empty property with the given tag, None if there is none"""
+    for prop in props:
+        value = (prop.findtext(tag) or '').strip()
+        if value:
+            return value
+    return None
+
+def _parse_int(value):
+    """Parse an integer property, None if missing or invalid"""
+    try:
+        return int(value.strip())
+    except (AttributeError, ValueError):
+        return None
+
+def _parse_http_date(value):
+    """Parse an RFC 1123 date property into a Unix timestamp, None if missing or invalid"""
+    try:
+        return parsedate_to_datetime(value.strip()).timestamp()
+    except (AttributeError, TypeError, ValueError):
+        return None
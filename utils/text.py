@@ -110,4 +110,68 @@ def extract_keywords(text, max_keywords=10):
     # Get most frequent words
     keywords = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)[:max_keywords]
     
-    return [word for word, count in keywords]
\ No newline at end of file
+    return [word for word, count in keywords]
+
+def chunk_text(text, max_tokens=200, overlap=20, max_chunks=None, tokenizer=None):
+    """
+    Split text into overlapping windows of at most max_tokens tokens
+    
+    Tokens are counted with the given tokenizer, or estimated like
+    count_tokens without one. With max_chunks set, only the start of a very
+    long text is tokenized.
+    
+    Args:
+        text (str): Input text
+        max_tokens (int): Maximum tokens per chunk
+        overlap (int): Tokens shared by consecutive chunks
+        max_chunks (int, optional): Stop after this many chunks
+        tokenizer (optional): Fast Hugging Face tokenizer measuring the windows
+        
+    Returns:
+        list: Text chunks in document order
+    """
+    if not text:
+        return []
+    
+    max_tokens = max(1, max_tokens)
+    step = max(1, max_tokens - max(0, overlap))
+    chunks = []
+    window = []  # (start, end) offsets of the tokens in the current window
+    
+    for span in _iter_token_spans(text, tokenizer):
+        window.append(span)
+        if len(window) == max_tokens:
+            chunks.append(text[window[0][0]:window[-1][1]])
+            if max_chunks and len(chunks) >= max_chunks:
+                return chunks
+            window = window[step:]
+    
+    # Keep the remainder unless it is entirely covered by the previous chunk
+    if window and (not chunks or len(window) > max_tokens - step):
+        chunks.append(text[window[0][0]:window[-1][1]])
+    
+    return chunks
+
+# Characters tokenized at once by _iter_token_spans
+TOKENIZE_SLICE_CHARS = 20000
+
+def _iter_token_spans(text, tokenizer=None):
+    """Yield the (start, end) character offsets of the tokens of text"""
+    if tokenizer is None:
+        for match in re.finditer(r'\b\w+\b|[^\w\s]', text):
+            yield match.span()
+        return
+    
+    # Tokenize slice by slice, cut at whitespace, so the text is only tokenized as far as it is chunked
+    position = 0
+    while position < len(text):
+        end = min(len(text), position + TOKENIZE_SLICE_CHARS)
+        if end < len(text):
+            cut = max(text.rfind(' ', position, end), text.rfind('\n', position, end))
+            if cut > position:
+                end = cut
+        
+        encoding = tokenizer(text[position:end], add_special_tokens=False, return_offsets_mapping=True)
+        for start, stop in encoding['offset_mapping']:
+            yield start + position, stop + position
+        position = end